@@ -0,0 +1,131 @@
+"""Backtest of the indTemplate trigger signal over many symbols, vectorized across symbols."""
+
+import numpy as np
+import pandas as pd
+import priceStore
+import panelInd
+
+TRADING_DAYS = 252
+
+def ffill(a):
+    """Forward-fill NaNs down each column (leading NaNs stay NaN)."""
+    rows = np.where(np.isnan(a), 0, np.arange(len(a))[:, np.newaxis])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return a[rows, np.arange(a.shape[1])]
+
+def positions_from_trigger(trigger, buy=2, sell=-2, allow_short=True):
+    """
+    Turn a (dates x symbols) trigger matrix into target positions: go long on
+    trigger >= buy, short (or flat) on trigger <= sell, otherwise keep the
+    previous position.
+    """
+    short = -1.0 if allow_short else 0.0
+    signal = np.where(trigger >= buy, 1.0, np.where(trigger <= sell, short, np.nan))
+    return np.nan_to_num(ffill(signal))
+
+def run_backtest(prices, trigger, dates=None, symbols=None, capital=1e6,
+                 buy=2, sell=-2, allow_short=True, commission=0.0005, slippage=0.0005):
+    """
+    Backtest equal capital per symbol. A position decided at the close of
+    day t is filled at that close (adjusted for slippage) and sized to
+    1/n_symbols of the equity then. Between trades a symbol holds its
+    share count, so its weight drifts with its price; there is no implicit
+    rebalancing. A symbol with no price on day t is not traded; its
+    position is kept until the next day it has one. A symbol whose prices
+    end before the last day (delisted) is closed out at its last close.
+    commission and slippage are fractions of traded notional.
+    Returns {'positions', 'weights', 'fills', 'returns', 'equity', 'stats'}.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n_days, n_symbols = prices.shape
+    dates = dates if dates is not None else pd.RangeIndex(n_days)
+    symbols = symbols if symbols is not None else list(range(n_symbols))
+
+    tradable = ~np.isnan(prices)
+    positions = positions_from_trigger(trigger, buy, sell, allow_short)
+    # defer trades on untradable days; flat until a symbol first has a price
+    positions = np.nan_to_num(ffill(np.where(tradable, positions, np.nan)))
+    # flat from the last close of a symbol whose prices stop
+    last_day = n_days - 1 - tradable[::-1].argmax(axis=0)
+    ended = tradable.any(axis=0) & (last_day < n_days - 1)
+    positions[(np.arange(n_days)[:, np.newaxis] >= last_day) & ended] = 0
+
+    # a position held over a missing price is marked at its last price
+    last = np.nan_to_num(ffill(prices))
+    changed = np.diff(positions, axis=0, prepend=0) != 0
+    shares = np.zeros(n_symbols)
+    cash = float(capital)
+    trades = np.zeros_like(prices)    # shares traded at each close
+    weights = np.zeros_like(prices)
+    marked = np.zeros(n_days)         # equity at each close before its trades
+    traded = np.zeros(n_days)         # notional traded at each close
+    equity = np.zeros(n_days)
+    cost_rate = commission + slippage
+    for t in range(n_days):
+        price = last[t]
+        marked[t] = cash + shares.dot(price)
+        if changed[t].any():
+            target = np.zeros(n_symbols)
+            target[changed[t]] = positions[t, changed[t]] * marked[t] / n_symbols / price[changed[t]]
+            trades[t] = np.where(changed[t], target - shares, 0)
+            notional = trades[t] * price
+            traded[t] = np.abs(notional).sum()
+            cash -= notional.sum() + traded[t] * cost_rate
+            shares = shares + trades[t]
+        equity[t] = cash + shares.dot(price)
+        weights[t] = shares * price / equity[t]
+
+    net = equity / np.concatenate([[capital], equity[:-1]]) - 1
+    turnover = traded / marked
+
+    day, col = np.nonzero(trades)
+    side = np.sign(trades[day, col])
+    notional = trades[day, col] * last[day, col]
+    fill_price = prices[day, col] * (1 + slippage * side)
+    fills = pd.DataFrame({
+        'date': np.asarray(dates)[day],
+        'symbol': np.asarray(symbols)[col],
+        'side': side.astype(np.int8),
+        'price': fill_price,
+        'shares': trades[day, col],
+        'commission': np.abs(notional) * commission,
+    }, columns=['date', 'symbol', 'side', 'price', 'shares', 'commission'])
+
+    return {
+        'positions': positions,
+        'weights': weights,
+        'fills': fills,
+        'returns': pd.Series(net, index=dates),
+        'equity': pd.Series(equity, index=dates),
+        'stats': summary_stats(net, equity, turnover, len(fills)),
+    }
+
+def summary_stats(returns, equity, turnover, n_trades):
+    years = len(returns) / float(TRADING_DAYS)
+    std = returns.std()
+    peak = np.maximum.accumulate(equity)
+    total = np.prod(1 + returns) - 1
+    return {
+        'total_return': total,
+        'cagr': (1 + total) ** (1 / years) - 1 if years else 0.0,
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'sharpe': returns.mean() / std * np.sqrt(TRADING_DAYS) if std else 0.0,
+        'max_drawdown': (equity / peak - 1).min() if len(equity) else 0.0,
+        'annual_turnover': turnover.sum() / years if years else 0.0,
+        'trades': n_trades,
+    }
+
+def backtest_universe(tickers=None, lookback=14, momentum_period=14, csv_dir='stock_dfs', **kwargs):
+    """Backtest the trigger signal on the stock_dfs Adj Close panel."""
+    if tickers is None:
+        store = priceStore.open_store(csv_dir)
+        tickers = store.tickers if store is not None else priceStore.list_csv_tickers(csv_dir)
+    days, tickers, prices = priceStore.build_panel(tickers, 'Adj Close', csv_dir)
+    trigger = panelInd.get_panel_ind(prices, lookback, momentum_period)['trigger']
+    return run_backtest(prices, trigger, priceStore.from_day_ints(days), tickers, **kwargs)
+
+
+if __name__ == "__main__":
+    result = backtest_universe()
+    for name, value in result['stats'].items():
+        print('{}: {}'.format(name, value))
@@ -0,0 +1,91 @@
+"""Train the do_ml VotingClassifier for every ticker in the close panel at once."""
+
+import numpy as np
+import pandas as pd
+from collections import Counter
+from multiprocessing import Pool
+from sklearn.model_selection import train_test_split
+import classifiers
+import raggedPanel
+import sharedArrays
+import serving
+import profiling
+
+def universe_features(df, hm_days=7, requirement=0.02):
+    """
+    Compute, once for all tickers, what extract_featuresets builds per ticker:
+    X, the shared pct_change feature matrix (rows x tickers); y, every ticker's
+    labels (rows x tickers); and valid, the rows each ticker can train on
+    (inside its listed span, with every forward return known).
+    """
+    panel = raggedPanel.from_frame(df)
+    y, _, valid = panel.labels(hm_days, requirement)
+    X = panel.returns().fillna(0).dense(fill=0)
+    return X, panel.dense(y, fill=0), panel.dense(valid, fill=False)
+
+_shared = {}
+
+def _init_worker(specs):
+    profiling.worker_init()
+    for key, spec in specs.items():
+        _shared[key] = sharedArrays.attach(spec)
+
+def _fit_ticker(task):
+    col, ticker, test_size, seed, model_dir, columns = task
+    X, y, valid = _shared['X'][1], _shared['y'][1], _shared['valid'][1]
+    rows = np.flatnonzero(valid[:, col])
+    train_rows, test_rows = train_test_split(
+        rows, test_size=test_size, random_state=seed)
+    clf = classifiers.make_classifier()
+    clf.fit(X[train_rows], y[train_rows, col])
+    if model_dir is not None:
+        serving.save_model(model_dir, ticker, clf, train_rows, y[train_rows, col], columns)
+    predictions = Counter(clf.predict(X[test_rows]))
+    return ticker, clf.score(X[test_rows], y[test_rows, col]), predictions
+
+def train_universe(tickers=None, processes=None, test_size=0.25, seed=None,
+                   hm_days=7, requirement=0.02, closes_path='sample_sp500_closes.csv', model_dir=None):
+    """
+    Fit one model per ticker over a process pool. The close panel is read and
+    featurized once and handed to the workers through shared memory. With
+    model_dir, every fitted model is saved there for serving.ModelServer.
+    Returns a DataFrame indexed by ticker with the accuracy and predicted spread.
+    """
+    with profiling.span('load'):
+        df = pd.read_csv(closes_path, index_col=0)
+    columns = df.columns.values.tolist()
+    tickers = tickers or columns
+    missing = [t for t in tickers if t not in columns]
+    if missing:
+        raise ValueError('Not in {}: {}'.format(closes_path, ', '.join(missing)))
+    tasks = [(columns.index(t), t, test_size, seed, model_dir, columns) for t in tickers]
+    with profiling.span('featurize'):
+        X, y, valid = universe_features(df, hm_days, requirement)
+
+    blocks, specs = [], {}
+    try:
+        for key, arr in (('X', X), ('y', y), ('valid', valid)):
+            block, specs[key] = sharedArrays.share(arr)
+            blocks.append(block)
+        del X, y, valid
+
+        pool = Pool(processes, initializer=_init_worker, initargs=(specs,))
+        try:
+            # fit and predict per ticker, in the workers
+            with profiling.span('fit_universe', 'fit'):
+                results = pool.map(_fit_ticker, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        sharedArrays.release(*blocks)
+
+    rows = [(acc, pred[-1], pred[0], pred[1]) for _, acc, pred in results]
+    return pd.DataFrame(rows, index=[t for t, _, _ in results],
+                        columns=['accuracy', 'sell', 'hold', 'buy'])
+
+
+if __name__ == "__main__":
+    results = train_universe()
+    print(results)
+    print('Mean accuracy:', results['accuracy'].mean())
@@ -0,0 +1,248 @@
+"""
+Benchmarks for the FinML hot paths on synthetic markets of growing size.
+
+generate_market writes a workspace laid out like this directory:
+stock_dfs/{ticker}.csv in the downloader's schema (plus SPY.csv) and
+sp500tickers.pickle. Prices follow a one-factor random walk, a fifth of
+the tickers list partway through, and a few days are missing. Each stage
+then runs against the workspace:
+
+    compile_data         dataParser.compile_data (panel join + closes CSV)
+    get_data             utilities.get_data for every ticker over the last 2 years, cold cache
+    extract_featuresets  classifiers.extract_featuresets for one ticker
+    panel_ind            panelInd.get_universe_ind (the get_ind_data indicators, every ticker)
+    correlation          correlation.closes_corr
+    train                batchTrain.train_universe on train_tickers tickers
+
+A stage's time is the median of repeat runs, train included. A stage is
+reported as a regression when it is slower than the median of its last
+runs at the same size by more than tolerance, by more than n_mads median
+absolute deviations of those runs, and by more than min_seconds, so one
+noisy run of a stage whose times vary does not trip it. A regressed run
+makes the script exit with status 1 and is not added to history_path
+unless accept is set (--accept), so a slowdown keeps failing until it is
+fixed or deliberately accepted.
+
+    python benchmark.py --sizes small medium
+"""
+
+import os
+import io
+import sys
+import csv
+import time
+import pickle
+import argparse
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+import utilities
+import classifiers
+import panelInd
+import correlation
+import batchTrain
+
+SIZES = {
+    'small': (50, 5),
+    'medium': (500, 15),
+    'large': (5000, 30),
+}
+STAGES = ['compile_data', 'get_data', 'extract_featuresets', 'panel_ind', 'correlation', 'train']
+HISTORY_FIELDS = ['run', 'commit', 'size', 'tickers', 'years', 'stage', 'seconds']
+DAYS_PER_YEAR = 252
+
+def ticker_names(n_tickers):
+    return ['T{:04d}'.format(i) for i in range(n_tickers)]
+
+def _bars(close, rng):
+    """Open/High/Low/Adj Close/Volume around a close path."""
+    n = len(close)
+    prev = np.concatenate([[close[0]], close[:-1]])
+    open_ = prev * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, n)))
+    adj = close * rng.uniform(0.8, 1.0)
+    volume = rng.lognormal(14, 0.5, n).astype(np.int64)
+    return open_, high, low, adj, volume
+
+def _write_csv(path, dates, close, rng):
+    open_, high, low, adj, volume = _bars(close, rng)
+    df = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                       'Adj Close': adj, 'Volume': volume},
+                      index=pd.Index(dates, name='Date'),
+                      columns=['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume'])
+    df.to_csv(path, float_format='%.6f')
+
+def generate_market(out_dir, n_tickers, years, seed=0, start='2000-01-03'):
+    """Write a synthetic stock_dfs/ and sp500tickers.pickle under out_dir; returns the tickers."""
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range(start, periods=int(years * DAYS_PER_YEAR)).strftime('%Y-%m-%d')
+    n = len(dates)
+    csv_dir = os.path.join(out_dir, 'stock_dfs')
+    if not os.path.exists(csv_dir):
+        os.makedirs(csv_dir)
+
+    market = rng.normal(0.0003, 0.01, n)
+    _write_csv(os.path.join(csv_dir, 'SPY.csv'), dates, 100 * np.exp(np.cumsum(market)), rng)
+
+    tickers = ticker_names(n_tickers)
+    for ticker in tickers:
+        beta, vol = rng.uniform(0.5, 1.5), rng.uniform(0.005, 0.025)
+        close = rng.uniform(10, 200) * np.exp(np.cumsum(beta * market + rng.normal(0, vol, n)))
+        keep = rng.rand(n) > 0.001
+        if rng.rand() < 0.2:  # listed partway through
+            keep[:rng.randint(n // 2)] = False
+        _write_csv(os.path.join(csv_dir, '{}.csv'.format(ticker)), dates[keep], close[keep], rng)
+
+    with open(os.path.join(out_dir, 'sp500tickers.pickle'), 'wb') as f:
+        pickle.dump(tickers, f)
+    return tickers
+
+def workspace(root, size, seed=0):
+    """The generated workspace for size, made on first use."""
+    n_tickers, years = SIZES[size]
+    path = os.path.join(root, '{}x{}'.format(n_tickers, years))
+    marker = os.path.join(path, 'sp500tickers.pickle')
+    if not os.path.exists(marker):
+        print('Generating {} tickers x {} years in {}'.format(n_tickers, years, path))
+        generate_market(path, n_tickers, years, seed)
+    return path
+
+def median_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        times.append(time.time() - start)
+    return float(np.median(times))
+
+def run_stages(path, repeat=3, train_tickers=8, processes=None, stages=STAGES):
+    """{stage: seconds} for the workspace at path."""
+    # imported only when stages run: dataParser is the scraper script
+    import dataParser
+    # the FinML scripts use paths relative to their directory
+    cwd = os.getcwd()
+    old_dir = os.environ.get('MARKET_DATA_DIR')
+    os.chdir(path)
+    os.environ['MARKET_DATA_DIR'] = 'stock_dfs'
+    try:
+        with open('sp500tickers.pickle', 'rb') as f:
+            tickers = pickle.load(f)
+        if not os.path.exists(classifiers.CLOSES_PATH):
+            dataParser.compile_data()
+        last = pd.read_csv('stock_dfs/SPY.csv', usecols=['Date'])['Date'].iloc[-1]
+        window = pd.date_range(pd.Timestamp(last) - pd.DateOffset(years=2), last)
+
+        def get_data():
+            utilities._cache.clear()
+            utilities.get_data(tickers, window)
+
+        runs = {
+            'compile_data': dataParser.compile_data,
+            'get_data': get_data,
+            'extract_featuresets': lambda: classifiers.extract_featuresets(tickers[0]),
+            'panel_ind': lambda: panelInd.get_universe_ind(tickers),
+            'correlation': lambda: correlation.closes_corr(classifiers.CLOSES_PATH),
+            'train': lambda: batchTrain.train_universe(tickers[:train_tickers], processes, seed=0),
+        }
+        results = {}
+        for stage in stages:
+            results[stage] = median_time(runs[stage], repeat)
+            print('  {:<20} {:8.3f}s'.format(stage, results[stage]))
+        return results
+    finally:
+        os.chdir(cwd)
+        if old_dir is None:
+            os.environ.pop('MARKET_DATA_DIR', None)
+        else:
+            os.environ['MARKET_DATA_DIR'] = old_dir
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def read_history(history_path):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as f:
+        return list(csv.DictReader(f))
+
+def append_history(history_path, rows):
+    new_file = not os.path.exists(history_path)
+    with open(history_path, 'a') as f:
+        writer = csv.DictWriter(f, HISTORY_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+def regressions(history, rows, tolerance=0.25, window=5, min_seconds=0.05, n_mads=3.0):
+    """
+    [(size, stage, seconds, baseline)] for rows slower than the median of
+    the stage's last window runs at that size by more than tolerance (a
+    fraction of it), n_mads scaled median absolute deviations of those
+    runs, and min_seconds.
+    """
+    out = []
+    for row in rows:
+        past = np.array([float(h['seconds']) for h in history
+                         if h['size'] == row['size'] and h['stage'] == row['stage']][-window:])
+        if not len(past):
+            continue
+        baseline = float(np.median(past))
+        # 1.4826 * MAD estimates the standard deviation of normal noise
+        spread = 1.4826 * float(np.median(np.abs(past - baseline)))
+        excess = row['seconds'] - baseline
+        if excess > max(tolerance * baseline, n_mads * spread, min_seconds):
+            out.append((row['size'], row['stage'], row['seconds'], baseline))
+    return out
+
+def run_benchmarks(sizes=('small',), root='bench', history_path='benchmark_history.csv', repeat=3,
+                   tolerance=0.25, train_tickers=8, processes=None, stages=STAGES, accept=False):
+    """
+    Run every stage at every size and return (rows, regressions). The run
+    is recorded unless it regressed and accept is False.
+    """
+    run = time.strftime('%Y-%m-%dT%H:%M:%S')
+    commit = git_commit()
+    rows = []
+    for size in sizes:
+        n_tickers, years = SIZES[size]
+        print('{}: {} tickers x {} years'.format(size, n_tickers, years))
+        results = run_stages(workspace(root, size), repeat, train_tickers, processes, stages)
+        rows.extend({'run': run, 'commit': commit, 'size': size, 'tickers': n_tickers, 'years': years,
+                     'stage': stage, 'seconds': seconds} for stage, seconds in results.items())
+    history = read_history(history_path)
+    slow = regressions(history, rows, tolerance)
+    if not slow or accept:
+        append_history(history_path, rows)
+    return rows, slow
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark FinML stages on synthetic markets.')
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=sorted(SIZES))
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--root', default='bench')
+    parser.add_argument('--history', default='benchmark_history.csv')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--train-tickers', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--accept', action='store_true',
+                        help='record this run in the history even if it regressed')
+    args = parser.parse_args()
+
+    rows, slow = run_benchmarks(args.sizes, args.root, args.history, args.repeat, args.tolerance,
+                                args.train_tickers, args.processes, args.stages, args.accept)
+    if slow:
+        for size, stage, seconds, baseline in slow:
+            print('REGRESSION {} {}: {:.3f}s vs {:.3f}s baseline ({:+.0%})'.format(
+                size, stage, seconds, baseline, seconds / baseline - 1))
+        if not args.accept:
+            print('Not recorded in {}; rerun with --accept to make this the new baseline'.format(args.history))
+            sys.exit(1)
@@ -1,20 +1,31 @@
 import numpy as np
 import pandas as pd
 import pickle
+import sklearn
 from collections import Counter
-from sklearn import  svm, cross_validation, neighbors
+from sklearn import  svm, neighbors
+from sklearn.model_selection import train_test_split
 from sklearn.ensemble import VotingClassifier, RandomForestClassifier
+import labels
+import raggedPanel
+import memoCache
+import profiling
 
-def process_data_for_labels(ticker):
-    hm_days = 7
-    df = pd.read_csv('sample_sp500_closes.csv', index_col=0)
+CLOSES_PATH = 'sample_sp500_closes.csv'
+
+def process_data_for_labels(ticker, hm_days=7):
+    with profiling.span('load'):
+        df = pd.read_csv(CLOSES_PATH, index_col=0)
     tickers = df.columns.values.tolist()
-    df.fillna(0, inplace=True)
 
-    for i in range(1,hm_days+1):
-        df['{}_{}d'.format(ticker, i)] = (df[ticker].shift(-i) - df[ticker])/df[ticker]
+    # prices before a ticker's first close stay NaN: filling them with 0
+    # turned the returns around its listing date into inf, or 0 and a
+    # spurious hold label
+    with profiling.span('label'):
+        fwd = labels.forward_returns(df[ticker].values, hm_days)
+        for i in range(1,hm_days+1):
+            df['{}_{}d'.format(ticker, i)] = fwd[:, i-1]
 
-    df.fillna(0, inplace=True)
     # print(ticker, df)
     return  tickers, df
 
@@ -30,57 +41,81 @@ def stock_decision(*args):
             return -1
     return 0
 
-def extract_featuresets(ticker):
-    tickers, df = process_data_for_labels(ticker)
-    df['{}_target'.format(ticker)] = list(map(stock_decision,
-                                              df['{}_1d'.format(ticker)],
-                                              df['{}_2d'.format(ticker)],
-                                              df['{}_3d'.format(ticker)],
-                                              df['{}_4d'.format(ticker)],
-                                              df['{}_5d'.format(ticker)],
-                                              df['{}_6d'.format(ticker)],
-                                              df['{}_7d'.format(ticker)]
-                                              ))
-
-    # df['{}_target'.format(ticker)] = df.apply(lambda row: stock_decision(row[c for c in row if c not in ticker]))
-
-    vals = df['{}_target'.format(ticker)].values.tolist()
+def _featuresets(ticker, hm_days, requirement):
+    tickers, df = process_data_for_labels(ticker, hm_days)
+    fwd_cols = ['{}_{}d'.format(ticker, i) for i in range(1,hm_days+1)]
+    # same rule as stock_decision, applied to every row at once
+    with profiling.span('label'):
+        df['{}_target'.format(ticker)] = labels.first_crossing(df[fwd_cols].values, requirement)
+
+    # features: every ticker's return, 0 where it has none (not listed yet)
+    with profiling.span('featurize'):
+        X = raggedPanel.from_frame(df[tickers]).returns().fillna(0).dense(fill=0)
+
+    # only rows whose forward returns are all known can be labelled
+    keep = np.isfinite(df[fwd_cols].values).all(axis=1)
+    df = df[keep]
+    X, y = X[keep], df['{}_target'.format(ticker)].values
+    return X,y,df
+
+def extract_featuresets(ticker, hm_days=7, requirement=0.02, cache=None):
+    if cache is not None:
+        # keyed by the closes file's content and the labelling and feature
+        # code, so an edited file or function is recomputed
+        key = memoCache.fingerprint('featuresets', memoCache.file_fingerprint(CLOSES_PATH),
+                                    memoCache.code_fingerprint(process_data_for_labels, _featuresets,
+                                                               labels, raggedPanel),
+                                    ticker, hm_days, requirement)
+        X, y, df = cache.memoize(key, lambda: _featuresets(ticker, hm_days, requirement))
+    else:
+        X, y, df = _featuresets(ticker, hm_days, requirement)
+
+    vals = y.tolist()
     str_vals = [str(i) for i in vals]
     print('Data spread:', Counter(str_vals))
 
-    df.fillna(0, inplace=True)
-    df = df.replace([np.inf, -np.inf], np.nan)
-    df.dropna(inplace=True)
-
-    # print(tickers)
-    # print(df)
-
-    df_vals = df[[ticker for ticker in tickers]].pct_change()
-    df_vals = df_vals.replace([np.inf, -np.inf], 0)
-    df_vals.fillna(0, inplace=True)
-
-    X, y = df_vals.values, df['{}_target'.format(ticker)].values
-
     # print(X,y,df)
     return X,y,df
 
 # extract_featuresets('GOOG')
 
-def do_ml(ticker):
-    X, y, df = extract_featuresets(ticker)
-    X_train, X_test, y_train, y_test = cross_validation.train_test_split(X, y, test_size=0.25)
-    # clf = neighbors.KNeighborsClassifier()
-    clf = VotingClassifier([
+def make_classifier(knn=None):
+    # knn: e.g. neighborIndex.IndexedKNeighborsClassifier() for an indexed search
+    return VotingClassifier([
         ('lsvc', svm.LinearSVC()),
-        ('knn', neighbors.KNeighborsClassifier()),
+        ('knn', knn if knn is not None else neighbors.KNeighborsClassifier()),
         ('rfor', RandomForestClassifier())])
 
-    clf.fit(X_train,y_train)
-    confidence = clf.score(X_test, y_test)
-    predictions = clf.predict(X_test)
+def model_config(clf):
+    """What identifies a model for caching: its parameters and the sklearn version."""
+    return sklearn.__version__, repr(sorted((k, repr(v)) for k, v in clf.get_params().items()))
+
+def do_ml(ticker, cache=None):
+    X, y, df = extract_featuresets(ticker, cache=cache)
+
+    def fit():
+        rows = np.arange(len(y))
+        train_rows, test_rows = train_test_split(rows, test_size=0.25)
+        clf = make_classifier()
+        with profiling.span('fit'):
+            clf.fit(X[train_rows], y[train_rows])
+        return clf, test_rows
+
+    if cache is None:
+        clf, test_rows = fit()
+    else:
+        key = memoCache.fingerprint('do_ml', X, y, model_config(make_classifier()),
+                                    memoCache.code_fingerprint(do_ml))
+        clf, test_rows = cache.memoize(key, fit)
+
+    X_test, y_test = X[test_rows], y[test_rows]
+    with profiling.span('predict'):
+        confidence = clf.score(X_test, y_test)
+        predictions = clf.predict(X_test)
     print('Accuracy:', confidence)
     print('Predicted spread:', Counter(predictions))
 
     return confidence
 
-do_ml('GOOG')
\ No newline at end of file
+if __name__ == "__main__":
+    do_ml('GOOG', cache=memoCache.DiskCache('cache'))
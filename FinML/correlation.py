@@ -0,0 +1,134 @@
+"""
+Return correlations for a (dates x tickers) price panel.
+
+corr_matrix works through the tickers in column blocks and gets every
+pairwise sum from matrix products over the rows where both tickers have a
+return, which gives df.corr()'s pairwise NaN handling. RollingCorrelation
+keeps those co-moment sums for a moving window and updates them with the
+row entering and the row leaving, instead of recomputing each window.
+"""
+
+import numpy as np
+import pandas as pd
+import profiling
+
+RESYNC_ROWS = 4096
+
+def returns(prices):
+    """Simple returns down each column; NaN wherever either price is missing."""
+    prices = np.asarray(prices, dtype=np.float64)
+    out = np.full(prices.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = prices[1:] / prices[:-1] - 1
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+def _corr_from_sums(n, sx, sy, sxx, syy, sxy, min_periods):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        corr = cov / np.sqrt(var)
+    corr[(n < max(min_periods, 2)) | ~(var > 0)] = np.nan
+    return np.clip(corr, -1, 1)
+
+def _column_means(x, mask):
+    # nanmean without the all-NaN warning; empty columns get 0
+    return np.where(mask > 0, x, 0.0).sum(axis=0) / np.maximum(mask.sum(axis=0), 1)
+
+def _block_sums(xi, mi, xj, mj):
+    # xi, xj are centred and zero where missing; mi, mj are the 0/1 masks
+    return (mi.T.dot(mj), xi.T.dot(mj), mi.T.dot(xj),
+            (xi * xi).T.dot(mj), mi.T.dot(xj * xj), xi.T.dot(xj))
+
+def corr_matrix(x, block=256, min_periods=1):
+    """
+    Pearson correlation of the columns of x (rows x columns, NaN = missing),
+    each pair over the rows where both are present, like DataFrame.corr().
+    """
+    x = np.asarray(x, dtype=np.float64)
+    mask = (~np.isnan(x)).astype(np.float64)
+    centred = np.where(mask > 0, x - _column_means(x, mask), 0.0)
+    n_cols = x.shape[1]
+    corr = np.empty((n_cols, n_cols))
+    for i in range(0, n_cols, block):
+        xi, mi = centred[:, i:i + block], mask[:, i:i + block]
+        for j in range(i, n_cols, block):
+            xj, mj = centred[:, j:j + block], mask[:, j:j + block]
+            c = _corr_from_sums(*(_block_sums(xi, mi, xj, mj) + (min_periods,)))
+            corr[i:i + block, j:j + block] = c
+            corr[j:j + block, i:i + block] = c.T
+    return corr
+
+class RollingCorrelation(object):
+    """
+    Correlation matrix over the last window rows, pushed one row at a time.
+    Memory is the window of rows plus six (columns x columns) sum matrices.
+    """
+
+    def __init__(self, n_cols, window, min_periods=None):
+        self.window = window
+        self.min_periods = min_periods or window
+        self.rows = np.full((window, n_cols), np.nan)
+        self.pos = 0
+        self.filled = 0
+        self.pushed = 0
+        self._resync()
+
+    def _resync(self):
+        # sums don't depend on row order; they are taken about a per-column
+        # offset (the window mean) for accuracy
+        rows = self.rows[:self.filled]
+        mask = (~np.isnan(rows)).astype(np.float64)
+        self.offset = _column_means(rows, mask)
+        x = np.where(mask > 0, rows - self.offset, 0.0)
+        self.n, self.sx, self.sy, self.sxx, self.syy, self.sxy = _block_sums(x, mask, x, mask)
+
+    def _add(self, row, sign):
+        m = (~np.isnan(row)).astype(np.float64)
+        x = np.where(m > 0, row - self.offset, 0.0)
+        self.n += sign * np.outer(m, m)
+        self.sx += sign * np.outer(x, m)
+        self.sy += sign * np.outer(m, x)
+        self.sxx += sign * np.outer(x * x, m)
+        self.syy += sign * np.outer(m, x * x)
+        self.sxy += sign * np.outer(x, x)
+
+    def update(self, row):
+        row = np.asarray(row, dtype=np.float64)
+        if self.filled == self.window:
+            self._add(self.rows[self.pos], -1)
+        self._add(row, 1)
+        self.rows[self.pos] = row
+        self.pos = (self.pos + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+        self.pushed += 1
+        if self.pushed % RESYNC_ROWS == 0:
+            self._resync()
+
+    def corr(self):
+        return _corr_from_sums(self.n, self.sx, self.sy, self.sxx, self.syy, self.sxy, self.min_periods)
+
+def rolling_corr(x, window, step=1, min_periods=None):
+    """Yield (row, correlation matrix of the window ending at row) every step rows."""
+    roller = RollingCorrelation(np.shape(x)[1], window, min_periods)
+    for t, row in enumerate(np.asarray(x, dtype=np.float64)):
+        roller.update(row)
+        if t >= window - 1 and (t - window + 1) % step == 0:
+            yield t, roller.corr()
+
+def save_matrix(path, corr, labels):
+    np.savez(path, corr=corr, labels=np.asarray(labels, dtype=str))
+
+def load_matrix(path):
+    """Returns the matrix written by save_matrix as a labelled DataFrame."""
+    with np.load(path) as z:
+        labels = list(z['labels'])
+        return pd.DataFrame(z['corr'], index=labels, columns=labels)
+
+def closes_corr(closes_path='sample_sp500_closes.csv', block=256, min_periods=1):
+    """Return correlation DataFrame for the compile_data closes file."""
+    with profiling.span('load'):
+        df = pd.read_csv(closes_path, index_col=0)
+    with profiling.span('correlation'):
+        corr = corr_matrix(returns(df.values), block, min_periods)
+    return pd.DataFrame(corr, index=df.columns, columns=df.columns)
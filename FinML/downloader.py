@@ -0,0 +1,126 @@
+"""Concurrent, resumable price downloader behind a pluggable provider."""
+
+import os
+import time
+import random
+import datetime as dt
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+CSV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+class YahooProvider(object):
+    """Fetch daily bars through pandas_datareader."""
+
+    def __init__(self, source='yahoo'):
+        self.source = source
+
+    def fetch(self, ticker, start, end):
+        import pandas_datareader as web
+        return web.DataReader(ticker, self.source, start, end)
+
+class FileProvider(object):
+    """
+    Stand-in provider serving bars from a directory of {ticker}.csv files,
+    with optional simulated latency and failures for offline benchmarks.
+    """
+
+    def __init__(self, source_dir, latency=0.0, fail_rate=0.0):
+        self.source_dir = source_dir
+        self.latency = latency
+        self.fail_rate = fail_rate
+
+    def fetch(self, ticker, start, end):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise IOError('simulated failure fetching {}'.format(ticker))
+        df = pd.read_csv(os.path.join(self.source_dir, '{}.csv'.format(ticker)),
+                         index_col='Date', parse_dates=True)
+        return df[(df.index >= start) & (df.index <= end)]
+
+def read_tail(path):
+    """
+    Return (header columns, last complete date) of a CSV, reading only its
+    ends. A partially written last line is truncated so appends stay valid.
+    Without even a complete header line, returns (None, None): the file
+    has to be written again from scratch.
+    """
+    with open(path, 'rb+') as f:
+        header = f.readline().decode().strip().split(',')
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        block = 4096
+        while True:
+            # read back until the tail holds the whole last complete line
+            start = max(0, size - block)
+            f.seek(start)
+            tail = f.read()
+            if start == 0 or tail.count(b'\n') >= 2:
+                break
+            block *= 2
+        if not tail.endswith(b'\n'):
+            cut = tail.rfind(b'\n') + 1
+            if cut == 0:
+                # not even a complete header: nothing safe to append to
+                return None, None
+            f.truncate(start + cut)
+            tail = tail[:cut]
+    lines = tail.splitlines()
+    last = lines[-1].decode().split(',')[0] if lines else ''
+    if not last or last == header[0]:
+        return header, None
+    return header, pd.Timestamp(last)
+
+def refresh_ticker(provider, ticker, start, end, out_dir='stock_dfs', retries=3, backoff=1.0):
+    """Fetch only the bars after the last row of {ticker}.csv and append them. Returns rows added."""
+    path = os.path.join(out_dir, '{}.csv'.format(ticker))
+    header, last = read_tail(path) if os.path.exists(path) else (None, None)
+    fetch_start = start if last is None else last + dt.timedelta(days=1)
+    if fetch_start > end:
+        return 0
+
+    for attempt in range(retries + 1):
+        try:
+            df = provider.fetch(ticker, fetch_start, end)
+            break
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+    if last is not None:
+        df = df[df.index > last]
+    if df.empty:
+        return 0
+    df.index.name = 'Date'
+    if header is None:
+        df[[c for c in CSV_COLUMNS if c in df.columns]].to_csv(path)
+    else:
+        with open(path, 'a') as f:
+            df[header[1:]].to_csv(f, header=False)
+    return len(df)
+
+def download(tickers, provider, start, end, out_dir='stock_dfs', workers=16, retries=3, backoff=1.0):
+    """
+    Refresh every ticker on a bounded thread pool. Returns {ticker: rows added}
+    for the successes and {ticker: exception} for the failures.
+    """
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    def run(ticker):
+        try:
+            return ticker, refresh_ticker(provider, ticker, start, end, out_dir, retries, backoff), None
+        except Exception as e:
+            return ticker, None, e
+
+    added, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ticker, rows, error in pool.map(run, tickers):
+            if error is None:
+                added[ticker] = rows
+            else:
+                failed[ticker] = error
+                print('{} failed: {}'.format(ticker, error))
+    return added, failed
@@ -8,22 +8,28 @@ import pandas_datareader.data as web
 import datetime as dt
 import pandas as pd
 import numpy as np
+import correlation
+import profiling
 
 # style
 style.use('ggplot')
 
-def visualize_data():
-    df = pd.read_csv('sample_sp500_closes.csv')
-    df_corr = df.corr()
-    # print(df_corr.head())
+def visualize_data(closes_path='sample_sp500_closes.csv', corr_path='sample_sp500_corr.npz'):
+    # return correlations, computed once and written next to the closes file
+    df_corr = correlation.closes_corr(closes_path)
+    correlation.save_matrix(corr_path, df_corr.values, df_corr.columns)
+    with profiling.span('plot'):
+        plot_corr(df_corr)
+
+def plot_corr(df_corr):
     data = df_corr.values
     fig = plt.figure()
     ax = fig.add_subplot(1,1,1)
-    heatmap = ax.pcolor(data, cmap=plt.cm.RdYlGn)
+    # one raster image instead of a patch per cell
+    heatmap = ax.imshow(data, cmap=plt.cm.RdYlGn, interpolation='nearest', aspect='auto')
     fig.colorbar(heatmap)
-    ax.set_xticks(np.arange(data.shape[1])+0.5, minor = False)
-    ax.set_xticks(np.arange(data.shape[0])+0.5, minor = False)
-    ax.invert_yaxis()
+    ax.set_xticks(np.arange(data.shape[1]), minor = False)
+    ax.set_yticks(np.arange(data.shape[0]), minor = False)
     ax.xaxis.tick_top()
 
     column_lables = df_corr.columns
@@ -36,4 +42,5 @@ def visualize_data():
     plt.tight_layout()
     plt.show()
 
-visualize_data()
\ No newline at end of file
+if __name__ == "__main__":
+    visualize_data()
@@ -0,0 +1,188 @@
+"""
+Incremental version of indTemplate.get_ind_data: every indicator and trigger
+is updated in O(1) per new bar from per-symbol rolling state.
+The normalized (*_norm) plot columns are not produced, since they depend on
+the whole series.
+"""
+
+import os
+import math
+import pickle
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# columns produced on each update, named as in get_ind_data
+COLUMNS = ['SMA', 'rolling_std', 'top_bb', 'bot_bb', 'BB%', 'RS', 'RSI',
+           'momentum', 'momentum crossover', 'momentum signal',
+           '26 ema', '12 ema', 'MACD', 'Signal Line', 'Signal Line Crossover',
+           'Centerline Crossover', 'MACD signal',
+           'BB% trigger', 'RSI trigger', 'MACD trigger', 'momentum trigger', 'trigger']
+
+nan = float('nan')
+
+def _div(a, b):
+    # float division with numpy semantics (x/0 -> +-inf, 0/0 -> nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(a) / b)
+
+def _sign(x):
+    return nan if x != x else float((x > 0) - (x < 0))
+
+def _cross(x):
+    return 1 if x > 0 else (-1 if x < 0 else 0)
+
+class RollingWindow(object):
+    """Mean and sample std of the last n values (Welford add/remove); NaN until n valid values."""
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, x):
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+
+    def _remove(self, x):
+        self.count -= 1
+        if self.count == 0:
+            self.mean, self.m2 = 0.0, 0.0
+            return
+        d = x - self.mean
+        self.mean -= d / self.count
+        self.m2 -= d * (x - self.mean)
+
+    def update(self, x):
+        self.values.append(x)
+        if x == x:
+            self._add(x)
+        if len(self.values) > self.n:
+            old = self.values.popleft()
+            if old == old:
+                self._remove(old)
+
+    def average(self):
+        return self.mean if self.count >= self.n else nan
+
+    def std(self):
+        if self.count < self.n or self.count < 2:
+            return nan
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+class EWMA(object):
+    """pd.ewma(span=...) with its default adjust=True, one value at a time."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.avg = nan
+        self.old_wt = 1.0
+
+    def update(self, x):
+        if self.avg == self.avg:
+            self.old_wt *= 1 - self.alpha
+            if x == x:
+                if self.avg != x:
+                    self.avg = (self.old_wt * self.avg + x) / (self.old_wt + 1.0)
+                self.old_wt += 1.0
+        elif x == x:
+            self.avg = x
+        return self.avg
+
+class IndicatorState(object):
+    """Rolling state of one symbol."""
+
+    def __init__(self, lookback=14, momentum_period=14):
+        self.prices = RollingWindow(lookback)
+        self.up = RollingWindow(lookback)
+        self.down = RollingWindow(lookback)
+        self.history = deque(maxlen=momentum_period + 1)
+        self.ema26, self.ema12, self.signal = EWMA(26), EWMA(12), EWMA(9)
+        self.prev_price = nan
+        self.prev_momentum_cross = None
+        self.prev_signal_cross = None
+
+    def update(self, price):
+        """Feed the next close; return {column: value} for this bar."""
+        price = float(price)
+        row = {}
+
+        self.prices.update(price)
+        sma, std = self.prices.average(), self.prices.std()
+        row['SMA'], row['rolling_std'] = sma, std
+        row['top_bb'], row['bot_bb'] = sma + 2 * std, sma - 2 * std
+        row['BB%'] = _div(price - row['bot_bb'], row['top_bb'] - row['bot_bb'])
+
+        diff = price - self.prev_price
+        self.prev_price = price
+        self.up.update(max(diff, 0.0) if diff == diff else nan)
+        self.down.update(min(diff, 0.0) if diff == diff else nan)
+        row['RS'] = _div(self.up.average(), abs(self.down.average()))
+        row['RSI'] = 100 - _div(100, 1 + row['RS'])
+
+        self.history.append(price)
+        if len(self.history) == self.history.maxlen:
+            row['momentum'] = _div(price, self.history[0]) - 1
+        else:
+            row['momentum'] = nan
+        cross = _cross(row['momentum'])
+        row['momentum crossover'] = cross
+        row['momentum signal'] = nan if self.prev_momentum_cross is None \
+            else _sign(cross - self.prev_momentum_cross)
+        self.prev_momentum_cross = cross
+
+        row['26 ema'] = self.ema26.update(price)
+        row['12 ema'] = self.ema12.update(price)
+        row['MACD'] = row['12 ema'] - row['26 ema']
+        row['Signal Line'] = self.signal.update(row['MACD'])
+        cross = _cross(row['MACD'] - row['Signal Line'])
+        row['Signal Line Crossover'] = cross
+        row['Centerline Crossover'] = _cross(row['MACD'])
+        row['MACD signal'] = nan if self.prev_signal_cross is None \
+            else _sign(cross - self.prev_signal_cross)
+        self.prev_signal_cross = cross
+
+        row['BB% trigger'] = 1 if row['BB%'] < 0.2 else (-1 if row['BB%'] > 0.8 else 0)
+        row['RSI trigger'] = 1 if row['RSI'] < 30 else (-1 if row['RSI'] > 70 else 0)
+        row['MACD trigger'] = _cross(row['MACD signal'])
+        row['momentum trigger'] = _cross(row['momentum signal'])
+        row['trigger'] = 2 * row['BB% trigger'] + 2 * row['RSI trigger'] + \
+            row['MACD signal'] + row['momentum trigger']
+        return row
+
+class IndicatorEngine(object):
+    """Per-symbol IndicatorState, with checkpoint/restore so state survives restarts."""
+
+    def __init__(self, lookback=14, momentum_period=14):
+        self.lookback = lookback
+        self.momentum_period = momentum_period
+        self.states = {}
+
+    def update(self, symbol, price):
+        if symbol not in self.states:
+            self.states[symbol] = IndicatorState(self.lookback, self.momentum_period)
+        return self.states[symbol].update(price)
+
+    def update_bar(self, prices):
+        """Feed one bar of {symbol: close}; return {symbol: row}."""
+        return dict((s, self.update(s, p)) for s, p in prices.items())
+
+    def replay(self, symbol, series):
+        """Feed a whole price Series; return the rows as a DataFrame like get_ind_data's."""
+        rows = [self.update(symbol, p) for p in series.values]
+        return pd.DataFrame(rows, index=series.index, columns=COLUMNS)
+
+    def checkpoint(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def restore(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -1,11 +1,11 @@
 # indicators.py
 # Your code that implements your indicators as functions that operate on dataframes.
 # The "main" code in indicators.py should generate the charts that illustrate your indicators in the report.
-import util
+import utilities as util
 import numpy as np
 import pandas as pd
 import datetime as dt
-import matplotlib.pyplot as plt
+import profiling
 
 def normalize(data):
     na_ind = np.where(np.isnan(data))[0]
@@ -15,16 +15,18 @@ def normalize(data):
         first = 0
     return data/data.iloc[first]
 
+@profiling.timed('get_ind_data', 'indicator')
 def get_ind_data(symbol, start_date, end_date, lookback=14, momentum_period=14):
     # this function will calculate SMA ratio, Bollinger Bands, RSI, Momentum, and MACD
     date_range = pd.date_range(start_date, end_date)
-    ind_df = util.get_data([symbol], date_range)
+    with profiling.span('load'):
+        ind_df = util.get_data([symbol], date_range)
 
     # calculate SMA:
-    ind_df['SMA'] = pd.rolling_mean(ind_df[symbol],window=lookback, min_periods=lookback)
+    ind_df['SMA'] = ind_df[symbol].rolling(window=lookback, min_periods=lookback).mean()
 
     # calculate Bollinger Bands %
-    ind_df['rolling_std'] = pd.rolling_std(ind_df[symbol],window=lookback, min_periods=lookback)
+    ind_df['rolling_std'] = ind_df[symbol].rolling(window=lookback, min_periods=lookback).std()
     ind_df['top_bb'] = ind_df['SMA'] + (2 * ind_df['rolling_std'])
     ind_df['bot_bb'] = ind_df['SMA'] - (2 * ind_df['rolling_std'])
     ind_df['BB%'] = (ind_df[symbol] - ind_df['bot_bb']) / (ind_df['top_bb'] - ind_df['bot_bb'])
@@ -33,8 +35,8 @@ def get_ind_data(symbol, start_date, end_date, lookback=14, momentum_period=14):
     dUp, dDown = ind_df[symbol].diff(), ind_df[symbol].diff()
     dUp[dUp < 0] = 0
     dDown[dDown > 0] = 0
-    RolUp = pd.rolling_mean(dUp, lookback)
-    RolDown = pd.rolling_mean(dDown, lookback).abs()
+    RolUp = dUp.rolling(lookback).mean()
+    RolDown = dDown.rolling(lookback).mean().abs()
     ind_df['RS'] = RolUp / RolDown
     ind_df['RSI'] = 100 - (100 / (1 + ind_df['RS']))
 
@@ -53,10 +55,10 @@ def get_ind_data(symbol, start_date, end_date, lookback=14, momentum_period=14):
     ind_df['price/SMA_norm'] = ind_df['price_norm'] / ind_df['SMA_norm']
 
     # calculate MACD:
-    ind_df['26 ema'] = pd.ewma(ind_df[symbol], span=26)
-    ind_df['12 ema'] = pd.ewma(ind_df[symbol], span=12)
+    ind_df['26 ema'] = ind_df[symbol].ewm(span=26).mean()
+    ind_df['12 ema'] = ind_df[symbol].ewm(span=12).mean()
     ind_df['MACD'] = (ind_df['12 ema'] - ind_df['26 ema'])
-    ind_df['Signal Line'] = pd.ewma(ind_df['MACD'], span=9)
+    ind_df['Signal Line'] = ind_df['MACD'].ewm(span=9).mean()
     ind_df['Signal Line Crossover'] = np.where(ind_df['MACD'] > ind_df['Signal Line'], 1, 0)
     ind_df['Signal Line Crossover'] = np.where(ind_df['MACD'] < ind_df['Signal Line'], -1, ind_df['Signal Line Crossover'])
     ind_df['Centerline Crossover'] = np.where(ind_df['MACD'] > 0, 1, 0)
@@ -65,33 +67,29 @@ def get_ind_data(symbol, start_date, end_date, lookback=14, momentum_period=14):
 
     # Buy/Sell signals: 0:'HOLD', 1:'BUY', -1: 'SELL'
     ind_df['BB% trigger'] = 0
-    ind_df['BB% trigger'][ind_df['BB%'] < 0.2] = 1
-    ind_df['BB% trigger'][ind_df['BB%'] > 0.8] = -1
+    ind_df.loc[ind_df['BB%'] < 0.2, 'BB% trigger'] = 1
+    ind_df.loc[ind_df['BB%'] > 0.8, 'BB% trigger'] = -1
 
     ind_df['RSI trigger'] = 0
-    ind_df['RSI trigger'][ind_df['RSI'] < 30] = 1
-    ind_df['RSI trigger'][ind_df['RSI'] > 70] = -1
+    ind_df.loc[ind_df['RSI'] < 30, 'RSI trigger'] = 1
+    ind_df.loc[ind_df['RSI'] > 70, 'RSI trigger'] = -1
 
     ind_df['MACD trigger']= 0
-    ind_df['MACD trigger'][ind_df['MACD signal']== 1] = 1
-    ind_df['MACD trigger'][ind_df['MACD signal'] == -1] = -1
+    ind_df.loc[ind_df['MACD signal'] == 1, 'MACD trigger'] = 1
+    ind_df.loc[ind_df['MACD signal'] == -1, 'MACD trigger'] = -1
 
     ind_df['momentum trigger'] = 0
-    ind_df['momentum trigger'][ind_df['momentum signal'] == 1] = 1
-    ind_df['momentum trigger'][ind_df['momentum signal'] == -1] = -1
+    ind_df.loc[ind_df['momentum signal'] == 1, 'momentum trigger'] = 1
+    ind_df.loc[ind_df['momentum signal'] == -1, 'momentum trigger'] = -1
 
     ind_df['trigger'] = (2*ind_df['BB% trigger'] + 2*ind_df['RSI trigger'] + ind_df['MACD signal'] +  ind_df['momentum trigger'])
 
     return ind_df
 
 
-if __name__ == "__main__":
-    start_date = dt.datetime(2008, 01, 01)
-    end_date = dt.datetime(2009, 12, 31)
-    symbol = 'JPM'
-    lookback = 15
-    momentum_period = 20
-    df = get_ind_data(symbol, start_date, end_date, lookback, momentum_period)
+@profiling.timed('plot_indicators', 'plot')
+def plot_indicators(df, symbol):
+    import matplotlib.pyplot as plt
     # f = plt.figure()
     # plot normalized price
     df.plot(y=['price_norm'], title='normalized adjusted closing price')
@@ -126,4 +124,14 @@ if __name__ == "__main__":
     plt.savefig('figure 1_8.pdf')
     # df.plot(y=['Centerline Crossover', 'MACD signal'], title='Signal Line & Centerline Crossovers', ylim=(-1.5, 1.5))
     # plt.savefig('figure 1_9.pdf')
-    # plt.show()
\ No newline at end of file
+    # plt.show()
+
+
+if __name__ == "__main__":
+    start_date = dt.datetime(2008, 1, 1)
+    end_date = dt.datetime(2009, 12, 31)
+    symbol = 'JPM'
+    lookback = 15
+    momentum_period = 20
+    df = get_ind_data(symbol, start_date, end_date, lookback, momentum_period)
+    plot_indicators(df, symbol)
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""Vectorized multi-horizon labeling (array form of classifiers.stock_decision)."""
+
+import numpy as np
+
+def forward_returns(prices, hm_days=7):
+    """
+    Return the forward returns (p[t+i] - p[t]) / p[t] for i = 1..hm_days.
+    prices is (rows,) or (rows, tickers); the result gains a trailing horizon
+    axis, i.e. (rows, hm_days) or (rows, tickers, hm_days). Rows without
+    i days ahead are NaN.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    fwd = np.full(prices.shape + (hm_days,), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(1, min(hm_days, len(prices) - 1) + 1):
+            fwd[:-i, ..., i - 1] = (prices[i:] - prices[:-i]) / prices[:-i]
+    return fwd
+
+def first_crossing(fwd, requirement=0.02):
+    """
+    Label each row by the first horizon whose return crosses +/-requirement:
+    1 if it rises above, -1 if it falls below, 0 if no horizon crosses.
+    Works on any (..., horizons) array; NaN never crosses.
+    """
+    up = fwd > requirement
+    hit = up | (fwd < -requirement)
+    first = hit.argmax(axis=-1)[..., np.newaxis]
+    label = np.where(np.take_along_axis(up, first, axis=-1)[..., 0], 1, -1)
+    return np.where(hit.any(axis=-1), label, 0).astype(np.int8)
+
+def label_panel(prices, hm_days=7, requirement=0.02):
+    """Return (labels, forward returns) for a whole (rows x tickers) price panel at once."""
+    fwd = forward_returns(prices, hm_days)
+    return first_crossing(fwd, requirement), fwd
@@ -0,0 +1,131 @@
+"""
+Content-addressed on-disk cache for features, labels and fitted models.
+
+Entries are keyed by a fingerprint of everything that determines them:
+the bytes of the input files and arrays, the parameters, and the source
+of the code that computes them. A repeat run with the same inputs and
+code loads the entry instead of recomputing it; a changed input or an
+edited function produces a new key. The cache keeps the total size under max_bytes
+by evicting the least recently used entries.
+"""
+
+import os
+import pickle
+import hashlib
+import inspect
+import numpy as np
+
+_file_hashes = {}
+
+def file_fingerprint(path):
+    """sha1 of a file's bytes, rehashed only when its size or mtime changes."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if key not in _file_hashes:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+def code_fingerprint(*objects):
+    """
+    sha1 of the source of functions, classes or modules, for keys that
+    must change when the code computing an entry is edited. Code without
+    source falls back to its bytecode.
+    """
+    digest = hashlib.sha1()
+    for obj in objects:
+        try:
+            source = inspect.getsource(obj).encode()
+        except (OSError, TypeError):
+            code = getattr(obj, '__code__', None)
+            source = code.co_code + repr(code.co_consts).encode() if code else repr(obj).encode()
+        digest.update(source)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def fingerprint(*parts):
+    """
+    Hash a mix of arrays (by dtype, shape and bytes) and plain values (by
+    repr) into one key.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update('{}{}'.format(part.dtype.str, part.shape).encode())
+            digest.update(part.data)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class DiskCache(object):
+    """Pickled entries in path/<key>.pkl; the file mtime is the last access time."""
+
+    def __init__(self, path='cache', max_bytes=2 * 1024 ** 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def get(self, key, default=None):
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return default
+        os.utime(path, None)
+        return value
+
+    def put(self, key, value):
+        path = self._file(key)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def memoize(self, key, compute):
+        """Return the entry for key, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def entries(self):
+        """[(last access, size, path)] of every entry, least recently used first."""
+        out = []
+        for name in os.listdir(self.path):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.path, name)
+                stat = os.stat(path)
+                out.append((stat.st_mtime, stat.st_size, path))
+        return sorted(out)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,255 @@
+"""
+Minute-bar store, chunked by ticker and month.
+
+Layout under path (default minute_dfs):
+
+    index.json                  {ticker: {'YYYY-MM': [first minute, last minute, rows]}}
+    <ticker>/<YYYY-MM>.npz      compressed columns: minute (int64 minutes since
+                                1970-01-01), Open/High/Low/Close (float32),
+                                Volume (float64), and days/day_starts, the
+                                rows where each trading day begins
+
+Times are exchange-local and naive, as the daily CSVs' dates are. A
+month file is about 8k rows (390 bars x 21 days), so reading a day or a
+month decompresses one small file, and a range query only opens the months
+the index says overlap it. Nothing ever loads a ticker's full history. For
+500 tickers that is about 6k files a year; recently read months are kept
+in an LRU cache.
+
+Prices are stored as float32, which keeps about 7 significant digits: a
+price under $1000 reads back within 1e-4 of what was written, and any
+price in cents below $100,000 rounds back to the same cents. Volume is
+kept as float64 and reads back exactly.
+
+quantopian/runtime.py reads this store for run_algorithm(...,
+frequency='minute'). To build it from one minute CSV per ticker
+(Datetime,Open,High,Low,Close,Volume):
+
+    python minuteStore.py minute_csvs --out minute_dfs
+
+or from Python:
+
+    store = MinuteStore('minute_dfs')
+    store.ingest_csv('AAPL_minutes.csv', 'AAPL')
+    store.day('AAPL', '2016-03-01')
+    store.universe(tickers, '2016-03-01 11:00', '2016-03-01 11:30')
+"""
+
+import os
+import json
+import argparse
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+PRICE_DTYPE = np.float32
+STORE_DIR = 'minute_dfs'
+INDEX_FILE = 'index.json'
+CHUNK_ROWS = 500000
+
+def to_minute_ints(times):
+    """Convert timestamps (strings or datetimes) to int64 minutes since 1970-01-01."""
+    return np.asarray(pd.to_datetime(times).values.astype('datetime64[m]').astype(np.int64))
+
+def from_minute_ints(minutes):
+    minutes = np.asarray(minutes).astype('datetime64[m]').astype('datetime64[ns]')
+    return pd.DatetimeIndex(minutes, name='Datetime')
+
+def month_keys(minutes):
+    """'YYYY-MM' of each minute."""
+    return np.asarray(minutes).astype('datetime64[m]').astype('datetime64[M]').astype(str)
+
+class MinuteStore(object):
+    def __init__(self, path=STORE_DIR, cache_months=64):
+        self.path = path
+        self.cache_months = cache_months
+        self._cache = OrderedDict()
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def tickers(self):
+        return sorted(self.index)
+
+    def months(self, ticker):
+        return sorted(self.index.get(ticker, {}))
+
+    def _file(self, ticker, month):
+        return os.path.join(self.path, ticker, '{}.npz'.format(month))
+
+    def _save_index(self):
+        path = os.path.join(self.path, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.index, f)
+        os.replace(path + '.tmp', path)
+
+    def _load(self, ticker, month):
+        """{column: array} of one month file, or None if there is none."""
+        key = (ticker, month)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if month not in self.index.get(ticker, {}):
+            return None
+        with np.load(self._file(ticker, month)) as npz:
+            data = dict((name, npz[name]) for name in npz.files)
+        self._cache[key] = data
+        while len(self._cache) > self.cache_months:
+            self._cache.popitem(last=False)
+        return data
+
+    def _write_month(self, ticker, month, minutes, columns):
+        old = self._load(ticker, month)
+        if old is not None:
+            # merge: bars already stored are replaced by new bars at the same minute
+            minutes = np.concatenate([old['minute'], minutes])
+            columns = dict((f, np.concatenate([old[f], columns[f]])) for f in FIELDS)
+        order = np.argsort(minutes, kind='mergesort')
+        minutes = minutes[order]
+        last = np.append(minutes[1:] != minutes[:-1], True)
+        keep = order[last]
+        minutes = minutes[last]
+        data = {'minute': minutes}
+        for f in FIELDS:
+            data[f] = columns[f][keep].astype(np.float64 if f == 'Volume' else PRICE_DTYPE)
+        days = minutes // 1440
+        data['day_starts'] = np.concatenate([[0], np.flatnonzero(np.diff(days)) + 1])
+        data['days'] = days[data['day_starts']]
+
+        path = self._file(ticker, month)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **data)
+        os.replace(path + '.tmp', path)
+        self._cache.pop((ticker, month), None)
+        self.index.setdefault(ticker, {})[month] = [int(minutes[0]), int(minutes[-1]), len(minutes)]
+
+    def _write(self, ticker, minutes, columns):
+        months = month_keys(minutes)
+        for month in np.unique(months):
+            rows = np.flatnonzero(months == month)
+            self._write_month(ticker, str(month), minutes[rows], dict((f, columns[f][rows]) for f in FIELDS))
+
+    def write(self, ticker, df):
+        """Merge a frame of minute bars (DatetimeIndex, FIELDS columns) into the store."""
+        minutes = to_minute_ints(df.index)
+        self._write(ticker, minutes, dict((f, np.asarray(df[f], dtype=np.float64)) for f in FIELDS))
+        self._save_index()
+
+    def ingest_csv(self, path, ticker, time_col='Datetime', chunk_rows=CHUNK_ROWS):
+        """
+        Read a minute CSV in chunks of rows, writing each month as soon as a
+        later one starts, so memory is bounded by a chunk plus one month.
+        Returns the number of rows read.
+        """
+        pending_minutes, pending, rows = [], [], 0
+        for chunk in pd.read_csv(path, usecols=[time_col] + FIELDS, chunksize=chunk_rows,
+                                 na_values=['nan']):
+            rows += len(chunk)
+            pending_minutes.append(to_minute_ints(chunk[time_col]))
+            pending.append(chunk)
+            minutes = np.concatenate(pending_minutes)
+            frame = pd.concat(pending)
+            months = month_keys(minutes)
+            # the last month may continue into the next chunk
+            done = months != months[-1]
+            if done.any():
+                self._write(ticker, minutes[done], dict((f, frame[f].values[done]) for f in FIELDS))
+                pending_minutes, pending = [minutes[~done]], [frame[~done]]
+        if pending_minutes:
+            minutes = np.concatenate(pending_minutes)
+            if len(minutes):
+                frame = pd.concat(pending)
+                self._write(ticker, minutes, dict((f, frame[f].values) for f in FIELDS))
+        self._save_index()
+        return rows
+
+    def _frame(self, data, lo, hi, fields):
+        return pd.DataFrame(dict((f, data[f][lo:hi]) for f in fields),
+                            index=from_minute_ints(data['minute'][lo:hi]), columns=fields)
+
+    def day(self, ticker, day, fields=None):
+        """Bars of ticker on one day (a date or date string)."""
+        fields = fields or FIELDS
+        day = int(to_minute_ints([day])[0] // 1440)
+        data = self._load(ticker, str(month_keys([day * 1440])[0]))
+        if data is None:
+            return self._empty(fields)
+        pos = np.searchsorted(data['days'], day)
+        if pos == len(data['days']) or data['days'][pos] != day:
+            return self._frame(data, 0, 0, fields)
+        starts = np.append(data['day_starts'], len(data['minute']))
+        return self._frame(data, starts[pos], starts[pos + 1], fields)
+
+    def month(self, ticker, month, fields=None):
+        """Bars of ticker in one month ('YYYY-MM')."""
+        fields = fields or FIELDS
+        data = self._load(ticker, month)
+        if data is None:
+            return self._empty(fields)
+        return self._frame(data, 0, len(data['minute']), fields)
+
+    def _empty(self, fields):
+        data = dict((f, np.empty(0)) for f in fields)
+        data['minute'] = np.empty(0, np.int64)
+        return self._frame(data, 0, 0, fields)
+
+    def span(self, ticker, start, end):
+        """Yield (month data, lo, hi) for the rows of ticker in [start, end]."""
+        lo_min, hi_min = to_minute_ints([start, end])
+        for month, (first, last, _) in sorted(self.index.get(ticker, {}).items()):
+            if last < lo_min or first > hi_min:
+                continue
+            data = self._load(ticker, month)
+            lo = np.searchsorted(data['minute'], lo_min)
+            hi = np.searchsorted(data['minute'], hi_min, side='right')
+            if hi > lo:
+                yield data, lo, hi
+
+    def range(self, ticker, start, end, fields=None):
+        """Bars of ticker with start <= time <= end."""
+        fields = fields or FIELDS
+        parts = [self._frame(data, lo, hi, fields) for data, lo, hi in self.span(ticker, start, end)]
+        if not parts:
+            return self._empty(fields)
+        return pd.concat(parts)
+
+    def universe(self, tickers, start, end, field='Close'):
+        """(minutes x tickers) DataFrame of one field, NaN where a ticker has no bar."""
+        spans = []
+        for ticker in tickers:
+            parts = list(self.span(ticker, start, end))
+            spans.append((np.concatenate([d['minute'][lo:hi] for d, lo, hi in parts]) if parts
+                          else np.empty(0, np.int64),
+                          np.concatenate([d[field][lo:hi] for d, lo, hi in parts]) if parts else np.empty(0)))
+        minutes = np.unique(np.concatenate([m for m, _ in spans])) if spans else np.empty(0, np.int64)
+        panel = np.full((len(minutes), len(tickers)), np.nan)
+        for col, (m, values) in enumerate(spans):
+            panel[np.searchsorted(minutes, m), col] = values
+        return pd.DataFrame(panel, index=from_minute_ints(minutes), columns=list(tickers))
+
+def ingest_dir(csv_dir, path=STORE_DIR, tickers=None, time_col='Datetime'):
+    """Ingest every {ticker}.csv of minute bars in csv_dir."""
+    store = MinuteStore(path)
+    if tickers is None:
+        tickers = sorted(f[:-4] for f in os.listdir(csv_dir) if f.endswith('.csv'))
+    for ticker in tickers:
+        rows = store.ingest_csv(os.path.join(csv_dir, '{}.csv'.format(ticker)), ticker, time_col)
+        print('{}: {} bars'.format(ticker, rows))
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ingest per-ticker minute CSVs into a minute store.')
+    parser.add_argument('csv_dir', help='directory of {ticker}.csv minute bars')
+    parser.add_argument('--out', default=STORE_DIR)
+    parser.add_argument('--time-col', default='Datetime')
+    args = parser.parse_args()
+    if not os.path.isdir(args.csv_dir):
+        parser.error('{} is not a directory'.format(args.csv_dir))
+    ingest_dir(args.csv_dir, args.out, time_col=args.time_col)
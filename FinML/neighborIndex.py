@@ -0,0 +1,247 @@
+"""
+Partition-based nearest-neighbour index for the KNN voter in do_ml.
+
+fit() optionally projects the return vectors onto fewer orthonormal
+directions (PCA or a random projection), splits the projections into
+k-means cells once, and stores every cell's points together with its
+radius. A query visits cells in order of the lower bound
+max(0, |q - centroid| - radius) on their distance. The projection only
+decides which cells are visited: the points in them are scored by their
+true distance in the full space, which the projected bound never
+overestimates. With n_probe set it visits that many cells (approximate).
+Otherwise (exact) it visits a few, and only the queries for which some
+other cell's bound is still below their k-th best distance are finished
+against every point. A reduction makes those bounds looser, so more
+queries fall through to the full scan, not fewer. Queries are processed
+in batches: each round, the queries whose next cell is the same are
+scored against it with one matrix product.
+
+The index is not always faster than a brute-force search. On the
+50-column sample closes (3000 training rows, 1277 queries, k=5),
+KNeighborsClassifier(algorithm='brute') took 0.025s. The exact index
+took 0.09s (0.085s with PCA to 8), and n_probe=4 took 0.03s and found
+87% of the true neighbours (81% with PCA to 8): high-dimensional return
+vectors leave the cell bounds little to prune. The index pays on many
+low-dimensional rows. On 35000 training rows of 8-dimensional data and
+5000 queries, n_probe=10 took 0.48s against brute force's 0.79s and
+found 98.5% of the true neighbours; the exact index took 2.9s. So build
+the voter with make_knn, which times the index against brute force on
+held-out training rows and returns it only when it is faster and finds
+at least min_recall of the true neighbours:
+
+    knn = neighborIndex.make_knn(X_train)
+    classifiers.make_classifier(knn=knn)
+"""
+
+import time
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import KNeighborsClassifier
+
+# cells an exact query visits before finishing by brute force, if it still has to
+EXACT_PROBES = 3
+CHUNK_BYTES = 64 * 1024 ** 2
+# index settings make_knn tries against brute force
+CANDIDATES = [{}, {'n_probe': 4}, {'n_probe': 10}, {'reduce': 'pca', 'n_probe': 10}]
+
+def _sqdist(a, b, b_sq=None):
+    b_sq = (b * b).sum(axis=1) if b_sq is None else b_sq
+    return np.maximum((a * a).sum(axis=1)[:, np.newaxis] - 2 * a.dot(b.T) + b_sq, 0)
+
+def kmeans(points, n_clusters, iterations=10, seed=None, sample_per_cluster=50):
+    """
+    Lloyd's k-means, fit on a sample of about sample_per_cluster points per
+    cluster; returns (centroids, assignment of every point).
+    """
+    rng = np.random.RandomState(seed)
+    sample = points
+    if len(points) > sample_per_cluster * n_clusters:
+        sample = points[rng.choice(len(points), sample_per_cluster * n_clusters, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _sqdist(sample, centroids).argmin(axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+    return centroids, _sqdist(points, centroids).argmin(axis=1)
+
+class NeighborIndex(object):
+    """
+    reduce: None, 'pca' or 'random'; n_components: its output dimension.
+    n_partitions defaults to about sqrt(n); n_probe None means exact.
+    """
+
+    def __init__(self, reduce=None, n_components=16, n_partitions=None, n_probe=None, seed=0):
+        self.reduce = reduce
+        self.n_components = n_components
+        self.n_partitions = n_partitions
+        self.n_probe = n_probe
+        self.seed = seed
+
+    def _fit_transform(self, X):
+        d = min(self.n_components, X.shape[1])
+        self.mean = X.mean(axis=0)
+        if self.reduce == 'pca':
+            _, _, vt = np.linalg.svd(X - self.mean, full_matrices=False)
+            self.components = vt[:d].T
+        elif self.reduce == 'random':
+            rng = np.random.RandomState(self.seed)
+            # orthonormal, so projected distances never exceed true ones
+            self.components = np.linalg.qr(rng.normal(size=(X.shape[1], d)))[0]
+        else:
+            self.components = None
+        return self.transform(X)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X if self.components is None else (X - self.mean).dot(self.components)
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        Z = self._fit_transform(X)
+        n_parts = self.n_partitions or max(1, int(np.sqrt(len(Z))))
+        n_parts = min(n_parts, len(Z))
+        self.centroids, assign = kmeans(Z, n_parts, seed=self.seed)
+        self.perm = np.argsort(assign, kind='mergesort')  # stored position -> training row
+        # cells are found in the projected space, points are scored in the full one
+        self.points = X[self.perm]
+        self.points_sq = (self.points ** 2).sum(axis=1)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_parts))])
+        d = np.sqrt(_sqdist(Z[self.perm], self.centroids)[np.arange(len(Z)), assign[self.perm]])
+        self.radius = np.array([d[self.offsets[p]:self.offsets[p + 1]].max() if self.offsets[p + 1] > self.offsets[p]
+                                else 0.0 for p in range(n_parts)])
+        return self
+
+    def query(self, X, k=5):
+        """(squared distances, training rows) of the k nearest neighbours of each row of X, nearest first."""
+        Q = np.asarray(X, dtype=np.float64)
+        m = len(Q)
+        k = min(k, len(self.points))
+        # distances are ranked as |p|^2 - 2 q.p, i.e. without the constant |q|^2
+        q_sq = (Q * Q).sum(axis=1)
+        best_d = np.full((m, k), np.inf)
+        best_i = np.zeros((m, k), dtype=np.int64)
+
+        centre = np.sqrt(_sqdist(self.transform(Q), self.centroids))
+        lower = np.maximum(centre - self.radius, 0) ** 2 - q_sq[:, np.newaxis]
+        # by lower bound, then (among cells the bound can't rule out) nearest centroid first
+        order = np.lexsort((centre, lower), axis=1)
+        n_cells = len(self.centroids)
+        rounds = min(self.n_probe or EXACT_PROBES, n_cells)
+        for r in range(rounds):
+            cell = order[:, r]
+            # a query is finished once its next cell can't hold anything closer
+            active = lower[np.arange(m), cell] < best_d[:, -1]
+            for p in np.unique(cell[active]):
+                rows = np.flatnonzero(active & (cell == p))
+                lo, hi = self.offsets[p], self.offsets[p + 1]
+                d = self.points_sq[lo:hi] - 2 * Q[rows].dot(self.points[lo:hi].T)
+                self._merge(best_d, best_i, rows, d, np.arange(lo, hi), k)
+
+        if self.n_probe is None and rounds < n_cells:
+            # exact: queries that some unvisited cell could still improve are
+            # finished against every point in one matrix product
+            rows = np.flatnonzero(lower[np.arange(m), order[:, rounds]] < best_d[:, -1])
+            best_d[rows] = np.inf
+            positions = np.arange(len(self.points))
+            # in blocks of queries, so the distance matrix stays near CHUNK_BYTES
+            step = max(1, CHUNK_BYTES // (8 * len(self.points)))
+            for lo in range(0, len(rows), step):
+                block = rows[lo:lo + step]
+                d = self.points_sq - 2 * Q[block].dot(self.points.T)
+                self._merge(best_d, best_i, block, d, positions, k)
+        return np.maximum(best_d + q_sq[:, np.newaxis], 0), self.perm[best_i]
+
+    @staticmethod
+    def _merge(best_d, best_i, rows, d, positions, k):
+        """Fold the distances d from rows to points at positions into the sorted k best."""
+        if d.shape[1] >= k:
+            # only the k best of the new block can make it
+            part = np.argpartition(d, k - 1, axis=1)[:, :k]
+            d, positions = np.take_along_axis(d, part, axis=1), positions[part]
+        else:
+            positions = np.broadcast_to(positions, d.shape)
+        all_d = np.concatenate([best_d[rows], d], axis=1)
+        all_i = np.concatenate([best_i[rows], positions], axis=1)
+        keep = np.argsort(all_d, axis=1, kind='mergesort')[:, :k]
+        best_d[rows] = np.take_along_axis(all_d, keep, axis=1)
+        best_i[rows] = np.take_along_axis(all_i, keep, axis=1)
+
+class IndexedKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """KNeighborsClassifier (uniform weights) backed by a NeighborIndex built once in fit."""
+
+    def __init__(self, n_neighbors=5, reduce=None, n_components=16, n_partitions=None, n_probe=None,
+                 random_state=0):
+        self.n_neighbors = n_neighbors
+        self.reduce = reduce
+        self.n_components = n_components
+        self.n_partitions = n_partitions
+        self.n_probe = n_probe
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        self.classes_, self._y = np.unique(y, return_inverse=True)
+        self.index_ = NeighborIndex(self.reduce, self.n_components, self.n_partitions,
+                                    self.n_probe, self.random_state).fit(X)
+        return self
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        d, rows = self.index_.query(X, n_neighbors or self.n_neighbors)
+        return (np.sqrt(d), rows) if return_distance else rows
+
+    def predict_proba(self, X):
+        rows = self.kneighbors(X, return_distance=False)
+        counts = np.stack([(self._y[rows] == c).sum(axis=1) for c in range(len(self.classes_))], axis=1)
+        return counts / float(rows.shape[1])
+
+    def predict(self, X):
+        # argmax picks the smallest class on ties, as KNeighborsClassifier does
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def _best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        out = func()
+        times.append(time.time() - start)
+    return min(times), out
+
+def compare(X_train, X_test, n_neighbors=5, repeat=3, **params):
+    """
+    Time an IndexedKNeighborsClassifier built with params against
+    KNeighborsClassifier(algorithm='brute') on the same neighbour queries.
+    Returns {'index': seconds, 'brute': seconds, 'recall'}, recall being the
+    share of the true k nearest neighbours the index returns.
+    """
+    y = np.zeros(len(X_train), dtype=np.int64)
+    brute = KNeighborsClassifier(n_neighbors, algorithm='brute').fit(X_train, y)
+    index = IndexedKNeighborsClassifier(n_neighbors, **params).fit(X_train, y)
+    brute_s, truth = _best_time(lambda: brute.kneighbors(X_test, return_distance=False), repeat)
+    index_s, found = _best_time(lambda: index.kneighbors(X_test, return_distance=False), repeat)
+    hits = sum(len(np.intersect1d(a, b)) for a, b in zip(found, truth))
+    return {'index': index_s, 'brute': brute_s, 'recall': hits / float(truth.size)}
+
+def make_knn(X, n_neighbors=5, min_recall=0.95, candidates=CANDIDATES, test_size=0.25, seed=0):
+    """
+    The fastest KNN voter for training rows X: the candidate that beats
+    brute force by the most, with at least min_recall, on test_size of
+    X's rows held out as queries (do_ml's split, so batches are the size
+    predict will see), or KNeighborsClassifier(algorithm='brute') if none
+    does.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    rows = np.random.RandomState(seed).permutation(len(X))
+    n_test = max(1, int(len(X) * test_size))
+    queries, train = X[rows[:n_test]], X[rows[n_test:]]
+    best, best_s = None, None
+    for params in candidates:
+        result = compare(train, queries, n_neighbors, **params)
+        if best_s is None:
+            best_s = result['brute']
+        if result['recall'] >= min_recall and result['index'] < best_s:
+            best, best_s = params, result['index']
+    if best is None:
+        return KNeighborsClassifier(n_neighbors, algorithm='brute')
+    return IndexedKNeighborsClassifier(n_neighbors, random_state=seed, **best)
@@ -0,0 +1,110 @@
+"""
+get_ind_data for a whole (dates x tickers) close panel at once.
+Every indicator comes back as one 2-D array with the same shape as the panel.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import priceStore
+
+def _windows(a, w):
+    # (rows - w + 1, tickers, w) view; NaN in a window propagates like min_periods=w
+    return sliding_window_view(a, w, axis=0)
+
+def rolling_mean(a, w):
+    out = np.full(a.shape, np.nan)
+    if len(a) >= w:
+        out[w - 1:] = _windows(a, w).mean(axis=-1)
+    return out
+
+def rolling_std(a, w):
+    out = np.full(a.shape, np.nan)
+    if len(a) >= w:
+        out[w - 1:] = _windows(a, w).std(axis=-1, ddof=1)
+    return out
+
+def shift(a, n):
+    # a[:len(a) - n], not a[:-n], so n == 0 copies every row instead of none
+    out = np.full(a.shape, np.nan)
+    out[n:] = a[:max(len(a) - n, 0)]
+    return out
+
+def ewma(a, span):
+    """pd.ewma(span=...) (adjust=True) down every column; one vector step per row."""
+    alpha = 2.0 / (span + 1)
+    out = np.empty(a.shape)
+    avg = a[0].copy()
+    old_wt = np.ones(a.shape[1:])
+    out[0] = avg
+    for t in range(1, len(a)):
+        x = a[t]
+        started = avg == avg
+        obs = x == x
+        old_wt[started] *= 1 - alpha
+        upd = started & obs & (avg != x)
+        avg[upd] = (old_wt[upd] * avg[upd] + x[upd]) / (old_wt[upd] + 1.0)
+        old_wt[started & obs] += 1.0
+        first = ~started & obs
+        avg[first] = x[first]
+        out[t] = avg
+    return out
+
+def crossover(a):
+    """1 where a > 0, -1 where a < 0, 0 otherwise (including NaN)."""
+    return (a > 0).astype(np.int8) - (a < 0).astype(np.int8)
+
+def change_signal(cross):
+    """np.sign(cross - cross.shift(1)); the first row is NaN."""
+    out = np.full(cross.shape, np.nan)
+    out[1:] = np.sign(cross[1:] - cross[:-1])
+    return out
+
+def get_panel_ind(prices, lookback=14, momentum_period=14):
+    """
+    Compute the get_ind_data indicators and triggers for every column of
+    prices (a dates x tickers array). Returns {name: array} using the
+    get_ind_data column names; the normalized plot columns are left out.
+    """
+    p = np.asarray(prices, dtype=np.float64)
+    ind = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sma, std = rolling_mean(p, lookback), rolling_std(p, lookback)
+        ind['SMA'], ind['rolling_std'] = sma, std
+        ind['top_bb'], ind['bot_bb'] = sma + 2 * std, sma - 2 * std
+        ind['BB%'] = (p - ind['bot_bb']) / (ind['top_bb'] - ind['bot_bb'])
+
+        diff = np.full(p.shape, np.nan)
+        diff[1:] = p[1:] - p[:-1]
+        up = rolling_mean(np.where(diff < 0, 0, diff), lookback)
+        down = np.abs(rolling_mean(np.where(diff > 0, 0, diff), lookback))
+        ind['RS'] = up / down
+        ind['RSI'] = 100 - (100 / (1 + ind['RS']))
+
+        ind['momentum'] = p / shift(p, momentum_period) - 1
+        ind['momentum crossover'] = crossover(ind['momentum'])
+        ind['momentum signal'] = change_signal(ind['momentum crossover'])
+
+    ind['26 ema'] = ewma(p, 26)
+    ind['12 ema'] = ewma(p, 12)
+    ind['MACD'] = ind['12 ema'] - ind['26 ema']
+    ind['Signal Line'] = ewma(ind['MACD'], 9)
+    ind['Signal Line Crossover'] = crossover(ind['MACD'] - ind['Signal Line'])
+    ind['Centerline Crossover'] = crossover(ind['MACD'])
+    ind['MACD signal'] = change_signal(ind['Signal Line Crossover'])
+
+    # Buy/Sell signals: 0:'HOLD', 1:'BUY', -1: 'SELL'
+    ind['BB% trigger'] = (ind['BB%'] < 0.2).astype(np.int8) - (ind['BB%'] > 0.8).astype(np.int8)
+    ind['RSI trigger'] = (ind['RSI'] < 30).astype(np.int8) - (ind['RSI'] > 70).astype(np.int8)
+    ind['MACD trigger'] = crossover(ind['MACD signal'])
+    ind['momentum trigger'] = crossover(ind['momentum signal'])
+    ind['trigger'] = 2 * ind['BB% trigger'] + 2 * ind['RSI trigger'] + \
+        ind['MACD signal'] + ind['momentum trigger']
+    return ind
+
+def get_universe_ind(tickers=None, lookback=14, momentum_period=14, csv_dir='stock_dfs'):
+    """Load the Adj Close panel for tickers and compute get_panel_ind on it. Returns (days, tickers, ind)."""
+    if tickers is None:
+        store = priceStore.open_store(csv_dir)
+        tickers = store.tickers if store is not None else priceStore.list_csv_tickers(csv_dir)
+    days, tickers, prices = priceStore.build_panel(tickers, 'Adj Close', csv_dir)
+    return days, tickers, get_panel_ind(prices, lookback, momentum_period)
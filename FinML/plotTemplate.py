@@ -6,6 +6,7 @@ from matplotlib.finance import candlestick_ohlc
 import matplotlib.dates as mdates
 import pandas as pd
 import pandas_datareader.data as web
+import resample
 
 # style
 style.use('ggplot')
@@ -23,13 +24,14 @@ style.use('ggplot')
 
 # csv -> df
 symbol = 'TSLA'
-df = pd.read_csv(symbol + '.csv', parse_dates=True, index_col=0) # index_col=0: row label
+# df = pd.read_csv(symbol + '.csv', parse_dates=True, index_col=0) # index_col=0: row label
 # print(df[['Open', 'High']].head())
 
 # candle
 period = '10D'
-df_ohlc = df['Adj Close'].resample(period).ohlc() # open-high-low-close for candle
-df_volume = df['Volume'].resample(period).sum()
+bars = resample.resample_csv(symbol + '.csv', [period], price='Adj Close')[period] # one streaming pass
+df_ohlc = bars[['open', 'high', 'low', 'close']].copy() # open-high-low-close for candle
+df_volume = bars['volume']
 df_ohlc.reset_index(inplace=True)
 df_ohlc['Date'] = df_ohlc['Date'].map(mdates.date2num)
 # print(df_ohlc.head())
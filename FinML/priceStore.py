@@ -0,0 +1,209 @@
+"""Columnar, memory-mapped price store built from the stock_dfs CSVs."""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+STORE_SUBDIR = 'store'
+DIRECTORY_FILE = 'directory.json'
+DATES_FILE = 'dates.npy'
+
+_open_stores = {}
+
+def field_file(field):
+    """Return the .npy file name holding one field, e.g. 'Adj Close' -> adj_close.npy."""
+    return field.lower().replace(' ', '_') + '.npy'
+
+def store_path(csv_dir='stock_dfs'):
+    """Return the store directory that sits next to the CSVs it was built from."""
+    return os.path.join(csv_dir, STORE_SUBDIR)
+
+def csv_path(ticker, csv_dir='stock_dfs'):
+    return os.path.join(csv_dir, '{}.csv'.format(ticker))
+
+def list_csv_tickers(csv_dir='stock_dfs'):
+    """Return the tickers that have a CSV in csv_dir."""
+    return sorted(f[:-4] for f in os.listdir(csv_dir) if f.endswith('.csv'))
+
+def to_day_ints(dates):
+    """Convert dates (strings or datetimes) to int64 days since 1970-01-01."""
+    return np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64))
+
+def from_day_ints(days):
+    days = np.asarray(days).astype('datetime64[D]').astype('datetime64[ns]')
+    return pd.DatetimeIndex(days, name='Date')
+
+def convert_csvs(csv_dir='stock_dfs', tickers=None):
+    """
+    Convert stock_dfs/{ticker}.csv into the columnar store (one time).
+    Layout: dates.npy (int64 days), one (dates x tickers) float64 .npy per field
+    in Fortran order so each ticker's column is contiguous, and directory.json.
+    """
+    if tickers is None:
+        tickers = list_csv_tickers(csv_dir)
+
+    frames, stamps = [], {}
+    for ticker in tickers:
+        path = csv_path(ticker, csv_dir)
+        df = pd.read_csv(path)
+        df['Date'] = to_day_ints(df['Date'])
+        frames.append(df)
+        stamps[ticker] = os.path.getmtime(path)
+
+    dates = np.unique(np.concatenate([df['Date'].values for df in frames])) if frames \
+        else np.empty(0, dtype=np.int64)
+    rows = [np.searchsorted(dates, df['Date'].values) for df in frames]
+
+    out_dir = store_path(csv_dir)
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    np.save(os.path.join(out_dir, DATES_FILE), dates)
+
+    for field in FIELDS:
+        arr = np.lib.format.open_memmap(os.path.join(out_dir, field_file(field)), mode='w+',
+                                        dtype=np.float64, shape=(len(dates), len(tickers)),
+                                        fortran_order=True)
+        arr[:] = np.nan
+        for col, (df, idx) in enumerate(zip(frames, rows)):
+            if field in df.columns:
+                arr[idx, col] = df[field].values
+        arr.flush()
+        del arr
+
+    directory = {
+        'tickers': list(tickers),
+        'fields': FIELDS,
+        # first/last row of each ticker on the shared date axis
+        'start': [int(idx[0]) if len(idx) else 0 for idx in rows],
+        'stop': [int(idx[-1]) + 1 if len(idx) else 0 for idx in rows],
+        'mtime': stamps,
+    }
+    with open(os.path.join(out_dir, DIRECTORY_FILE), 'w') as f:
+        json.dump(directory, f)
+
+    return open_store(csv_dir)
+
+class PriceStore(object):
+    """Read-only view over a converted store; field arrays are memory-mapped on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, DIRECTORY_FILE)) as f:
+            directory = json.load(f)
+        self.tickers = directory['tickers']
+        self.fields = directory['fields']
+        self.days = np.load(os.path.join(path, DATES_FILE), mmap_mode='r')
+        self._col = dict((t, i) for i, t in enumerate(self.tickers))
+        self._start = directory['start']
+        self._stop = directory['stop']
+        self._mtime = directory['mtime']
+        self._arrays = {}
+
+    def __contains__(self, ticker):
+        return ticker in self._col
+
+    def dates(self):
+        return from_day_ints(self.days)
+
+    def field(self, name):
+        """Return the full (dates x tickers) array for one field, without copying."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, field_file(name)), mmap_mode='r')
+        return self._arrays[name]
+
+    def span(self, ticker):
+        """Return the [start, stop) rows of the shared date axis covered by ticker."""
+        col = self._col[ticker]
+        return self._start[col], self._stop[col]
+
+    def column(self, ticker, field):
+        """Return ticker's values for field over its own date range (a view)."""
+        start, stop = self.span(ticker)
+        return self.field(field)[start:stop, self._col[ticker]]
+
+    def is_current(self, ticker, csv_dir):
+        """True if ticker was converted and its CSV has not changed since."""
+        if ticker not in self._col:
+            return False
+        path = csv_path(ticker, csv_dir)
+        return not os.path.exists(path) or os.path.getmtime(path) <= self._mtime[ticker]
+
+    def frame(self, ticker, fields=None):
+        fields = fields or self.fields
+        start, stop = self.span(ticker)
+        data = dict((f, self.column(ticker, f)) for f in fields)
+        return pd.DataFrame(data, index=from_day_ints(self.days[start:stop]), columns=fields)
+
+def open_store(csv_dir='stock_dfs'):
+    """Return the PriceStore for csv_dir, or None if it has not been converted."""
+    path = store_path(csv_dir)
+    directory = os.path.join(path, DIRECTORY_FILE)
+    if not os.path.exists(directory):
+        return None
+    key = (os.path.abspath(path), os.path.getmtime(directory))
+    if key not in _open_stores:
+        _open_stores.clear()
+        _open_stores[key] = PriceStore(path)
+    return _open_stores[key]
+
+def read_prices(ticker, fields, csv_dir='stock_dfs'):
+    """
+    Return a Date-indexed DataFrame of fields for ticker, read from the store
+    when it is up to date and from stock_dfs/{ticker}.csv otherwise.
+    """
+    store = open_store(csv_dir)
+    if store is not None and store.is_current(ticker, csv_dir):
+        return store.frame(ticker, fields)
+    return pd.read_csv(csv_path(ticker, csv_dir), index_col='Date', parse_dates=True,
+                       usecols=['Date'] + list(fields), na_values=['nan'])
+
+def read_days(ticker, csv_dir='stock_dfs'):
+    """Return ticker's int64 day axis without reading any prices."""
+    store = open_store(csv_dir)
+    if store is not None and store.is_current(ticker, csv_dir):
+        start, stop = store.span(ticker)
+        return np.asarray(store.days[start:stop])
+    return to_day_ints(pd.read_csv(csv_path(ticker, csv_dir), usecols=['Date'])['Date'])
+
+def build_panel(tickers, field='Adj Close', csv_dir='stock_dfs'):
+    """
+    Assemble the (dates x tickers) panel of one field in a single pass:
+    scan every ticker's dates, build the union axis once, then fill a
+    preallocated float64 array column by column.
+    Returns (days, tickers, panel) for the tickers that have data.
+    """
+    days, tickers, panels = build_panels(tickers, [field], csv_dir)
+    return days, tickers, panels[field]
+
+def build_panels(tickers, fields, csv_dir='stock_dfs'):
+    """build_panel for several fields at once, reading each ticker once. Returns (days, tickers, {field: panel})."""
+    store = open_store(csv_dir) or ()
+    tickers = [t for t in tickers if t in store or os.path.exists(csv_path(t, csv_dir))]
+
+    spans = [read_days(t, csv_dir) for t in tickers]
+    days = np.unique(np.concatenate(spans)) if spans else np.empty(0, dtype=np.int64)
+
+    panels = dict((f, np.full((len(days), len(tickers)), np.nan)) for f in fields)
+    for col, (ticker, ticker_days) in enumerate(zip(tickers, spans)):
+        rows = np.searchsorted(days, ticker_days)
+        df = read_prices(ticker, fields, csv_dir)
+        for field in fields:
+            panels[field][rows, col] = df[field].values
+
+    return days, tickers, panels
+
+def write_panel_csv(path, days, tickers, panel, chunk_rows=1000):
+    """Write a panel to CSV in chunks of rows, as DataFrame.to_csv would lay it out."""
+    index = from_day_ints(days)
+    with open(path, 'w') as f:
+        f.write(','.join(['Date'] + list(tickers)) + '\n')
+        for start in range(0, len(days), chunk_rows):
+            stop = start + chunk_rows
+            chunk = pd.DataFrame(panel[start:stop], index=index[start:stop], columns=tickers)
+            chunk.to_csv(f, header=False)
+
+
+if __name__ == "__main__":
+    convert_csvs()
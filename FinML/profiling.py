@@ -0,0 +1,225 @@
+"""
+Named timing spans with peak memory, and a per-run report.
+
+Stages are wrapped in spans:
+
+    with profiling.span('fit'):
+        clf.fit(X, y)
+
+Spans nest. Each one records its wall time, its self time (wall time less
+its child spans'), the peak memory numpy and Python allocated above what
+was live when it started (tracemalloc), and the process's max RSS so far.
+Stage totals add up self times, so a nested span is not counted twice. Profiling is off unless FINML_PROFILE names
+a report file (.json or .csv), e.g.
+
+    FINML_PROFILE=run.json python classifiers.py
+
+in which case the report is written when the script exits. A disabled
+span does nothing. FINML_PROFILE_MEMORY=0 keeps the timings but skips the
+memory tracing, which slows allocation-heavy code down.
+FINML_PROFILE_SAMPLE=0.005 also runs the sampling profiler every 5 ms.
+It counts the main thread's stacks per span and writes them next to the
+report in flamegraph "folded" format (<report>.folded).
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAGES = ('load', 'join', 'write', 'label', 'featurize', 'correlation', 'fit', 'predict', 'indicator', 'plot')
+REPORT_FIELDS = ['name', 'stage', 'parent', 'depth', 'start', 'seconds', 'self_seconds', 'peak_mb', 'max_rss_mb']
+
+def max_rss_mb():
+    if resource is None:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024.0 ** 2 if sys.platform == 'darwin' else 1024.0)
+
+class Profiler(object):
+    def __init__(self, enabled=True, memory=True):
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.started = time.time()
+        self.spans = []
+        self._stack = []  # [name, base bytes, peak bytes seen so far, child seconds]
+        self.sampler = None
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name, stage=None):
+        """Time the block as name; stage defaults to name (one of STAGES, or anything)."""
+        if not self.enabled:
+            yield
+            return
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        entry = [name, current, current, 0.0]
+        self._stack.append(entry)
+        start = time.time()
+        try:
+            yield
+        finally:
+            seconds = time.time() - start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][3] += seconds
+            peak = entry[2]
+            if self.memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+                tracemalloc.reset_peak()
+            self.spans.append({
+                'name': name,
+                'stage': stage or name,
+                'parent': self._stack[-1][0] if self._stack else '',
+                'depth': len(self._stack),
+                'start': start - self.started,
+                'seconds': seconds,
+                'self_seconds': seconds - entry[3],
+                'peak_mb': (peak - entry[1]) / 1024.0 ** 2 if self.memory else float('nan'),
+                'max_rss_mb': max_rss_mb(),
+            })
+
+    def current(self):
+        """Names of the open spans, outermost first."""
+        return [entry[0] for entry in self._stack]
+
+    def summary(self):
+        """{stage: {'count', 'seconds', 'peak_mb'}} over the spans of each stage; seconds is self time."""
+        out = {}
+        for s in self.spans:
+            row = out.setdefault(s['stage'], {'count': 0, 'seconds': 0.0, 'peak_mb': 0.0})
+            row['count'] += 1
+            row['seconds'] += s['self_seconds']
+            if s['peak_mb'] == s['peak_mb']:
+                row['peak_mb'] = max(row['peak_mb'], s['peak_mb'])
+        return out
+
+    def report(self):
+        return {
+            'argv': sys.argv,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': time.time() - self.started,
+            'max_rss_mb': max_rss_mb(),
+            'stages': self.summary(),
+            'spans': self.spans,
+        }
+
+    def write_report(self, path):
+        """Spans as CSV rows if path ends in .csv, otherwise the whole report as JSON."""
+        if path.endswith('.csv'):
+            with open(path, 'w') as f:
+                writer = csv.DictWriter(f, REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.spans)
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.report(), f, indent=1)
+        if self.sampler is not None:
+            self.sampler.write(path + '.folded')
+
+class SamplingProfiler(object):
+    """
+    Samples the thread that started it every interval seconds and counts
+    its stacks, each prefixed by the spans open at the time.
+    """
+
+    def __init__(self, profiler, interval=0.005):
+        self.profiler = profiler
+        self.interval = interval
+        self.counts = Counter()
+        self._thread_id = threading.current_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            self.counts[tuple(['span:' + n for n in self.profiler.current()] + stack[::-1])] += 1
+
+    def top(self, n=20):
+        """The n functions with the most samples anywhere on the stack."""
+        inclusive = Counter()
+        for stack, count in self.counts.items():
+            for frame in set(stack):
+                inclusive[frame] += count
+        return inclusive.most_common(n)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write('{} {}\n'.format(';'.join(stack), count))
+
+def _from_environment():
+    path = os.environ.get('FINML_PROFILE')
+    profiler = Profiler(enabled=bool(path), memory=os.environ.get('FINML_PROFILE_MEMORY', '1') != '0')
+    if path:
+        interval = os.environ.get('FINML_PROFILE_SAMPLE')
+        if interval:
+            profiler.sampler = SamplingProfiler(profiler, float(interval)).start()
+
+        def finish():
+            if profiler.sampler is not None:
+                profiler.sampler.stop()
+            profiler.write_report(path)
+        atexit.register(finish)
+    return profiler
+
+PROFILER = _from_environment()
+
+def worker_init():
+    """
+    Turn profiling off in a forked pool worker, which inherits the parent's
+    tracemalloc tracing but never writes a report.
+    """
+    PROFILER.enabled = PROFILER.memory = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def span(name, stage=None):
+    return PROFILER.span(name, stage)
+
+def timed(name, stage=None):
+    """Decorator: every call of the function is a span."""
+    def wrap(func):
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            with PROFILER.span(name, stage):
+                return func(*args, **kwargs)
+        return call
+    return wrap
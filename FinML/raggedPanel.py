@@ -0,0 +1,146 @@
+"""
+A (dates x tickers) panel stored without padding.
+
+Each ticker keeps only the rows from its first to its last valid value,
+back to back in one flat array; starts/stops give the span on the shared
+day axis and offsets the position in the flat array. Returns, forward
+returns and labels are computed on the flat array in one pass, masking the
+positions where a window would cross into the next ticker, so leading
+NaNs are never filled or worked on.
+"""
+
+import numpy as np
+import pandas as pd
+import priceStore
+import labels
+
+class RaggedPanel(object):
+    def __init__(self, days, tickers, starts, stops, values):
+        self.days = np.asarray(days, dtype=np.int64)
+        self.tickers = list(tickers)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        self.values = values
+        self.offsets = np.concatenate([[0], np.cumsum(self.stops - self.starts)])
+        self._col = dict((t, i) for i, t in enumerate(self.tickers))
+        self._segment = np.repeat(np.arange(len(self.tickers)), self.lengths)
+        self._position = np.arange(len(values)) - self.offsets[self._segment]
+
+    @property
+    def lengths(self):
+        return self.stops - self.starts
+
+    @property
+    def shape(self):
+        return len(self.days), len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def span(self, ticker):
+        """(start, stop) rows of ticker on the day axis."""
+        col = self._col[ticker]
+        return int(self.starts[col]), int(self.stops[col])
+
+    def series(self, ticker, values=None):
+        """ticker's values (or its part of a flat array laid out like the panel)."""
+        col = self._col[ticker]
+        values = self.values if values is None else values
+        return values[self.offsets[col]:self.offsets[col + 1]]
+
+    def dates(self, ticker):
+        start, stop = self.span(ticker)
+        return priceStore.from_day_ints(self.days[start:stop])
+
+    def like(self, values):
+        """A panel with the same layout holding other flat values."""
+        return RaggedPanel(self.days, self.tickers, self.starts, self.stops, values)
+
+    def fillna(self, value):
+        return self.like(np.where(np.isnan(self.values), value, self.values).astype(self.values.dtype))
+
+    def returns(self):
+        """Simple returns; NaN at each ticker's first row and wherever a price is missing."""
+        v = self.values
+        out = np.full(len(v), np.nan, dtype=v.dtype)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[1:] = v[1:] / v[:-1] - 1
+        out[self._position == 0] = np.nan
+        out[~np.isfinite(out)] = np.nan
+        return self.like(out)
+
+    def forward_returns(self, hm_days=7):
+        """labels.forward_returns for every ticker at once: a flat (values, hm_days) array."""
+        fwd = labels.forward_returns(self.values, hm_days)
+        length = self.lengths[self._segment]
+        for i in range(1, hm_days + 1):
+            fwd[self._position + i >= length, i - 1] = np.nan
+        return fwd
+
+    def labels(self, hm_days=7, requirement=0.02):
+        """(labels, forward returns, valid) as flat arrays; valid rows have every horizon known."""
+        fwd = self.forward_returns(hm_days)
+        return labels.first_crossing(fwd, requirement), fwd, np.isfinite(fwd).all(axis=-1)
+
+    def dense(self, values=None, fill=np.nan, rows=None, dtype=None):
+        """
+        Pad back out to (dates x tickers), optionally only for rows (a slice
+        of the day axis). values defaults to the panel's own.
+        """
+        values = self.values if values is None else values
+        day = self.starts[self._segment] + self._position
+        lo, hi = (0, len(self.days)) if rows is None else rows.indices(len(self.days))[:2]
+        pick = (day >= lo) & (day < hi)
+        out = np.full((hi - lo, len(self.tickers)), fill, dtype=dtype or values.dtype)
+        out[day[pick] - lo, self._segment[pick]] = values[pick]
+        return out
+
+    def to_frame(self):
+        return pd.DataFrame(self.dense(), index=priceStore.from_day_ints(self.days), columns=self.tickers)
+
+def from_dense(days, tickers, panel, dtype=np.float64):
+    """Trim every column of a padded panel to its first..last valid row."""
+    panel = np.asarray(panel)
+    valid = ~np.isnan(panel)
+    has = valid.any(axis=0)
+    starts = np.where(has, valid.argmax(axis=0), 0)
+    stops = np.where(has, len(panel) - valid[::-1].argmax(axis=0), 0)
+    rows = np.arange(len(panel))[:, np.newaxis]
+    inspan = (rows >= starts) & (rows < stops)
+    values = panel.T[inspan.T].astype(dtype)
+    return RaggedPanel(days, tickers, starts, stops, values)
+
+def from_frame(df, dtype=np.float64):
+    """From a Date-indexed frame such as sample_sp500_closes.csv."""
+    return from_dense(priceStore.to_day_ints(df.index), df.columns, df.values, dtype)
+
+def load_closes(path='sample_sp500_closes.csv', dtype=np.float64):
+    return from_frame(pd.read_csv(path, index_col=0), dtype)
+
+def from_store(tickers=None, field='Adj Close', csv_dir='stock_dfs', dtype=np.float64):
+    """Build the panel from stock_dfs one ticker at a time, never allocating the padded panel."""
+    if tickers is None:
+        store = priceStore.open_store(csv_dir)
+        tickers = store.tickers if store is not None else priceStore.list_csv_tickers(csv_dir)
+    spans = [priceStore.read_days(t, csv_dir) for t in tickers]
+    days = np.unique(np.concatenate(spans)) if spans else np.empty(0, dtype=np.int64)
+
+    starts, stops, segments = [], [], []
+    for ticker, ticker_days in zip(tickers, spans):
+        rows = np.searchsorted(days, ticker_days)
+        prices = priceStore.read_prices(ticker, [field], csv_dir)[field].values
+        valid = np.flatnonzero(~np.isnan(prices))
+        if len(valid) == 0:
+            starts.append(0)
+            stops.append(0)
+            continue
+        rows, prices = rows[valid[0]:valid[-1] + 1], prices[valid[0]:valid[-1] + 1]
+        segment = np.full(rows[-1] - rows[0] + 1, np.nan, dtype=dtype)
+        segment[rows - rows[0]] = prices
+        starts.append(rows[0])
+        stops.append(rows[-1] + 1)
+        segments.append(segment)
+
+    values = np.concatenate(segments) if segments else np.empty(0, dtype=dtype)
+    return RaggedPanel(days, tickers, starts, stops, values)
@@ -0,0 +1,181 @@
+"""
+Streaming OHLCV resampling.
+
+Bars are read in fixed-size chunks, from a stock_dfs CSV or the
+memory-mapped price store, and folded into every requested period in the
+same pass. Only the bar still being built is carried from one chunk to
+the next, so memory does not grow with the file length. Periods:
+
+    'nD'  n calendar days from the first date (resample('nD'), labelled by start)
+    'W'   weeks ending Sunday (resample('W'), labelled by the Sunday)
+    'M'   calendar months (resample('M'), labelled by the month end)
+
+With price set, each period gets the open/high/low/close of that one
+series (Series.resample().ohlc()). Otherwise the Open/High/Low/Close
+columns are aggregated. Volume is summed either way. Periods with no bars
+are left out.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+import priceStore
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+CHUNK_ROWS = 4096
+
+def _parse(period):
+    match = re.match(r'^(\d*)(D|W|W-SUN|M|ME)$', period)
+    if not match:
+        raise ValueError('Unsupported period {}'.format(period))
+    n, unit = int(match.group(1) or 1), match.group(2)[0]
+    if unit != 'D' and n != 1:
+        raise ValueError('Unsupported period {}'.format(period))
+    return unit, n
+
+def period_keys(days, period, origin):
+    """Label day of the period holding each of days (int days since epoch)."""
+    unit, n = _parse(period)
+    if unit == 'W':
+        # 1970-01-01 was a Thursday: weekday (Monday = 0) is (day + 3) % 7
+        return days + 6 - (days + 3) % 7
+    if unit == 'M':
+        months = days.astype('datetime64[D]').astype('datetime64[M]')
+        return (months + 1).astype('datetime64[D]').astype(np.int64) - 1
+    return origin + (days - origin) // n * n
+
+def period_ends(labels, period):
+    """Last calendar day of the periods with these labels."""
+    unit, n = _parse(period)
+    return labels + n - 1 if unit == 'D' else labels
+
+class _PeriodState(object):
+    """The bar being built for one period, and the finished bars not yet collected."""
+
+    def __init__(self, period):
+        self.period = period
+        self.current = None  # (label, open, high, low, close, volume)
+        self.done = []
+
+    def add(self, keys, o, h, l, c, v):
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+        ends = np.append(starts[1:], len(keys))
+        bars = (keys[starts], o[starts], np.maximum.reduceat(h, starts),
+                np.minimum.reduceat(l, starts), c[ends - 1], np.add.reduceat(v, starts))
+        bars = [list(b) for b in bars]
+        if self.current is not None:
+            if bars[0][0] == self.current[0]:
+                # the carried bar continues into this chunk
+                _, co, ch, cl, _, cv = self.current
+                bars[1][0] = co
+                bars[2][0] = max(ch, bars[2][0])
+                bars[3][0] = min(cl, bars[3][0])
+                bars[5][0] += cv
+            else:
+                self.done.append(self.current)
+        finished = list(zip(*bars))
+        self.current = finished.pop()
+        self.done.extend(finished)
+
+    def flush(self):
+        if self.current is not None:
+            self.done.append(self.current)
+            self.current = None
+
+    def collect(self):
+        done, self.done = self.done, []
+        return done
+
+def csv_chunks(path, price=None, chunk_rows=CHUNK_ROWS):
+    """Yield (days, open, high, low, close, volume) arrays from a stock_dfs CSV."""
+    fields = [price] if price else ['Open', 'High', 'Low', 'Close']
+    for chunk in pd.read_csv(path, usecols=['Date'] + fields + ['Volume'], chunksize=chunk_rows,
+                             na_values=['nan']):
+        yield _chunk(priceStore.to_day_ints(chunk['Date']), [chunk[f].values for f in fields],
+                     chunk['Volume'].values)
+
+def store_chunks(ticker, price=None, csv_dir='stock_dfs', chunk_rows=CHUNK_ROWS):
+    """Yield the same chunks from the memory-mapped price store."""
+    store = priceStore.open_store(csv_dir)
+    start, stop = store.span(ticker)
+    fields = [price] if price else ['Open', 'High', 'Low', 'Close']
+    columns = [store.column(ticker, f) for f in fields]
+    volume = store.column(ticker, 'Volume')
+    for lo in range(0, stop - start, chunk_rows):
+        hi = lo + chunk_rows
+        yield _chunk(np.asarray(store.days[start + lo:start + hi]), [c[lo:hi] for c in columns], volume[lo:hi])
+
+def _chunk(days, prices, volume):
+    prices = [np.asarray(p, dtype=np.float64) for p in prices]
+    if len(prices) == 1:
+        prices = prices * 4
+    volume = np.asarray(volume, dtype=np.float64)
+    keep = ~np.isnan(prices[3])
+    return tuple(a[keep] for a in [days] + prices + [np.nan_to_num(volume)])
+
+def stream_bars(chunks, periods):
+    """
+    Fold chunks into every period in one pass, yielding (period, bars) as
+    bars complete; bars is a list of (label day, open, high, low, close, volume).
+    """
+    states = [_PeriodState(p) for p in periods]
+    origin = None
+    for days, o, h, l, c, v in chunks:
+        if len(days) == 0:
+            continue
+        if origin is None:
+            origin = days[0]
+        for state in states:
+            state.add(period_keys(days, state.period, origin), o, h, l, c, v)
+            done = state.collect()
+            if done:
+                yield state.period, done
+    for state in states:
+        state.flush()
+        done = state.collect()
+        if done:
+            yield state.period, done
+
+def to_frames(streamed, periods):
+    """Collect stream_bars output into {period: DataFrame indexed by Date}."""
+    rows = dict((p, []) for p in periods)
+    for period, bars in streamed:
+        rows[period].extend(bars)
+    frames = {}
+    for period, bars in rows.items():
+        data = np.array(bars, dtype=np.float64).reshape(-1, 6)
+        frames[period] = pd.DataFrame(data[:, 1:], columns=BAR_COLUMNS,
+                                      index=priceStore.from_day_ints(data[:, 0].astype(np.int64)))
+    return frames
+
+def resample_csv(path, periods=('10D',), price=None, chunk_rows=CHUNK_ROWS):
+    """{period: bars DataFrame} for one CSV, read once."""
+    return to_frames(stream_bars(csv_chunks(path, price, chunk_rows), periods), periods)
+
+def resample_tickers(tickers, periods=('1W', '10D', '1M'), price=None, csv_dir='stock_dfs'):
+    """
+    {ticker: {period: bars DataFrame}}, each ticker streamed from the store
+    when it is current and from its CSV otherwise.
+    """
+    store = priceStore.open_store(csv_dir)
+    out = {}
+    for ticker in tickers:
+        if store is not None and ticker in store and store.is_current(ticker, csv_dir):
+            chunks = store_chunks(ticker, price, csv_dir)
+        else:
+            chunks = csv_chunks(priceStore.csv_path(ticker, csv_dir), price)
+        out[ticker] = to_frames(stream_bars(chunks, periods), periods)
+    return out
+
+def on_days(bars, period, days):
+    """
+    bars aligned to days for multi-timeframe indicators: each day gets the
+    last bar whose period had ended by then, so nothing is seen early.
+    """
+    ends = period_ends(priceStore.to_day_ints(bars.index), period)
+    days = priceStore.to_day_ints(days)
+    pos = np.searchsorted(ends, days, side='right') - 1
+    out = bars.iloc[np.maximum(pos, 0)].copy()
+    out.iloc[pos < 0] = np.nan
+    out.index = priceStore.from_day_ints(days)
+    return out
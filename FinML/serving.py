@@ -0,0 +1,291 @@
+"""
+Serve predictions from persisted per-ticker do_ml models.
+
+batchTrain.train_universe(model_dir='models') saves every fitted
+VotingClassifier with the universe rows and labels it was trained on and
+the closes columns its features came from. ModelServer refuses a closes
+file whose columns differ, since its feature rows would not line up. It
+loads them once and scores feature rows for all tickers together, one
+batched step per voter type:
+
+  lsvc  every model's coefficients are stacked, so all decisions are one
+        matrix product;
+  knn   every model was fit on a subset of the same feature rows, so the
+        distances from a query to those rows are computed once and each
+        model takes its k nearest among its own training rows;
+  rfor  forests can't be merged; each one's trees are walked directly,
+        without the per-call thread pool of RandomForestClassifier.predict.
+
+The votes are then combined as VotingClassifier(voting='hard') does.
+
+    python serving.py --port 8765
+
+serves GET /predict[?tickers=A,B], POST /predict with {"features": [[...]]}
+and GET /stats (latency percentiles) on localhost.
+"""
+
+import os
+import json
+import time
+import pickle
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsClassifier
+import raggedPanel
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+MODEL_DIR = 'models'
+
+def save_model(model_dir, ticker, clf, train_rows, train_labels, columns):
+    """
+    Persist a fitted VotingClassifier, the universe rows and labels it was
+    fit on, and columns, the closes columns of its feature matrix in order.
+    """
+    if not os.path.exists(model_dir):
+        os.makedirs(model_dir)
+    path = os.path.join(model_dir, '{}.pkl'.format(ticker))
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump({'model': clf, 'train_rows': np.asarray(train_rows),
+                     'train_labels': np.asarray(train_labels), 'columns': list(columns)},
+                    f, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+def check_columns(ticker, saved, columns):
+    """Raise ValueError unless the model in saved was trained on exactly columns, in order."""
+    trained = saved.get('columns')
+    if trained is None:
+        raise ValueError('Model {} was saved without its feature columns; retrain it'.format(ticker))
+    if trained == list(columns):
+        return
+    gone = [c for c in trained if c not in columns]
+    new = [c for c in columns if c not in trained]
+    if gone or new:
+        detail = 'trained with {} that the closes file lacks and without {}'.format(gone, new)
+    else:
+        detail = 'trained on the same columns in another order'
+    raise ValueError('Model {} does not match the closes file: {}; retrain it'.format(ticker, detail))
+
+def load_models(model_dir=MODEL_DIR, tickers=None, columns=None):
+    """
+    {ticker: {'model', 'train_rows', 'train_labels', 'columns'}} for every
+    model saved in model_dir. With columns, each model is checked against
+    them (check_columns).
+    """
+    if tickers is None:
+        tickers = sorted(f[:-4] for f in os.listdir(model_dir) if f.endswith('.pkl'))
+    models = {}
+    for ticker in tickers:
+        with open(os.path.join(model_dir, '{}.pkl'.format(ticker)), 'rb') as f:
+            models[ticker] = pickle.load(f)
+        if columns is not None:
+            check_columns(ticker, models[ticker], columns)
+    return models
+
+class LatencyRecorder(object):
+    """Durations of the last maxlen requests, in milliseconds."""
+
+    def __init__(self, maxlen=10000):
+        self.samples = deque(maxlen=maxlen)
+
+    def record(self, seconds):
+        self.samples.append(seconds * 1000.0)
+
+    def percentiles(self, qs=(50, 90, 99)):
+        if not self.samples:
+            return {}
+        values = np.percentile(np.asarray(self.samples), qs)
+        out = dict(('p{}'.format(q), v) for q, v in zip(qs, values))
+        out['count'] = len(self.samples)
+        return out
+
+class ModelServer(object):
+    def __init__(self, model_dir=MODEL_DIR, closes_path='sample_sp500_closes.csv', tickers=None):
+        df = pd.read_csv(closes_path, index_col=0)
+        self.dates = df.index
+        self.X = raggedPanel.from_frame(df).returns().fillna(0).dense(fill=0)
+        saved = load_models(model_dir, tickers, df.columns.values.tolist())
+        self.tickers = sorted(saved)
+        self.models = [saved[t]['model'] for t in self.tickers]
+        self.latency = LatencyRecorder()
+        self._prepare(saved)
+
+    def _prepare(self, saved):
+        names = [name for name, _ in self.models[0].estimators]
+        self.voters = names
+        self.weights = np.ones(len(names)) if self.models[0].weights is None else np.asarray(self.models[0].weights)
+
+        # lsvc: (models x classes x features) stacked decision functions, grouped by class count
+        self.svc = {}
+        if 'lsvc' in names:
+            for i, clf in enumerate(self.models):
+                est = clf.named_estimators_['lsvc']
+                group = self.svc.setdefault(est.coef_.shape[0], ([], [], []))
+                group[0].append(i)
+                group[1].append(est.coef_)
+                group[2].append(est.intercept_)
+            self.svc = dict((k, (np.array(idx), np.array(coef), np.array(b)))
+                            for k, (idx, coef, b) in self.svc.items())
+
+        # knn: one set of candidate rows shared by every model; models saved
+        # without their labels are left to KNeighborsClassifier.predict
+        self.shared_knn = 'knn' in names and all(
+            type(saved[t]['model'].named_estimators_['knn']) is KNeighborsClassifier
+            and 'train_labels' in saved[t] for t in self.tickers)
+        if self.shared_knn:
+            rows = [saved[t]['train_rows'] for t in self.tickers]
+            self.knn_rows = np.unique(np.concatenate(rows))
+            self.knn_points = self.X[self.knn_rows]
+            # per model: encoded label of each candidate row, -1 where not a training row
+            self.knn_labels = np.full((len(self.models), len(self.knn_rows)), -1, dtype=np.int64)
+            self.knn_k = np.empty(len(self.models), dtype=np.int64)
+            for i, (clf, train_rows) in enumerate(zip(self.models, rows)):
+                # the voters were fit on labels encoded as indices into clf.classes_
+                encoded = np.searchsorted(clf.classes_, saved[self.tickers[i]]['train_labels'])
+                self.knn_labels[i, np.searchsorted(self.knn_rows, train_rows)] = encoded
+                self.knn_k[i] = clf.named_estimators_['knn'].n_neighbors
+        self.n_classes = max(len(clf.classes_) for clf in self.models)
+
+    def _lsvc_votes(self, X):
+        out = np.empty((len(self.models), len(X)), dtype=np.int64)
+        for k, (idx, coef, intercept) in self.svc.items():
+            scores = np.einsum('mcf,rf->mrc', coef, X) + intercept[:, np.newaxis, :]
+            out[idx] = (scores[..., 0] > 0).astype(np.int64) if k == 1 else scores.argmax(axis=-1)
+        return out
+
+    def _knn_votes(self, X):
+        # squared distances up to a per-row constant, for every query row at once
+        dist = (self.knn_points ** 2).sum(axis=1) - 2 * X.dot(self.knn_points.T)
+        # usually every model has its k nearest among the few closest candidates
+        # overall; rows where one doesn't fall back to a full sort
+        n_cand = min(dist.shape[1], 4 * int(self.knn_k.max()) + 64)
+        out = self._knn_nearest(dist, n_cand)
+        short = np.flatnonzero((out < 0).any(axis=0))
+        if len(short):
+            out[:, short] = self._knn_nearest(dist[short], dist.shape[1])
+        return out
+
+    def _knn_nearest(self, dist, n_cand):
+        if n_cand < dist.shape[1]:
+            cand = np.argpartition(dist, n_cand, axis=1)[:, :n_cand]
+        else:
+            cand = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+        order = np.take_along_axis(cand, np.argsort(np.take_along_axis(dist, cand, axis=1),
+                                                    axis=1, kind='mergesort'), axis=1)
+        labels = self.knn_labels[:, order]  # (models x rows x candidates)
+        member = labels >= 0
+        ranks = np.cumsum(member, axis=2)
+        nearest = member & (ranks <= self.knn_k[:, np.newaxis, np.newaxis])
+        counts = np.stack([(nearest & (labels == c)).sum(axis=2) for c in range(self.n_classes)], axis=2)
+        votes = counts.argmax(axis=2)
+        votes[ranks[:, :, -1] < self.knn_k[:, np.newaxis]] = -1
+        return votes
+
+    def _rfor_votes(self, X):
+        # the trees directly, skipping the forest's per-call thread pool setup
+        X = X.astype(np.float32)
+        out = np.empty((len(self.models), len(X)), dtype=np.int64)
+        for i, clf in enumerate(self.models):
+            forest = clf.named_estimators_['rfor']
+            proba = sum(tree.predict_proba(X, check_input=False) for tree in forest.estimators_)
+            out[i] = forest.classes_[proba.argmax(axis=1)]
+        return out
+
+    def _votes(self, name, X):
+        if name == 'lsvc':
+            return self._lsvc_votes(X)
+        if name == 'knn' and self.shared_knn:
+            return self._knn_votes(X)
+        if name == 'rfor':
+            return self._rfor_votes(X)
+        return np.array([clf.named_estimators_[name].predict(X) for clf in self.models])
+
+    def predict_rows(self, X):
+        """(models x rows) predicted labels for feature rows X."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if X.ndim != 2 or X.shape[1] != self.X.shape[1]:
+            raise ValueError('Feature rows need {} values, one per closes column; got shape {}'.format(
+                self.X.shape[1], X.shape))
+        votes = [self._votes(name, X) for name in self.voters]
+        tally = np.zeros((len(self.models), len(X), self.n_classes))
+        for weight, v in zip(self.weights, votes):
+            np.add.at(tally, (np.arange(len(self.models))[:, np.newaxis], np.arange(len(X)), v), weight)
+        encoded = tally.argmax(axis=-1)
+        return np.array([clf.classes_[e] for clf, e in zip(self.models, encoded)])
+
+    def predict(self, tickers=None, X=None):
+        """{ticker: label} for the latest feature row, or {ticker: [labels]} for rows X."""
+        start = time.time()
+        labels = self.predict_rows(self.X[-1:] if X is None else X)
+        keep = set(tickers) if tickers else None
+        if X is None:
+            out = dict((t, int(l[0])) for t, l in zip(self.tickers, labels) if keep is None or t in keep)
+        else:
+            out = dict((t, l.tolist()) for t, l in zip(self.tickers, labels) if keep is None or t in keep)
+        self.latency.record(time.time() - start)
+        return out
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, body, status=200):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/predict':
+                tickers = parse_qs(url.query).get('tickers', [''])[0]
+                self._reply(server.predict(tickers.split(',') if tickers else None))
+            elif url.path == '/stats':
+                self._reply(server.latency.percentiles())
+            else:
+                self._reply({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/predict':
+                return self._reply({'error': 'not found'}, 404)
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not isinstance(body, dict):
+                    raise ValueError('The body must be a JSON object')
+                result = server.predict(body.get('tickers'), body.get('features'))
+            except (ValueError, TypeError) as e:  # json.JSONDecodeError is a ValueError
+                return self._reply({'error': str(e)}, 400)
+            self._reply(result)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(server, host='127.0.0.1', port=8765):
+    httpd = _ThreadingHTTPServer((host, port), make_handler(server))
+    print('Serving {} models on http://{}:{}'.format(len(server.tickers), host, port))
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve FinML model predictions.')
+    parser.add_argument('--models', default=MODEL_DIR)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    serve(ModelServer(args.models), port=args.port)
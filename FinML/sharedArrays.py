@@ -0,0 +1,25 @@
+"""Put numpy arrays in shared memory so pool workers read them without copies."""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+def share(arr):
+    """
+    Copy arr into a new shared memory block. Returns (block, spec); keep the
+    block alive in the parent and pass spec to the workers.
+    """
+    arr = np.ascontiguousarray(arr)
+    block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, arr.dtype, buffer=block.buf)[...] = arr
+    return block, (block.name, arr.shape, arr.dtype.str)
+
+def attach(spec):
+    """Return (block, array) viewing a block created by share()."""
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+def release(*blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
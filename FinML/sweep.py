@@ -0,0 +1,188 @@
+"""
+Hyperparameter sweep over the do_ml ensemble and its labeling rule.
+
+A space maps parameter names to candidate values. Names with '__' are
+VotingClassifier parameters (e.g. 'knn__n_neighbors', 'rfor__n_estimators',
+'lsvc__C'); 'hm_days' and 'requirement' change the labels. Configurations
+come from the full grid or a random sample of it.
+
+Losing configurations are stopped early by successive halving: every
+configuration is first scored on a few tickers, the best 1/eta go on to
+a larger set of tickers, and so on until the survivors have seen them
+all. Each (configuration, ticker) score is the mean walk-forward accuracy.
+Workers share the close panel and the return features through shared
+memory and compute labels for their configuration themselves. Scores are
+appended to results_path as they arrive, tagged with a setup fingerprint
+of the walk-forward windows, the closes file's content and the scoring
+code; rerunning a sweep with the same setup skips every score already in
+the file.
+"""
+
+import os
+import csv
+import json
+import math
+import random
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+import classifiers
+import labels
+import memoCache
+import raggedPanel
+import sharedArrays
+import walkForward
+import profiling
+
+LABEL_PARAMS = {'hm_days': 7, 'requirement': 0.02}
+RESULT_FIELDS = ['setup', 'config', 'params', 'ticker', 'accuracy', 'folds']
+
+def grid(space):
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*[space[n] for n in names])]
+
+def sample(space, n, seed=None):
+    """n distinct configurations drawn from the grid (all of it if it is smaller)."""
+    configs = grid(space)
+    return random.Random(seed).sample(configs, min(n, len(configs)))
+
+def config_id(params):
+    return memoCache.fingerprint(sorted(params.items()))[:12]
+
+def rung_sizes(n_configs, n_tickers, eta=3):
+    """Tickers seen at each rung: shrinking configs by eta each rung, ending with every ticker."""
+    # floor(log_eta(n_configs)) + 1, counted in integers (math.log(243, 3) < 5)
+    rungs, n = 1, eta
+    while n <= n_configs:
+        rungs, n = rungs + 1, n * eta
+    return sorted(set(max(1, int(math.ceil(n_tickers / float(eta ** (rungs - 1 - r)))))
+                      for r in range(rungs)))
+
+_shared = {}
+
+def _init_worker(specs):
+    profiling.worker_init()
+    for key, spec in specs.items():
+        _shared[key] = sharedArrays.attach(spec)
+
+def _score(task):
+    cid, params, col, ticker, windows = task
+    X, prices = _shared['X'][1], _shared['prices'][1][:, col]
+    label_params = dict(LABEL_PARAMS, **dict((k, v) for k, v in params.items() if k in LABEL_PARAMS))
+    model_params = dict((k, v) for k, v in params.items() if k not in LABEL_PARAMS)
+
+    fwd = labels.forward_returns(prices, label_params['hm_days'])
+    y = labels.first_crossing(fwd, label_params['requirement'])
+    valid = np.isfinite(fwd).all(axis=-1)
+    Xc, yc = X[valid], y[valid]
+
+    make_model = lambda: classifiers.make_classifier().set_params(**model_params)
+    scores = []
+    for train_size, test_size in windows:
+        for train, test in walkForward.folds(len(yc), train_size, test_size, gap=label_params['hm_days']):
+            scores.append(walkForward.score_fold(Xc, yc, train, test, make_model)[0])
+    return cid, params, ticker, float(np.mean(scores)) if scores else float('nan'), len(scores)
+
+def setup_id(windows, closes_path):
+    """Fingerprint of what a score depends on besides its configuration and ticker."""
+    return memoCache.fingerprint('sweep', [list(w) for w in windows],
+                                 memoCache.file_fingerprint(closes_path),
+                                 memoCache.code_fingerprint(_score, labels, walkForward,
+                                                            classifiers.make_classifier))[:12]
+
+def read_results(results_path, setup):
+    """
+    {(config, ticker): accuracy} of every score already written for setup.
+    A last row cut short by an interrupted run is dropped from the file.
+    """
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, 'rb+') as f:
+        content = f.read()
+        if content and not content.endswith(b'\n'):
+            f.truncate(content.rfind(b'\n') + 1)
+    with open(results_path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames and reader.fieldnames != RESULT_FIELDS:
+            raise ValueError('{} has columns {}, not {}; use a new results_path'.format(
+                results_path, reader.fieldnames, RESULT_FIELDS))
+        for row in reader:
+            if row['setup'] == setup:
+                done[(row['config'], row['ticker'])] = float(row['accuracy'])
+    return done
+
+def run_sweep(space, tickers=None, n_configs=None, seed=None, eta=3, windows=((504, 126),),
+              processes=None, results_path='sweep_results.csv', closes_path='sample_sp500_closes.csv'):
+    """
+    Sweep space (the full grid, or n_configs random configurations) over
+    tickers with successive halving. Returns one row per configuration with
+    its mean accuracy, the tickers it was scored on and the rung it reached.
+    """
+    df = pd.read_csv(closes_path, index_col=0)
+    columns = df.columns.values.tolist()
+    tickers = tickers or columns
+    configs = grid(space) if n_configs is None else sample(space, n_configs, seed)
+    configs = dict((config_id(c), c) for c in configs)
+
+    setup = setup_id(windows, closes_path)
+    done = read_results(results_path, setup)
+    new_file = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+    alive, reached = list(configs), {}
+
+    X = raggedPanel.from_frame(df).returns().fillna(0).dense(fill=0)
+    blocks, specs = [], {}
+    try:
+        for key, arr in (('X', X), ('prices', df.values)):
+            block, specs[key] = sharedArrays.share(arr)
+            blocks.append(block)
+        del X
+
+        pool = Pool(processes, initializer=_init_worker, initargs=(specs,))
+        try:
+            with open(results_path, 'a') as f:
+                writer = csv.DictWriter(f, RESULT_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                for rung, size in enumerate(rung_sizes(len(configs), len(tickers), eta)):
+                    tasks = [(cid, configs[cid], columns.index(t), t, windows)
+                             for cid in alive for t in tickers[:size] if (cid, t) not in done]
+                    for cid, params, ticker, accuracy, n_folds in pool.imap_unordered(_score, tasks):
+                        done[(cid, ticker)] = accuracy
+                        writer.writerow({'setup': setup, 'config': cid, 'params': json.dumps(params, sort_keys=True),
+                                         'ticker': ticker, 'accuracy': accuracy, 'folds': n_folds})
+                        f.flush()
+                    for cid in alive:
+                        reached[cid] = rung
+                    if size < len(tickers):
+                        # successive halving: keep the best 1/eta on the tickers seen so far
+                        # (a config with no scorable fold on them ranks last)
+                        mean = dict((cid, np.nanmean([done[(cid, t)] for t in tickers[:size]]))
+                                    for cid in alive)
+                        keep = max(1, int(math.ceil(len(alive) / float(eta))))
+                        alive = sorted(alive, key=lambda cid: -np.inf if np.isnan(mean[cid]) else mean[cid],
+                                       reverse=True)[:keep]
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        sharedArrays.release(*blocks)
+
+    rows = []
+    for cid, params in configs.items():
+        scores = [done[(cid, t)] for t in tickers if (cid, t) in done]
+        rows.append(dict(params, config=cid, accuracy=np.nanmean(scores) if scores else np.nan,
+                         tickers=len(scores), rung=reached.get(cid, -1)))
+    return pd.DataFrame(rows).set_index('config').sort_values(['rung', 'accuracy'], ascending=False)
+
+
+if __name__ == "__main__":
+    space = {
+        'knn__n_neighbors': [5, 15, 50],
+        'rfor__n_estimators': [10, 50],
+        'lsvc__C': [0.1, 1.0],
+        'hm_days': [5, 7, 10],
+        'requirement': [0.01, 0.02, 0.03],
+    }
+    print(run_sweep(space, n_configs=27, seed=0).head(10))
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+import backtest
+
+COSTS = dict(commission=0.001, slippage=0.002)
+
+def run(prices, trigger, **kwargs):
+    return backtest.run_backtest(np.array(prices, dtype=np.float64), np.array(trigger), capital=1000.0,
+                                 **dict(COSTS, **kwargs))
+
+def test_holds_shares_between_trades():
+    prices = [[10.0, 20.0], [12.0, 20.0], [15.0, 10.0], [15.0, 20.0]]
+    trigger = [[2, 2], [0, 0], [0, 0], [0, 0]]
+    result = run(prices, trigger)
+    fills = result['fills']
+    # one buy per symbol on day 0, then the share counts are left alone
+    assert list(fills['date']) == [0, 0]
+    np.testing.assert_allclose(fills['shares'], [50.0, 25.0])
+    cash = -500 * 2 * 0.003
+    values = [50 * 10 + 25 * 20, 50 * 12 + 25 * 20, 50 * 15 + 25 * 10, 50 * 15 + 25 * 20]
+    np.testing.assert_allclose(result['equity'], np.add(values, cash))
+    np.testing.assert_allclose(result['weights'][2], np.array([750.0, 250.0]) / (1000 + cash))
+    np.testing.assert_allclose(np.prod(1 + result['returns']) * 1000, result['equity'].iloc[-1])
+
+def test_a_trade_is_sized_off_equity_and_costed():
+    prices = [[10.0, 10.0], [20.0, 10.0], [20.0, 10.0]]
+    trigger = [[2, 2], [-2, 0], [0, 0]]
+    result = run(prices, trigger)
+    fills = result['fills']
+    # day 1: equity 1500 - 3; symbol 0 flips from +50 shares to -(1497 / 2) / 20
+    target = -(1500 - 3) / 2 / 20
+    np.testing.assert_allclose(fills['shares'], [50, 50, target - 50])
+    np.testing.assert_allclose(fills['commission'].iloc[-1], abs(target - 50) * 20 * 0.001)
+    np.testing.assert_allclose(fills['price'].iloc[-1], 20 * (1 - 0.002))
+    equity = 1500 - 3 - abs(target - 50) * 20 * 0.003
+    np.testing.assert_allclose(result['equity'].iloc[1:], equity)
+    assert result['stats']['trades'] == 3
+
+def test_delisted_symbol_is_closed_out():
+    nan = np.nan
+    prices = [[10.0, 10.0], [11.0, 10.0], [12.0, nan], [13.0, nan], [14.0, nan]]
+    trigger = [[2, 2], [0, 0], [0, 0], [0, 0], [0, 0]]
+    result = run(prices, trigger, commission=0.0, slippage=0.0)
+    fills = result['fills']
+    assert list(zip(fills['date'], fills['symbol'], fills['side'])) == [(0, 0, 1), (0, 1, 1), (1, 1, -1)]
+    assert (result['positions'][1:, 1] == 0).all() and (result['weights'][1:, 1] == 0).all()
+    np.testing.assert_allclose(result['equity'], [1000, 1050, 1100, 1150, 1200])
+
+def test_gap_keeps_position():
+    nan = np.nan
+    prices = [[10.0], [nan], [12.0], [12.0]]
+    trigger = [[2], [-2], [0], [0]]
+    result = run(prices, trigger, commission=0.0, slippage=0.0)
+    # the sell waits for the next price, and the gap's move is earned
+    assert list(result['fills']['date']) == [0, 2]
+    np.testing.assert_allclose(result['equity'], [1000, 1000, 1200, 1200])
@@ -0,0 +1,35 @@
+import os
+import pandas as pd
+import pytest
+import benchmark
+
+def history(seconds, stage='train'):
+    return [{'size': 'small', 'stage': stage, 'seconds': str(s)} for s in seconds]
+
+def row(seconds, stage='train'):
+    return {'size': 'small', 'stage': stage, 'seconds': seconds}
+
+def test_regression_needs_more_than_the_noise():
+    steady = history([1.00, 1.01, 0.99, 1.00, 1.02])
+    assert benchmark.regressions(steady, [row(1.30)]) == [('small', 'train', 1.30, 1.00)]
+    assert benchmark.regressions(steady, [row(1.20)]) == []
+    # the same 30% is within what this stage's times swing by
+    noisy = history([1.0, 1.6, 0.7, 1.4, 0.8])
+    assert benchmark.regressions(noisy, [row(1.30)]) == []
+    assert benchmark.regressions(noisy, [row(3.00)]) == [('small', 'train', 3.00, 1.0)]
+
+def test_regression_compares_like_with_like():
+    past = history([1.0] * 5, 'panel_ind') + history([0.01] * 5, 'get_data')
+    # under min_seconds, and a stage with no history, never regress
+    assert benchmark.regressions(past, [row(0.04, 'get_data'), row(9.0, 'train')]) == []
+    assert benchmark.regressions(past, [row(2.0, 'panel_ind')]) == [('small', 'panel_ind', 2.0, 1.0)]
+
+def test_stages_run_on_a_generated_market(tmp_path):
+    path = str(tmp_path)
+    tickers = benchmark.generate_market(path, 6, 1)
+    stages = [s for s in benchmark.STAGES if s != 'train']
+    results = benchmark.run_stages(path, repeat=1, stages=stages)
+    assert sorted(results) == sorted(stages)
+    closes = pd.read_csv(os.path.join(path, 'sample_sp500_closes.csv'), index_col=0)
+    assert list(closes.columns) == tickers
+    assert os.getcwd() != path
@@ -0,0 +1,69 @@
+import os
+import random
+import shutil
+import pandas as pd
+import pytest
+import downloader
+
+CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs', 'A.csv')
+START, END = pd.Timestamp('2015-01-01'), pd.Timestamp('2015-12-31')
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source'
+    path.mkdir()
+    shutil.copy(CSV, str(path / 'A.csv'))
+    return str(path)
+
+@pytest.fixture
+def out_dir(tmp_path):
+    path = tmp_path / 'out'
+    path.mkdir()
+    return str(path)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(downloader.time, 'sleep', slept.append)
+    return slept
+
+def expected(source):
+    df = pd.read_csv(os.path.join(source, 'A.csv'), index_col='Date', parse_dates=True)
+    return df.loc[START:END, downloader.CSV_COLUMNS]
+
+def written(out_dir):
+    return pd.read_csv(os.path.join(out_dir, 'A.csv'), index_col='Date', parse_dates=True)
+
+def test_retries_with_backoff(source, out_dir, sleeps):
+    # with seed 1 the first fetch fails and the second succeeds
+    random.seed(1)
+    provider = downloader.FileProvider(source, latency=0.5, fail_rate=0.5)
+    rows = downloader.refresh_ticker(provider, 'A', START, END, out_dir, retries=3, backoff=0.25)
+    assert rows == len(expected(source))
+    # latency, backoff after the failure, latency again
+    assert sleeps == [0.5, 0.25, 0.5]
+    pd.testing.assert_frame_equal(written(out_dir), expected(source), check_freq=False)
+
+def test_gives_up_after_retries(source, out_dir, sleeps):
+    provider = downloader.FileProvider(source, fail_rate=1.0)
+    added, failed = downloader.download(['A'], provider, START, END, out_dir, retries=3, backoff=0.25)
+    assert added == {} and isinstance(failed['A'], IOError)
+    assert sleeps == [0.25, 0.5, 1.0]
+    assert not os.path.exists(os.path.join(out_dir, 'A.csv'))
+
+def test_resumes_after_partial_last_line(source, out_dir, sleeps):
+    provider = downloader.FileProvider(source)
+    downloader.refresh_ticker(provider, 'A', START, pd.Timestamp('2015-06-30'), out_dir)
+    with open(os.path.join(out_dir, 'A.csv'), 'a') as f:
+        f.write('2015-07-01,41.1,41.')
+    rows = downloader.refresh_ticker(provider, 'A', START, END, out_dir)
+    assert rows == len(expected(source).loc['2015-07-01':])
+    pd.testing.assert_frame_equal(written(out_dir), expected(source), check_freq=False)
+
+@pytest.mark.parametrize('content', ['', 'Date,Open,Hi'])
+def test_rewrites_without_complete_header(source, out_dir, sleeps, content):
+    with open(os.path.join(out_dir, 'A.csv'), 'w') as f:
+        f.write(content)
+    assert downloader.read_tail(os.path.join(out_dir, 'A.csv')) == (None, None)
+    downloader.refresh_ticker(downloader.FileProvider(source), 'A', START, END, out_dir)
+    pd.testing.assert_frame_equal(written(out_dir), expected(source), check_freq=False)
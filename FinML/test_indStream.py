@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import indStream
+import indTemplate
+
+CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs', 'A.csv')
+
+@pytest.fixture
+def prices():
+    return pd.read_csv(CSV, index_col=0, parse_dates=True)['Adj Close'].loc['2004':'2007']
+
+def batch(monkeypatch, prices, lookback, momentum_period):
+    # get_ind_data on the CSV's own trading days
+    monkeypatch.setattr(indTemplate.util, 'get_data',
+                        lambda symbols, dates: prices.loc[dates[0]:dates[-1]].to_frame(symbols[0]))
+    return indTemplate.get_ind_data('A', prices.index[0], prices.index[-1], lookback, momentum_period)
+
+@pytest.mark.parametrize('lookback,momentum_period', [(14, 14), (15, 20)])
+def test_replay_matches_get_ind_data(monkeypatch, prices, lookback, momentum_period):
+    expected = batch(monkeypatch, prices, lookback, momentum_period)[indStream.COLUMNS]
+    got = indStream.IndicatorEngine(lookback, momentum_period).replay('A', prices)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_freq=False, rtol=1e-9)
+
+def test_checkpoint_restore_continues(monkeypatch, prices, tmp_path):
+    expected = batch(monkeypatch, prices, 14, 14)[indStream.COLUMNS]
+    engine = indStream.IndicatorEngine()
+    first = engine.replay('A', prices.iloc[:500])
+    path = str(tmp_path / 'engine.pkl')
+    engine.checkpoint(path)
+    rest = indStream.IndicatorEngine.restore(path).replay('A', prices.iloc[500:])
+    pd.testing.assert_frame_equal(pd.concat([first, rest]), expected, check_dtype=False,
+                                  check_freq=False, rtol=1e-9)
+
+def test_ewma_matches_pandas_with_gaps():
+    x = pd.Series([np.nan, 1.0, 2.0, np.nan, np.nan, 5.0, 4.0, np.nan, 3.0])
+    ewma = indStream.EWMA(span=3)
+    got = [ewma.update(v) for v in x]
+    np.testing.assert_allclose(got, x.ewm(span=3, adjust=True).mean(), rtol=1e-12)
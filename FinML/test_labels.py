@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import labels
+import classifiers
+
+CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs')
+
+@pytest.fixture
+def closes():
+    # ABBV lists in 2013, so its column starts with NaN
+    frames = [pd.read_csv(os.path.join(CSV_DIR, '{}.csv'.format(t)), index_col=0, parse_dates=True)['Adj Close']
+              for t in ['A', 'ABBV']]
+    return pd.concat(frames, axis=1, keys=['A', 'ABBV']).loc['2012-06':'2013-06']
+
+@pytest.mark.parametrize('hm_days', [1, 7])
+def test_forward_returns_match_shift(closes, hm_days):
+    fwd = labels.forward_returns(closes.values, hm_days)
+    for i in range(1, hm_days + 1):
+        expected = (closes.shift(-i) - closes) / closes
+        np.testing.assert_allclose(fwd[..., i - 1], expected.values, rtol=1e-12)
+
+def test_first_crossing_matches_stock_decision(closes):
+    fwd = labels.forward_returns(closes['A'].values, 7)
+    # stock_decision uses 0.02; NaN compares False there too
+    expected = [classifiers.stock_decision(*row) for row in fwd]
+    np.testing.assert_array_equal(labels.first_crossing(fwd, 0.02), expected)
+
+def test_first_crossing_takes_the_earliest_horizon():
+    fwd = np.array([[0.01, -0.03, 0.05],
+                    [np.nan, 0.04, -0.05],
+                    [0.01, 0.02, -0.02],
+                    [np.nan, np.nan, np.nan]])
+    np.testing.assert_array_equal(labels.first_crossing(fwd, 0.02), [-1, 1, 0, 0])
+
+def test_label_panel_per_column(closes):
+    y, fwd = labels.label_panel(closes.values, 5, 0.03)
+    assert y.shape == closes.shape and fwd.shape == closes.shape + (5,)
+    for col, ticker in enumerate(closes.columns):
+        np.testing.assert_array_equal(y[:, col],
+                                      labels.first_crossing(labels.forward_returns(closes[ticker].values, 5), 0.03))
+    # rows before ABBV's first close have no return, so no label
+    assert (y[closes['ABBV'].isnull().values, 1] == 0).all()
@@ -0,0 +1,47 @@
+import importlib
+import sys
+import numpy as np
+import pytest
+import memoCache
+
+@pytest.fixture
+def module(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    path = tmp_path / 'featurecode.py'
+    path.write_text('def label(x):\n    return x > 0.02\n')
+    yield path, importlib.import_module('featurecode')
+    sys.modules.pop('featurecode', None)
+
+def test_code_fingerprint_follows_edits(module):
+    path, mod = module
+    before = memoCache.code_fingerprint(mod.label), memoCache.code_fingerprint(mod)
+    assert memoCache.code_fingerprint(mod.label) == before[0]
+    path.write_text('def label(x):\n    return x > 0.035\n')
+    mod = importlib.reload(mod)
+    assert memoCache.code_fingerprint(mod.label) != before[0]
+    assert memoCache.code_fingerprint(mod) != before[1]
+
+def test_code_fingerprint_without_source():
+    f = eval('lambda x: x + 1')
+    g = eval('lambda x: x + 2')
+    assert memoCache.code_fingerprint(f) != memoCache.code_fingerprint(g)
+
+def test_memoize_recomputes_when_code_changes(module, tmp_path):
+    path, mod = module
+    cache = memoCache.DiskCache(str(tmp_path / 'cache'))
+    x = np.array([0.01, 0.025, 0.05])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return mod.label(x)
+
+    key = lambda: memoCache.fingerprint('labels', x, memoCache.code_fingerprint(mod.label))
+    np.testing.assert_array_equal(cache.memoize(key(), compute), [False, True, True])
+    np.testing.assert_array_equal(cache.memoize(key(), compute), [False, True, True])
+    assert len(calls) == 1
+    path.write_text('def label(x):\n    return x > 0.035\n')
+    mod = importlib.reload(mod)
+    np.testing.assert_array_equal(cache.memoize(key(), compute), [False, False, True])
+    assert len(calls) == 2
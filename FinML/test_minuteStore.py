@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+import minuteStore
+
+def make_bars(start, end, every=10, seed=0):
+    """Every few minutes of 9:31-16:00 on each weekday from start to end, prices in cents."""
+    days = pd.bdate_range(start, end)
+    offsets = pd.to_timedelta(np.arange(9 * 60 + 31, 16 * 60 + 1, every), unit='min')
+    index = pd.DatetimeIndex([d + o for d in days for o in offsets], name='Datetime')
+    rng = np.random.RandomState(seed)
+    close = np.round(100 + rng.randn(len(index)).cumsum(), 2)
+    return pd.DataFrame({'Open': close - 0.05, 'High': close + 0.25, 'Low': close - 0.25,
+                         'Close': close, 'Volume': rng.randint(100, 10 ** 6, len(index)).astype(float)},
+                        index=index, columns=minuteStore.FIELDS)
+
+def assert_bars_equal(got, expected):
+    # prices come back as float32; cents survive the round trip
+    assert (got.index == expected.index).all()
+    for f in minuteStore.FIELDS:
+        np.testing.assert_array_equal(np.round(got[f].values.astype(np.float64), 2),
+                                      np.round(expected[f].values, 2))
+
+@pytest.fixture
+def bars():
+    return make_bars('2016-01-25', '2016-03-08')
+
+@pytest.fixture
+def store(tmp_path, bars):
+    path = str(tmp_path / 'bars.csv')
+    bars.to_csv(path)
+    store = minuteStore.MinuteStore(str(tmp_path / 'store'))
+    # chunks of 100 rows end mid-day and mid-month
+    assert store.ingest_csv(path, 'AAA', chunk_rows=100) == len(bars)
+    return store
+
+def test_chunked_ingest_splits_months(store, bars):
+    assert store.months('AAA') == ['2016-01', '2016-02', '2016-03']
+    reopened = minuteStore.MinuteStore(store.path)
+    for month in reopened.months('AAA'):
+        expected = bars.loc[month]
+        first, last, rows = reopened.index['AAA'][month]
+        assert rows == len(expected)
+        assert (first, last) == tuple(minuteStore.to_minute_ints(expected.index[[0, -1]]))
+        assert_bars_equal(reopened.month('AAA', month), expected)
+
+def test_day_and_range(store, bars):
+    assert_bars_equal(store.day('AAA', '2016-02-01'), bars.loc['2016-02-01'])
+    assert len(store.day('AAA', '2016-02-06')) == 0          # a Saturday
+    assert len(store.day('AAA', '2016-05-02')) == 0          # no such month
+    got = store.range('AAA', '2016-01-29 15:00', '2016-02-01 10:01')
+    assert_bars_equal(got, bars.loc['2016-01-29 15:00':'2016-02-01 10:01'])
+    assert len(store.range('BBB', '2016-01-29', '2016-02-01')) == 0
+
+def test_write_merges_into_stored_months(store, bars):
+    update = bars.loc['2016-02-29 15:00':'2016-03-01 10:00'].copy()
+    update['Close'] += 1
+    later = make_bars('2016-03-09', '2016-03-10', seed=1)
+    store.write('AAA', pd.concat([update, later]))
+    expected = bars.copy()
+    expected.loc[update.index, 'Close'] = update['Close']
+    expected = pd.concat([expected, later])
+    assert_bars_equal(store.range('AAA', '2016-01-01', '2016-04-01'), expected)
+    assert minuteStore.MinuteStore(store.path).index['AAA']['2016-03'][2] == len(expected.loc['2016-03'])
+
+def test_universe_aligns_tickers(store, bars):
+    other = bars.loc['2016-02-02'].iloc[::2] * 2
+    store.write('BBB', other)
+    got = store.universe(['AAA', 'BBB', 'CCC'], '2016-02-02 09:00', '2016-02-02 17:00')
+    day = bars.loc['2016-02-02']
+    assert (got.index == day.index).all()
+    np.testing.assert_array_equal(np.round(got['AAA'].values, 2), np.round(day['Close'].values, 2))
+    np.testing.assert_array_equal(np.round(got['BBB'].values, 2),
+                                  np.round(other['Close'].reindex(day.index).values, 2))
+    assert got['CCC'].isnull().all()
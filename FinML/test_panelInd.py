@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import panelInd
+import priceStore
+import indTemplate
+
+CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs')
+# ABBV lists in 2013, so its column starts with NaN
+TICKERS = ['A', 'AAL', 'ABBV', 'ABT']
+
+@pytest.fixture(scope='module')
+def panel():
+    days, tickers, prices = priceStore.build_panel(TICKERS, 'Adj Close', CSV_DIR)
+    index = priceStore.from_day_ints(days)
+    keep = (index >= '2011-01-01') & (index < '2015-01-01')
+    return pd.DataFrame(prices[keep], index=index[keep], columns=tickers)
+
+def per_ticker(monkeypatch, column, lookback, momentum_period):
+    # get_ind_data on one column of the panel, NaNs included
+    monkeypatch.setattr(indTemplate.util, 'get_data',
+                        lambda symbols, dates: column.loc[dates[0]:dates[-1]].to_frame(symbols[0]))
+    return indTemplate.get_ind_data(column.name, column.index[0], column.index[-1],
+                                    lookback, momentum_period)
+
+@pytest.mark.parametrize('lookback,momentum_period', [(14, 14), (20, 5), (14, 0)])
+def test_panel_matches_get_ind_data(monkeypatch, panel, lookback, momentum_period):
+    ind = panelInd.get_panel_ind(panel.values, lookback, momentum_period)
+    for col, ticker in enumerate(panel.columns):
+        expected = per_ticker(monkeypatch, panel[ticker], lookback, momentum_period)
+        for name, values in ind.items():
+            # pandas' running-sum rolling mean and the window mean differ in the last bits
+            np.testing.assert_allclose(values[:, col], expected[name].values.astype(np.float64),
+                                       rtol=1e-7, atol=1e-10, err_msg='{} {}'.format(ticker, name))
+
+@pytest.mark.parametrize('n', [0, 1, 3, 10])
+def test_shift_matches_pandas(n):
+    a = np.arange(12, dtype=np.float64).reshape(6, 2)
+    np.testing.assert_array_equal(panelInd.shift(a, n), pd.DataFrame(a).shift(n).values)
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import labels
+import priceStore
+import raggedPanel
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLOSES = os.path.join(HERE, 'sample_sp500_closes.csv')
+
+@pytest.fixture(scope='module')
+def df():
+    df = pd.read_csv(CLOSES, index_col=0)
+    df.index = pd.to_datetime(df.index)
+    # a gap inside a span stays NaN; a column with no prices has an empty span
+    df.iloc[100:103, 0] = np.nan
+    df['EMPTY'] = np.nan
+    return df
+
+@pytest.fixture(scope='module')
+def panel(df):
+    return raggedPanel.from_frame(df)
+
+def test_round_trip(df, panel):
+    assert panel.shape == df.shape
+    assert panel.nbytes < df.values.nbytes
+    frame = panel.to_frame()
+    assert (frame.index == df.index).all() and list(frame.columns) == list(df.columns)
+    np.testing.assert_array_equal(frame.values, df.values)
+    assert panel.span('EMPTY') == (0, 0)
+    abbv = df['ABBV'].dropna()
+    assert panel.span('ABBV') == (df.index.get_loc(abbv.index[0]), df.index.get_loc(abbv.index[-1]) + 1)
+    np.testing.assert_array_equal(panel.series('ABBV'), abbv.values)
+    rows = slice(1000, 1500)
+    np.testing.assert_array_equal(panel.dense(rows=rows), df.values[rows])
+
+def test_returns_match_pct_change(df, panel):
+    expected = df.pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan)
+    np.testing.assert_allclose(panel.dense(panel.returns().values), expected.values, rtol=1e-12)
+
+def test_labels_match_dense_labels(df, panel):
+    y, fwd, valid = panel.labels(7, 0.02)
+    dense_y, dense_fwd = labels.label_panel(df.values, 7, 0.02)
+    np.testing.assert_allclose(panel.dense(fwd[:, 3]), dense_fwd[..., 3], rtol=1e-12)
+    expected_valid = np.isfinite(dense_fwd).all(axis=-1)
+    np.testing.assert_array_equal(panel.dense(valid, fill=False), expected_valid)
+    np.testing.assert_array_equal(panel.dense(y, fill=0)[expected_valid], dense_y[expected_valid])
+
+def test_from_store_matches_build_panel():
+    csv_dir = os.path.join(HERE, 'stock_dfs')
+    tickers = ['A', 'AAL', 'ABBV']
+    days, _, dense = priceStore.build_panel(tickers, 'Adj Close', csv_dir)
+    panel = raggedPanel.from_store(tickers, csv_dir=csv_dir)
+    np.testing.assert_array_equal(panel.days, days)
+    np.testing.assert_array_equal(panel.dense(), dense)
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import resample
+
+CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs', 'A.csv')
+PANDAS_RULE = {'W': 'W', 'M': 'ME', '10D': '10D'}
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(CSV, index_col='Date', parse_dates=True)
+
+def pandas_bars(df, period, price):
+    rule = PANDAS_RULE[period]
+    if price:
+        bars = df[price].resample(rule).ohlc()
+    else:
+        bars = df[['Open', 'High', 'Low', 'Close']].resample(rule).agg(
+            {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'})
+        bars.columns = ['open', 'high', 'low', 'close']
+    bars['volume'] = df['Volume'].resample(rule).sum()
+    return bars.dropna(subset=['close'])
+
+@pytest.mark.parametrize('price', [None, 'Adj Close'])
+def test_matches_pandas_resample(df, price):
+    # 100-row chunks end inside weeks, months and 10-day periods
+    frames = resample.resample_csv(CSV, list(PANDAS_RULE), price, chunk_rows=100)
+    for period in PANDAS_RULE:
+        expected = pandas_bars(df, period, price)
+        got = frames[period]
+        assert (got.index == expected.index).all(), period
+        np.testing.assert_allclose(got.values, expected[resample.BAR_COLUMNS].values, rtol=1e-12,
+                                   err_msg=period)
+
+def test_on_days_uses_finished_periods_only(df):
+    bars = resample.resample_csv(CSV, ['W'], 'Adj Close')['W']
+    days = df.index[(df.index >= '2010-03-01') & (df.index < '2010-04-01')]
+    aligned = resample.on_days(bars, 'W', days)
+    for day, row in aligned.iterrows():
+        expected = bars[bars.index <= day].iloc[-1]
+        np.testing.assert_array_equal(row.values, expected.values)
+    first = resample.on_days(bars, 'W', df.index[:3])
+    assert first.isnull().all().all()
@@ -0,0 +1,79 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import batchTrain
+import serving
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+CLOSES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_sp500_closes.csv')
+TICKERS = ['MMM', 'ABT', 'ACN']
+
+@pytest.fixture(scope='module')
+def trained(tmp_path_factory):
+    path = tmp_path_factory.mktemp('serving')
+    closes = str(path / 'closes.csv')
+    df = pd.read_csv(CLOSES, index_col=0).iloc[-800:, :12]
+    df.to_csv(closes)
+    model_dir = str(path / 'models')
+    batchTrain.train_universe(TICKERS, processes=1, seed=0, closes_path=closes, model_dir=model_dir)
+    return closes, model_dir, df
+
+@pytest.fixture(scope='module')
+def server(trained):
+    closes, model_dir, _ = trained
+    return serving.ModelServer(model_dir, closes)
+
+def test_batched_votes_match_each_model(trained, server):
+    saved = serving.load_models(trained[1])
+    rows = np.vstack([server.X[-50:], np.random.RandomState(0).normal(0, 0.02, (20, server.X.shape[1]))])
+    got = server.predict_rows(rows)
+    for ticker, labels in zip(server.tickers, got):
+        np.testing.assert_array_equal(labels, saved[ticker]['model'].predict(rows))
+    assert server.predict() == dict((t, int(l[49])) for t, l in zip(server.tickers, got))
+
+def test_columns_must_match(trained, tmp_path):
+    closes, model_dir, df = trained
+    reordered = str(tmp_path / 'reordered.csv')
+    df[df.columns[::-1]].to_csv(reordered)
+    with pytest.raises(ValueError, match='another order'):
+        serving.ModelServer(model_dir, reordered)
+    fewer = str(tmp_path / 'fewer.csv')
+    df.iloc[:, :-1].to_csv(fewer)
+    with pytest.raises(ValueError, match=df.columns[-1]):
+        serving.ModelServer(model_dir, fewer)
+
+@pytest.fixture(scope='module')
+def http(server):
+    httpd = serving._ThreadingHTTPServer(('127.0.0.1', 0), serving.make_handler(server))
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+def request(port, method, path, body=None):
+    conn = HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request(method, path, body)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read().decode())
+
+def test_http(server, http):
+    assert request(http, 'GET', '/predict?tickers=MMM') == (200, {'MMM': server.predict(['MMM'])['MMM']})
+    features = server.X[-2:].tolist()
+    status, body = request(http, 'POST', '/predict', json.dumps({'features': features}))
+    assert status == 200 and body == server.predict(X=features)
+    assert request(http, 'GET', '/nowhere')[0] == 404
+
+@pytest.mark.parametrize('body', ['{"features": [[1, 2', '[1, 2]', '{"features": [[1, 2]]}',
+                                  '{"features": [["a"]]}'])
+def test_http_bad_request(http, body):
+    status, reply = request(http, 'POST', '/predict', body)
+    assert status == 400 and reply['error']
@@ -0,0 +1,62 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+import utilities as util
+
+STOCK_DFS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_dfs')
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    for ticker in ['A', 'ABBV', 'MMM']:
+        shutil.copy(os.path.join(STOCK_DFS, ticker + '.csv'), str(tmp_path))
+    # SPY stands in as MMM with a few sessions missing, so those days are dropped
+    spy = pd.read_csv(os.path.join(STOCK_DFS, 'MMM.csv'))
+    spy.drop(spy.index[[3000, 3001, 3200]]).to_csv(str(tmp_path / 'SPY.csv'), index=False)
+    monkeypatch.setenv('MARKET_DATA_DIR', str(tmp_path))
+    util._cache.clear()
+    yield str(tmp_path)
+    util._cache.clear()
+
+def reference(symbols, dates, addSPY=True, colname='Adj Close'):
+    # the original one-join-per-symbol get_data
+    df = pd.DataFrame(index=dates)
+    if addSPY and 'SPY' not in symbols:
+        symbols = ['SPY'] + symbols
+    for symbol in symbols:
+        df_temp = pd.read_csv(util.symbol_to_path(symbol), index_col='Date',
+                              parse_dates=True, usecols=['Date', colname], na_values=['nan'])
+        df = df.join(df_temp.rename(columns={colname: symbol}))
+        if symbol == 'SPY':
+            df = df.dropna(subset=['SPY'])
+    return df
+
+def check(symbols, dates, **kwargs):
+    got = util.get_data(symbols, dates, **kwargs)
+    expected = reference(symbols, dates, **kwargs)
+    assert list(got.columns) == list(expected.columns)
+    assert (got.index == expected.index).all()
+    np.testing.assert_array_equal(got.values, expected.values.astype(np.float64))
+
+@pytest.mark.parametrize('start,end', [('2012-06-01', '2013-06-30'), ('1999-01-01', '2000-02-01'),
+                                       ('2020-01-01', '2020-02-01')])
+def test_matches_reference(data_dir, start, end):
+    # ABBV lists in 2013: NaN before, then prices
+    check(['A', 'ABBV'], pd.date_range(start, end))
+
+def test_options_match_reference(data_dir):
+    dates = pd.date_range('2011-10-01', '2012-01-31')
+    check(['MMM', 'A'], dates, addSPY=False)
+    check(['A'], dates, colname='Volume')
+    check(['A'], dates[::7])
+
+def test_cache_reuses_and_invalidates(data_dir):
+    check(['A'], pd.date_range('2012-01-01', '2012-12-31'))
+    check(['A'], pd.date_range('2012-03-01', '2012-04-30'))  # sliced from the cached year
+    path = os.path.join(data_dir, 'A.csv')
+    df = pd.read_csv(path)
+    df['Adj Close'] = df['Adj Close'] * 2
+    df.to_csv(path, index=False)
+    os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 10))
+    check(['A'], pd.date_range('2012-03-01', '2012-04-30'))
@@ -1,28 +1,132 @@
 """MLT: Utility code."""
 
 import os
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import priceStore
 
-def symbol_to_path(symbol, base_dir=None):
-    """Return CSV file path given ticker symbol."""
+# (symbol, column) windows kept in memory across get_data calls
+CACHE_SIZE = 256
+_cache = OrderedDict()
+
+def data_dir(base_dir=None):
+    """Return the directory holding the per-symbol CSVs."""
     if base_dir is None:
         base_dir = os.environ.get("MARKET_DATA_DIR", '../data/')
-    return os.path.join(base_dir, "{}.csv".format(str(symbol)))
+    return base_dir
+
+def symbol_to_path(symbol, base_dir=None):
+    """Return CSV file path given ticker symbol."""
+    return os.path.join(data_dir(base_dir), "{}.csv".format(str(symbol)))
+
+def _day(line):
+    return int(np.datetime64(line.split(b',', 1)[0].decode().strip()[:10], 'D').astype(np.int64))
 
-def get_data(symbols, dates, addSPY=True, colname = 'Adj Close'):
-    """Read stock data (adjusted close) for given symbols from CSV files."""
-    df = pd.DataFrame(index=dates)
+def _seek_day(f, lo, hi, day):
+    """Byte offset of the first line in [lo, hi) dated day or later, by bisecting a date-sorted CSV."""
+    def line_at(pos):
+        if pos > lo:
+            f.seek(pos - 1)
+            f.readline()
+            pos = f.tell()
+        if pos >= hi:
+            return hi, None
+        f.seek(pos)
+        line = f.readline()
+        return pos, _day(line) if line.strip() else None
+
+    left, right = lo, hi
+    while left < right:
+        mid = (left + right) // 2
+        _, found = line_at(mid)
+        if found is None or found >= day:
+            right = mid
+        else:
+            left = mid + 1
+    return line_at(left)[0]
+
+def read_csv_window(path, columns, lo_day, hi_day):
+    """Rows of a date-sorted CSV with lo_day <= Date <= hi_day, parsing only those rows and columns."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        first = _seek_day(f, start, size, lo_day)
+        last = _seek_day(f, first, size, hi_day + 1)
+        f.seek(first)
+        body = f.read(last - first)
+    df = pd.read_csv(io.BytesIO(header + body), usecols=['Date'] + list(columns), na_values=['nan'])
+    return priceStore.to_day_ints(df['Date']), df
+
+def _read_symbol(symbol, colname, lo_day, hi_day, base_dir):
+    """(days, values) of symbol's colname within [lo_day, hi_day], from the store or the CSV."""
+    store = priceStore.open_store(base_dir)
+    if store is not None and store.is_current(symbol, base_dir):
+        start, stop = store.span(symbol)
+        days = store.days[start:stop]
+        lo, hi = np.searchsorted(days, lo_day), np.searchsorted(days, hi_day, side='right')
+        return np.asarray(days[lo:hi]), np.array(store.column(symbol, colname)[lo:hi])
+    days, df = read_csv_window(symbol_to_path(symbol, base_dir), [colname], lo_day, hi_day)
+    return days, df[colname].values.astype(np.float64)
+
+def load_symbol(symbol, colname, lo_day, hi_day, base_dir=None):
+    """
+    _read_symbol through the in-process LRU: a cached window of the same
+    symbol and column that covers [lo_day, hi_day] is sliced, not reread.
+    """
+    base_dir = data_dir(base_dir)
+    path = symbol_to_path(symbol, base_dir)
+    stamp = os.path.getmtime(path) if os.path.exists(path) else None
+    key = (os.path.abspath(base_dir), symbol, colname)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] == stamp and hit[1] <= lo_day and hi_day <= hit[2]:
+        _cache.move_to_end(key)
+        days, values = hit[3], hit[4]
+        lo, hi = np.searchsorted(days, lo_day), np.searchsorted(days, hi_day, side='right')
+        return days[lo:hi], values[lo:hi]
+    days, values = _read_symbol(symbol, colname, lo_day, hi_day, base_dir)
+    _cache[key] = (stamp, lo_day, hi_day, days, values)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return days, values
+
+def get_data(symbols, dates, addSPY=True, colname = 'Adj Close', max_workers=8):
+    """
+    Read stock data (adjusted close) for given symbols from CSV files.
+    Only the dates' range of colname is read, for all symbols concurrently;
+    the columns are then placed on dates in one array and the days SPY did
+    not trade are dropped at once.
+    """
+    dates = pd.DatetimeIndex(dates)
     if addSPY and 'SPY' not in symbols:  # add SPY for reference, if absent
         symbols = ['SPY'] + symbols
+    if len(dates) == 0:
+        return pd.DataFrame(index=dates, columns=symbols, dtype=np.float64)
+
+    wanted = priceStore.to_day_ints(dates)
+    lo_day, hi_day = int(wanted.min()), int(wanted.max())
+    base_dir = data_dir()
+    with ThreadPoolExecutor(max_workers) as pool:
+        loaded = list(pool.map(lambda s: load_symbol(s, colname, lo_day, hi_day, base_dir), symbols))
 
-    for symbol in symbols:
-        df_temp = pd.read_csv(symbol_to_path(symbol), index_col='Date',
-                parse_dates=True, usecols=['Date', colname], na_values=['nan'])
-        df_temp = df_temp.rename(columns={colname: symbol})
-        df = df.join(df_temp)
-        if symbol == 'SPY':  # drop dates SPY did not trade
-            df = df.dropna(subset=["SPY"])
+    # one lookup for every (date, symbol): keys are symbol * span + day offset,
+    # so concatenating the symbols in order keeps them sorted; the last key
+    # is a sentinel above every query
+    span = hi_day - lo_day + 1
+    keys = np.concatenate([col * span + (days - lo_day) for col, (days, _) in enumerate(loaded)]
+                          + [[len(symbols) * span]])
+    values = np.concatenate([v for _, v in loaded] + [[np.nan]])
+    queries = np.arange(len(symbols)) * span + (wanted - lo_day)[:, np.newaxis]
+    pos = np.searchsorted(keys, queries)
+    panel = np.where(keys[pos] == queries, values[pos], np.nan)
 
+    df = pd.DataFrame(panel, index=dates, columns=symbols)
+    if 'SPY' in symbols:  # drop dates SPY did not trade
+        df = df[~np.isnan(panel[:, symbols.index('SPY')])]
     return df
 
 def plot_data(df, title="Stock prices", xlabel="Date", ylabel="Price"):
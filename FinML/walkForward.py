@@ -0,0 +1,133 @@
+"""
+Walk-forward evaluation of the do_ml classifier.
+
+Instead of one shuffled train_test_split, each fold trains on a window of
+past rows and is scored on the rows that follow it, with a gap of hm_days
+between them so no training label looks into the test period. The panel
+is featurized once (batchTrain.universe_features) and shared with the pool
+workers; every fold is a pair of slices of a ticker's labelled rows. When
+those rows are one unbroken run the folds are views of the shared matrix.
+A ticker with gaps in its prices has its rows gathered into one copy,
+made once per worker and reused by its folds. Folds of every
+ticker and window size run in parallel.
+"""
+
+import numpy as np
+import pandas as pd
+from collections import Counter
+from multiprocessing import Pool
+import classifiers
+import batchTrain
+import sharedArrays
+import profiling
+
+def folds(n_rows, train_size, test_size, step=None, gap=0, expanding=False):
+    """
+    Return [(train, test), ...] slices over n_rows. Test windows of
+    test_size follow each other every step rows (default test_size);
+    train is the train_size rows (or every row, if expanding) ending gap
+    rows before the test window.
+    """
+    step = step or test_size
+    out = []
+    test_start = train_size + gap
+    while test_start + test_size <= n_rows:
+        train_stop = test_start - gap
+        train_start = 0 if expanding else train_stop - train_size
+        out.append((slice(train_start, train_stop), slice(test_start, test_start + test_size)))
+        test_start += step
+    return out
+
+def score_fold(X, y, train, test, make_model=classifiers.make_classifier):
+    """Fit on X[train] and score on X[test]; returns (accuracy, predicted spread)."""
+    clf = make_model()
+    clf.fit(X[train], y[train])
+    predictions = clf.predict(X[test])
+    return np.mean(predictions == y[test]), Counter(predictions)
+
+_shared = {}
+_ticker_rows = {}
+
+def _init_worker(specs):
+    profiling.worker_init()
+    for key, spec in specs.items():
+        _shared[key] = sharedArrays.attach(spec)
+
+def _fit_fold(task):
+    col, fold, train, test, make_model = task
+    X, y, valid = _shared['X'][1], _shared['y'][1], _shared['valid'][1]
+    if col not in _ticker_rows:
+        # the ticker's labelled rows; folds slice them
+        rows = np.flatnonzero(valid[:, col])
+        _ticker_rows.clear()
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            # one unbroken run: views of the shared arrays, nothing copied
+            _ticker_rows[col] = (X[rows[0]:rows[-1] + 1], y[rows[0]:rows[-1] + 1, col], rows)
+        else:
+            # gaps in the prices: gathered once per worker while its folds last
+            _ticker_rows[col] = (X[rows], y[rows, col], rows)
+    Xc, yc, rows = _ticker_rows[col]
+    accuracy, spread = score_fold(Xc, yc, train, test, make_model)
+    return col, fold, rows[train.start], rows[test.start], rows[test.stop - 1], accuracy, spread
+
+def walk_forward(tickers=None, windows=((756, 126),), step=None, gap=None, expanding=False,
+                 processes=None, hm_days=7, requirement=0.02, make_model=classifiers.make_classifier,
+                 closes_path='sample_sp500_closes.csv'):
+    """
+    Walk-forward evaluate every ticker for every (train_size, test_size) in
+    windows, sizes counted in labelled rows. gap defaults to hm_days.
+    Returns one row per fold with its dates, accuracy and predicted spread.
+    """
+    df = pd.read_csv(closes_path, index_col=0)
+    columns = df.columns.values.tolist()
+    tickers = tickers or columns
+    gap = hm_days if gap is None else gap
+    X, y, valid = batchTrain.universe_features(df, hm_days, requirement)
+
+    tasks, keys = [], []
+    for ticker in tickers:
+        col = columns.index(ticker)
+        n_rows = int(valid[:, col].sum())
+        for train_size, test_size in windows:
+            for i, (train, test) in enumerate(folds(n_rows, train_size, test_size, step, gap, expanding)):
+                tasks.append((col, i, train, test, make_model))
+                keys.append((ticker, train_size, test_size))
+
+    blocks, specs = [], {}
+    try:
+        for key, arr in (('X', X), ('y', y), ('valid', valid)):
+            block, specs[key] = sharedArrays.share(arr)
+            blocks.append(block)
+        del X, y, valid
+
+        pool = Pool(processes, initializer=_init_worker, initargs=(specs,))
+        try:
+            # tasks are grouped by ticker, so a worker mostly reuses its gathered rows
+            results = pool.map(_fit_fold, tasks, chunksize=max(1, len(tasks) // (4 * (processes or 8))))
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        sharedArrays.release(*blocks)
+
+    dates = df.index
+    rows = []
+    for (ticker, train_size, test_size), (_, fold, train_start, test_start, test_end, acc, spread) \
+            in zip(keys, results):
+        rows.append((ticker, train_size, test_size, fold, dates[train_start], dates[test_start],
+                     dates[test_end], acc, spread[-1], spread[0], spread[1]))
+    return pd.DataFrame(rows, columns=['ticker', 'train_size', 'test_size', 'fold', 'train_start',
+                                       'test_start', 'test_end', 'accuracy', 'sell', 'hold', 'buy'])
+
+def summarize(results):
+    """Mean, spread and count of fold accuracies per ticker and window, and per window overall."""
+    by_ticker = results.groupby(['ticker', 'train_size', 'test_size'])['accuracy'].agg(['mean', 'std', 'count'])
+    by_window = results.groupby(['train_size', 'test_size'])['accuracy'].agg(['mean', 'std', 'count'])
+    return by_ticker, by_window
+
+
+if __name__ == "__main__":
+    results = walk_forward(['GOOG'], windows=[(252, 63), (504, 126), (756, 126)])
+    by_ticker, by_window = summarize(results)
+    print(results)
+    print(by_window)
@@ -13,12 +13,15 @@ import datetime
 from pytz import timezone
 from zipline.utils import tradingcalendar as calendar
 
+NS_PER_DAY = 86400 * 10**9
+
 class EventManager(object):
     def __init__(self, 
                  period=1,
                  max_daily_hits=1,
                  frequency = '1m',
-                 trade_timing_func=None):
+                 trade_timing_func=None,
+                 vectorized=False):
         
         self.period = period
         self.max_daily_hits = max_daily_hits
@@ -28,14 +31,25 @@ class EventManager(object):
         self.market_open = None
         self.market_close = None
         self.frequency = frequency
+        # session index and open/close of the next event, as int64 ns
+        self._next_idx = None
+        self._open_ns = None
+        self._close_ns = None
+        # vectorized mode: every event timestamp, precomputed
+        self.vectorized = vectorized
+        self.events = None
+        self._event_pos = 0
     
     @property
     def todays_index(self):
         dt = calendar.canonicalize_datetime(get_datetime())
-        return calendar.trading_days.searchsorted(dt)
+        return calendar.session_index.index_of(dt)
     
     def open_and_close(self, dt):
-        return calendar.open_and_closes.T[dt]
+        cal = calendar.session_index
+        market_open, market_close = cal.open_and_close(cal.index_of(dt))
+        return {'market_open': pd.Timestamp(market_open, tz='UTC'),
+                'market_close': pd.Timestamp(market_close, tz='UTC')}
         
     def format_datetime(self, dt):
         # if in minute mode, dt is datetime.datetime
@@ -45,43 +59,76 @@ class EventManager(object):
             '1d': lambda x: x.date() if x is not None else x,
         }[self.frequency](dt)
         return tmp
+
+    def _format_ns(self, ns):
+        # format_datetime on int64 ns: the UTC day in daily mode
+        return ns // NS_PER_DAY if self.frequency == '1d' else ns
+
+    def _set_event(self, idx):
+        cal = calendar.session_index
+        self._next_idx = idx
+        self._open_ns, self._close_ns = cal.open_and_close(idx)
+        if idx >= len(cal.sessions):
+            # past the end of the calendar no further event fires
+            self.next_event_date = self.market_open = self.market_close = None
+            return
+        self.next_event_date = cal.trading_days[idx]
+        self.market_open = pd.Timestamp(self._open_ns, tz='UTC')
+        self.market_close = pd.Timestamp(self._close_ns, tz='UTC')
+
+    def precompute(self, start=None, end=None):
+        """
+        Vectorized mode: compute every event timestamp between start and end
+        up front, every `period` sessions. In daily mode an event is the
+        session close; in minute mode they are the first max_daily_hits
+        minutes of the session for which trade_timing_func(minute) is true.
+        """
+        timing_func = self._trade_timing_func if self.frequency == '1m' else None
+        self.events = calendar.session_index.event_times(self.period, start, end, timing_func,
+                                                         self.max_daily_hits)
+        self._event_pos = 0
+        self.vectorized = True
+        return self.events
+
+    def _vectorized_signal(self, now_ns):
+        if self.events is None:
+            self.precompute(start=pd.Timestamp(now_ns, tz='UTC').normalize())
+        pos = self._event_pos
+        if pos >= len(self.events) or now_ns < self.events[pos]:
+            return False
+        # skip events that passed without a call
+        self._event_pos = int(np.searchsorted(self.events, now_ns, side='right'))
+        return True
         
     def signal(self, *args, **kwargs):
         '''
         Entry point for the rule_func
         All arguments are passed to rule_func
         '''
-        now = get_datetime()
-        dt = calendar.canonicalize_datetime(get_datetime())
-        if self.next_event_date is None:
-            self.next_event_date = dt
-            times = self.open_and_close(dt)
-            self.market_open = times['market_open'] 
-            self.market_close = times['market_close'] 
-        if self.format_datetime(now) < self.format_datetime(self.market_open):
+        now_ns = get_datetime().value
+        if self.vectorized:
+            return self._vectorized_signal(now_ns)
+        if self._next_idx is None:
+            dt = calendar.canonicalize_datetime(get_datetime())
+            self._set_event(calendar.session_index.index_of(dt))
+        if self._format_ns(now_ns) < self._format_ns(self._open_ns):
             return False
-        #print self.format_datetime(now) >= self.format_datetime(self.market_close)
         if (self.frequency == '1m'):
             # decide if it is the entry time for today's trading
             decision = self._trade_timing_func(*args, **kwargs)
             if decision:
                 self.remaining_hits -= 1
-                self.set_next_event_date()
+                if self.remaining_hits <= 0:
+                    self.set_next_event_date()
         elif (self.frequency == '1d'):
-            decision = self.format_datetime(now) >= \
-                self.format_datetime(self.market_close)
+            decision = self._format_ns(now_ns) >= self._format_ns(self._close_ns)
             if decision:
                 self.set_next_event_date()
         return decision
     
     def set_next_event_date(self):
         self.remaining_hits = self.max_daily_hits
-        tdays = calendar.trading_days
-        idx = self.todays_index + self.period
-        self.next_event_date = tdays[idx]
-        times = self.open_and_close(self.next_event_date)
-        self.market_open = times['market_open']
-        self.market_close = times['market_close']
+        self._set_event(calendar.session_index.ahead(self.todays_index, self.period))
         
     
 
@@ -0,0 +1,297 @@
+"""
+Local point-in-time fundamentals store and the get_fundamentals query API.
+
+The store keeps one columnar snapshot per date: every field is an array
+over the symbols reported that day, and every numeric field also has a
+sorted copy with its argsort. Queries such as
+
+    query(fundamentals.valuation_ratios.pe_ratio, fundamentals.valuation.market_cap)
+        .filter(fundamentals.valuation_ratios.pe_ratio < 12)
+        .order_by(fundamentals.valuation.market_cap.desc())
+        .limit(15)
+
+walk the sorted market_cap index from the top and stop once 15 rows pass
+the filters. Range filters on an indexed field cut its sorted index with
+searchsorted instead of scanning the universe.
+
+    python fundamentals.py fundamentals.csv fundamentals/
+
+builds a store from a long CSV with date, symbol and one column per field.
+"""
+
+import os
+import sys
+import json
+import operator
+import numpy as np
+import pandas as pd
+
+DATES_FILE = 'dates.npy'
+OFFSETS_FILE = 'offsets.npy'
+DIRECTORY_FILE = 'directory.json'
+
+# ---- storage ----
+
+def build_store(df, path, date_col='date', symbol_col='symbol'):
+    """
+    Write a long DataFrame (date, symbol, fields...) as a store. Snapshots
+    are stored back to back: rows offsets[i]:offsets[i + 1] of every column
+    file belong to dates[i]. order_<field> holds each snapshot's argsort
+    (NaNs last) and sorted_<field> the values in that order.
+    """
+    if not os.path.exists(path):
+        os.makedirs(path)
+    df = df.sort_values([date_col, symbol_col], kind='mergesort')
+    days = pd.to_datetime(df[date_col]).values.astype('datetime64[D]').astype(np.int64)
+    symbols = sorted(df[symbol_col].unique())
+    fields = [c for c in df.columns if c not in (date_col, symbol_col)]
+
+    dates, first, counts = np.unique(days, return_index=True, return_counts=True)
+    offsets = np.append(first, len(days)).astype(np.int64)
+    snapshot = np.repeat(np.arange(len(dates)), counts)
+    np.save(os.path.join(path, DATES_FILE), dates)
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+    np.save(os.path.join(path, 'sid.npy'), np.searchsorted(symbols, df[symbol_col].values))
+
+    for field in fields:
+        values = pd.to_numeric(df[field], errors='coerce').values.astype(np.float64)
+        order = np.lexsort((values, snapshot))  # by snapshot, then value, NaNs last
+        np.save(os.path.join(path, field + '.npy'), values)
+        np.save(os.path.join(path, 'order_' + field + '.npy'), order - offsets[snapshot[order]])
+        np.save(os.path.join(path, 'sorted_' + field + '.npy'), values[order])
+
+    with open(os.path.join(path, DIRECTORY_FILE), 'w') as f:
+        json.dump({'symbols': symbols, 'fields': fields}, f)
+
+class FundamentalsStore(object):
+    """Read side of a store; column files are memory-mapped and snapshots are views."""
+
+    def __init__(self, path):
+        self.path = path
+        self.days = np.load(os.path.join(path, DATES_FILE))
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        with open(os.path.join(path, DIRECTORY_FILE)) as f:
+            directory = json.load(f)
+        self.symbols = directory['symbols']
+        self.fields = directory['fields']
+        names = ['sid'] + [prefix + f for f in self.fields for prefix in ('', 'order_', 'sorted_')]
+        self.columns = dict((name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+                            for name in names)
+
+    def snapshot(self, day):
+        """The latest snapshot on or before day (int days since epoch) as {column: array}, or None."""
+        i = int(np.searchsorted(self.days, day, side='right')) - 1
+        if i < 0:
+            return None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return dict((name, column[lo:hi]) for name, column in self.columns.items())
+
+# ---- query language ----
+
+class Ordering(object):
+    def __init__(self, field, descending):
+        self.field = field
+        self.descending = descending
+
+class Predicate(object):
+    ops = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+           '==': operator.eq, '!=': operator.ne}
+
+    def __init__(self, field, op, value):
+        self.field, self.op, self.value = field, op, value
+
+    def evaluate(self, values):
+        if self.value is None:
+            isnull = np.isnan(values)
+            return isnull if self.op == '==' else ~isnull
+        with np.errstate(invalid='ignore'):
+            return self.ops[self.op](values, self.value)
+
+    def bounds(self, sorted_values):
+        """[lo, hi) rows of the ascending sorted index that can satisfy the predicate, or None."""
+        n = int(np.count_nonzero(~np.isnan(sorted_values)))
+        valid = sorted_values[:n]
+        if self.value is None:
+            return (0, n) if self.op == '!=' else None
+        if self.op == '<':
+            return 0, int(np.searchsorted(valid, self.value, side='left'))
+        if self.op == '<=':
+            return 0, int(np.searchsorted(valid, self.value, side='right'))
+        if self.op == '>':
+            return int(np.searchsorted(valid, self.value, side='right')), n
+        if self.op == '>=':
+            return int(np.searchsorted(valid, self.value, side='left')), n
+        if self.op == '==':
+            return int(np.searchsorted(valid, self.value, side='left')), \
+                int(np.searchsorted(valid, self.value, side='right'))
+        return None
+
+class Column(object):
+    """fundamentals.<namespace>.<field>; the namespace is only for readability."""
+
+    def __init__(self, field):
+        self.field = field
+
+    def desc(self):
+        return Ordering(self.field, True)
+
+    def asc(self):
+        return Ordering(self.field, False)
+
+    def _compare(op):
+        return lambda self, value: Predicate(self.field, op, value)
+
+    __lt__ = _compare('<')
+    __le__ = _compare('<=')
+    __gt__ = _compare('>')
+    __ge__ = _compare('>=')
+    __eq__ = _compare('==')
+    __ne__ = _compare('!=')
+    __hash__ = object.__hash__
+    del _compare
+
+class _Namespace(object):
+    def __getattr__(self, field):
+        if field.startswith('__'):
+            raise AttributeError(field)
+        return Column(field)
+
+class _Fundamentals(object):
+    def __getattr__(self, namespace):
+        if namespace.startswith('__'):
+            raise AttributeError(namespace)
+        return _Namespace()
+
+fundamentals = _Fundamentals()
+
+class Query(object):
+    def __init__(self, columns, predicates=(), ordering=None, limit_n=None):
+        self.columns = list(columns)
+        self.predicates = list(predicates)
+        self.ordering = ordering
+        self.limit_n = limit_n
+
+    def filter(self, predicate):
+        return Query(self.columns, self.predicates + [predicate], self.ordering, self.limit_n)
+
+    def order_by(self, ordering):
+        if isinstance(ordering, Column):
+            ordering = ordering.asc()
+        return Query(self.columns, self.predicates, ordering, self.limit_n)
+
+    def limit(self, n):
+        return Query(self.columns, self.predicates, self.ordering, n)
+
+def query(*columns):
+    return Query(columns)
+
+def _slice_for(snap, field, predicates):
+    """
+    Narrow the sorted index of field with every range predicate on it. Rows
+    where field is NaN (sorted last) are never in the slice, so ordering by
+    a field skips symbols that don't report it, in either direction.
+    """
+    lo, hi = 0, int(np.count_nonzero(~np.isnan(snap['sorted_' + field])))
+    for p in predicates:
+        if p.field == field:
+            b = p.bounds(snap['sorted_' + field])
+            if b is None:
+                continue
+            lo, hi = max(lo, b[0]), min(hi, b[1])
+    return lo, max(lo, hi)
+
+def _descending(rows, values):
+    """
+    rows, ascending by values with ties in store order, turned descending;
+    tied rows keep store order rather than coming out reversed.
+    """
+    rows, values = rows[::-1], values[::-1]
+    new_run = np.append(True, values[1:] != values[:-1])
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(values))
+    run = np.cumsum(new_run) - 1
+    # position i of run [start, end) reads from start + end - 1 - i
+    return rows[starts[run] + ends[run] - 1 - np.arange(len(rows))]
+
+def _fields_of(q):
+    """Every field q reads: its columns, filters and ordering."""
+    fields = [c.field for c in q.columns] + [p.field for p in q.predicates]
+    if q.ordering is not None:
+        fields.append(q.ordering.field)
+    return fields
+
+def execute(q, snap, allowed=None):
+    """
+    Return the snapshot rows selected by q, in order. allowed, a boolean
+    array over the store's symbols, drops the others before the limit.
+    """
+    others = q.predicates
+    if q.ordering is not None:
+        lo, hi = _slice_for(snap, q.ordering.field, q.predicates)
+        rows = snap['order_' + q.ordering.field][lo:hi]
+        if q.ordering.descending:
+            rows = _descending(rows, snap['sorted_' + q.ordering.field][lo:hi])
+        others = [p for p in q.predicates if p.field != q.ordering.field or p.bounds(
+            snap['sorted_' + p.field]) is None]
+    else:
+        # start from the most selective indexed range predicate
+        best = None
+        for p in q.predicates:
+            b = p.bounds(snap['sorted_' + p.field]) if ('sorted_' + p.field) in snap else None
+            if b is not None and (best is None or b[1] - b[0] < best[1][1] - best[1][0]):
+                best = (p, b)
+        if best is None:
+            rows = np.arange(len(snap['sid']))
+        else:
+            p, (lo, hi) = best
+            rows = np.sort(snap['order_' + p.field][lo:hi])
+            others = [o for o in q.predicates if o is not p]
+
+    if not others and allowed is None:
+        return rows if q.limit_n is None else rows[:q.limit_n]
+
+    # evaluate the remaining filters in growing chunks until the limit is met
+    chosen = []
+    found = 0
+    start, chunk = 0, max(4 * (q.limit_n or len(rows)), 64)
+    while start < len(rows):
+        cand = rows[start:start + chunk]
+        keep = np.ones(len(cand), dtype=bool) if allowed is None else allowed[snap['sid'][cand]]
+        for p in others:
+            keep &= p.evaluate(snap[p.field][cand])
+        chosen.append(cand[keep])
+        found += int(keep.sum())
+        if q.limit_n is not None and found >= q.limit_n:
+            break
+        start += chunk
+        chunk *= 2
+    rows = np.concatenate(chosen) if chosen else rows[:0]
+    return rows if q.limit_n is None else rows[:q.limit_n]
+
+def get_fundamentals(q, day, store, securities=None):
+    """
+    Run q against the snapshot in effect on day. Returns a DataFrame with
+    one row per queried field and one column per security, as on Quantopian.
+    securities maps symbol -> security object (symbols without one are dropped).
+    """
+    missing = [f for f in _fields_of(q) if f not in store.fields]
+    if missing:
+        raise KeyError('No field {} in the fundamentals store {} (it has {})'.format(
+            ', '.join(sorted(set(missing))), store.path, ', '.join(store.fields)))
+    snap = store.snapshot(day)
+    fields = [c.field for c in q.columns]
+    if snap is None:
+        return pd.DataFrame(index=fields)
+    allowed = None
+    if securities is not None:
+        # dropped before the limit, so limit(n) still returns n known securities
+        allowed = np.array([s in securities for s in store.symbols], dtype=bool)
+    rows = execute(q, snap, allowed)
+    symbols = [store.symbols[i] for i in snap['sid'][rows]]
+    columns = [securities[s] for s in symbols] if securities is not None else symbols
+    data = np.array([snap[f][rows] for f in fields]) if len(rows) else np.empty((len(fields), 0))
+    return pd.DataFrame(data, index=fields, columns=columns)
+
+
+if __name__ == "__main__":
+    build_store(pd.read_csv(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,348 @@
+"""
+Local Pipeline engine with the semantics MeanRev.make_pipeline relies on.
+
+Terms (factors and filters) form a DAG. The engine evaluates each distinct
+term once over the whole (sessions x assets) panel with array operations,
+caching the result by the term's key, so a factor shared by several
+filters, or created twice with the same arguments, is computed once.
+pipeline output for a session uses data up to the previous session, as on
+Quantopian.
+"""
+
+import numpy as np
+import pandas as pd
+
+def rolling_nanmean(a, window):
+    """Mean of the non-NaN values in each trailing window (NaN if there are none)."""
+    valid = ~np.isnan(a)
+    total = np.cumsum(np.where(valid, a, 0.0), axis=0)
+    count = np.cumsum(valid, axis=0)
+    total[window:] -= total[:-window].copy()
+    count[window:] -= count[:-window].copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+def row_percentile(values, q):
+    """np.nanpercentile(values, q, axis=1) (linear interpolation) without a per-row loop."""
+    ordered = np.sort(values, axis=1)  # NaNs sort last
+    n = (~np.isnan(values)).sum(axis=1)
+    pos = q / 100.0 * np.maximum(n - 1, 0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+    frac = pos - lo
+    rows = np.arange(len(values))
+    out = ordered[rows, lo] * (1 - frac) + ordered[rows, hi] * frac
+    out[n == 0] = np.nan
+    return out
+
+def _masked(values, mask):
+    out = np.where(np.isnan(values), np.nan, values)
+    if mask is not None:
+        out[~mask] = np.nan
+    return out
+
+class Term(object):
+    window_length = 0
+
+    def key(self):
+        raise NotImplementedError
+
+    def compute(self, engine):
+        raise NotImplementedError
+
+class BoundColumn(Term):
+    """A raw input column such as USEquityPricing.close."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def key(self):
+        return ('column', self.name)
+
+    def compute(self, engine):
+        return engine.load(self.name)
+
+    @property
+    def latest(self):
+        return Latest(self)
+
+class _Pricing(object):
+    open = BoundColumn('open')
+    high = BoundColumn('high')
+    low = BoundColumn('low')
+    close = BoundColumn('close')
+    volume = BoundColumn('volume')
+
+USEquityPricing = _Pricing()
+
+class Factor(Term):
+    def rank(self, mask=None, ascending=True):
+        return Rank(self, mask, ascending)
+
+    def percentile_between(self, min_percentile, max_percentile, mask=None):
+        return PercentileBetween(self, min_percentile, max_percentile, mask)
+
+    def top(self, n, mask=None):
+        return Rank(self, mask, ascending=False) <= n
+
+    def bottom(self, n, mask=None):
+        return Rank(self, mask, ascending=True) <= n
+
+    def __lt__(self, other):
+        return Compare(self, '<', other)
+
+    def __le__(self, other):
+        return Compare(self, '<=', other)
+
+    def __gt__(self, other):
+        return Compare(self, '>', other)
+
+    def __ge__(self, other):
+        return Compare(self, '>=', other)
+
+class Latest(Factor):
+    def __init__(self, column):
+        self.column = column
+
+    def key(self):
+        return ('latest', self.column.key())
+
+    def compute(self, engine):
+        return engine.compute(self.column)
+
+class AverageDollarVolume(Factor):
+    def __init__(self, window_length=1, mask=None):
+        self.window_length = window_length
+        self.mask = mask
+
+    def key(self):
+        return ('adv', self.window_length, _key(self.mask))
+
+    def compute(self, engine):
+        dollars = engine.compute(USEquityPricing.close) * engine.compute(USEquityPricing.volume)
+        return _masked(rolling_nanmean(dollars, self.window_length), engine.compute(self.mask))
+
+class Returns(Factor):
+    """close[t] / close[t - window_length + 1] - 1."""
+
+    def __init__(self, window_length=2, mask=None):
+        self.window_length = window_length
+        self.mask = mask
+
+    def key(self):
+        return ('returns', self.window_length, _key(self.mask))
+
+    def compute(self, engine):
+        close = engine.compute(USEquityPricing.close)
+        out = np.full(close.shape, np.nan)
+        lag = self.window_length - 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[lag:] = close[lag:] / close[:len(close) - lag] - 1
+        return _masked(out, engine.compute(self.mask))
+
+class SimpleMovingAverage(Factor):
+    def __init__(self, inputs=None, window_length=10, mask=None):
+        self.inputs = inputs or [USEquityPricing.close]
+        self.window_length = window_length
+        self.mask = mask
+
+    def key(self):
+        return ('sma', self.window_length, self.inputs[0].key(), _key(self.mask))
+
+    def compute(self, engine):
+        sma = rolling_nanmean(engine.compute(self.inputs[0]), self.window_length)
+        return _masked(sma, engine.compute(self.mask))
+
+class CustomFactor(Factor):
+    """
+    Subclass and define compute(self, today, assets, out, *inputs) as on
+    Quantopian. It is called once per session with trailing windows.
+    """
+    inputs = ()
+    window_length = 1
+
+    def __init__(self, inputs=None, window_length=None, mask=None):
+        if inputs is not None:
+            self.inputs = inputs
+        if window_length is not None:
+            self.window_length = window_length
+        self.mask = mask
+
+    def key(self):
+        return ('custom', type(self).__name__, id(self))
+
+    def _evaluate(self, engine):
+        arrays = [engine.compute(i) for i in self.inputs]
+        n_days, n_assets = engine.shape
+        out = np.full((n_days, n_assets), np.nan)
+        w = self.window_length
+        for t in range(w - 1, n_days):
+            self.compute(engine.sessions[t], engine.assets, out[t], *[a[t - w + 1:t + 1] for a in arrays])
+        return _masked(out, engine.compute(self.mask))
+
+class Filter(Term):
+    def __and__(self, other):
+        return BinaryFilter(self, '&', other)
+
+    def __or__(self, other):
+        return BinaryFilter(self, '|', other)
+
+    def __invert__(self):
+        return NotFilter(self)
+
+class Compare(Filter):
+    ops = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+    def __init__(self, factor, op, value):
+        self.factor, self.op, self.value = factor, op, value
+
+    def key(self):
+        return ('compare', self.factor.key(), self.op, self.value)
+
+    def compute(self, engine):
+        with np.errstate(invalid='ignore'):
+            return self.ops[self.op](engine.compute(self.factor), self.value)
+
+class BinaryFilter(Filter):
+    def __init__(self, left, op, right):
+        self.left, self.op, self.right = left, op, right
+
+    def key(self):
+        return (self.op, self.left.key(), self.right.key())
+
+    def compute(self, engine):
+        left, right = engine.compute(self.left), engine.compute(self.right)
+        return left & right if self.op == '&' else left | right
+
+class NotFilter(Filter):
+    def __init__(self, term):
+        self.term = term
+
+    def key(self):
+        return ('~', self.term.key())
+
+    def compute(self, engine):
+        return ~engine.compute(self.term)
+
+class PercentileBetween(Filter):
+    """True where the factor lies between the row's min/max percentiles, among masked assets."""
+
+    def __init__(self, factor, min_percentile, max_percentile, mask=None):
+        self.factor = factor
+        self.min_percentile, self.max_percentile = min_percentile, max_percentile
+        self.mask = mask
+
+    def key(self):
+        return ('percentile', self.factor.key(), self.min_percentile, self.max_percentile, _key(self.mask))
+
+    def compute(self, engine):
+        values = _masked(engine.compute(self.factor), engine.compute(self.mask))
+        lo = row_percentile(values, self.min_percentile)
+        hi = row_percentile(values, self.max_percentile)
+        with np.errstate(invalid='ignore'):
+            return (values >= lo[:, np.newaxis]) & (values <= hi[:, np.newaxis])
+
+class Rank(Factor):
+    """Ordinal rank (1 = smallest, or largest if not ascending) among masked, non-NaN assets."""
+
+    def __init__(self, factor, mask=None, ascending=True):
+        self.factor, self.mask, self.ascending = factor, mask, ascending
+
+    def key(self):
+        return ('rank', self.factor.key(), _key(self.mask), self.ascending)
+
+    def compute(self, engine):
+        values = _masked(engine.compute(self.factor), engine.compute(self.mask))
+        missing = np.isnan(values)
+        keyed = np.where(missing, np.inf, values if self.ascending else -values)
+        order = np.argsort(keyed, axis=1, kind='mergesort')
+        ranks = np.empty(values.shape)
+        np.put_along_axis(ranks, order, np.arange(1, values.shape[1] + 1, dtype=np.float64)[np.newaxis, :], axis=1)
+        ranks[missing] = np.nan
+        return ranks
+
+class QTradableStocksUS(Filter):
+    """Stand-in for the tradable universe: assets with a close and non-zero volume."""
+
+    def key(self):
+        return ('tradable',)
+
+    def compute(self, engine):
+        close, volume = engine.compute(USEquityPricing.close), engine.compute(USEquityPricing.volume)
+        with np.errstate(invalid='ignore'):
+            return ~np.isnan(close) & (volume > 0)
+
+def _key(term):
+    return None if term is None else term.key()
+
+def window_length(pipe):
+    """The longest window_length among every term the pipeline depends on."""
+    longest, stack = 0, list(pipe.columns.values()) + [pipe.screen]
+    while stack:
+        term = stack.pop()
+        if not isinstance(term, Term):
+            continue
+        longest = max(longest, term.window_length or 0)
+        stack.extend(getattr(term, name, None) for name in ('factor', 'left', 'right', 'term', 'mask'))
+        stack.extend(getattr(term, 'inputs', None) or [])
+    return longest
+
+class Pipeline(object):
+    def __init__(self, columns=None, screen=None):
+        self.columns = dict(columns or {})
+        self.screen = screen
+
+    def add(self, term, name, overwrite=False):
+        if name in self.columns and not overwrite:
+            raise KeyError('Column {} already exists'.format(name))
+        self.columns[name] = term
+
+    def remove(self, name):
+        return self.columns.pop(name)
+
+    def set_screen(self, screen, overwrite=False):
+        self.screen = screen
+
+class PipelineEngine(object):
+    """Evaluates pipelines over (sessions x assets) arrays supplied by load(field)."""
+
+    def __init__(self, sessions, assets, load):
+        self.sessions = sessions
+        self.assets = assets
+        self.shape = (len(sessions), len(assets))
+        self.load = load
+        self.cache = {}
+
+    def compute(self, term):
+        if term is None:
+            return None
+        key = term.key()
+        if key not in self.cache:
+            if isinstance(term, CustomFactor):
+                self.cache[key] = term._evaluate(self)
+            else:
+                self.cache[key] = term.compute(self)
+        return self.cache[key]
+
+    def run(self, pipe):
+        """Evaluate every column and the screen over all sessions at once."""
+        columns = dict((name, self.compute(term)) for name, term in pipe.columns.items())
+        screen = self.compute(pipe.screen) if pipe.screen is not None else \
+            ~np.isnan(self.compute(USEquityPricing.close))
+        return PipelineResult(self, columns, screen)
+
+class PipelineResult(object):
+    def __init__(self, engine, columns, screen):
+        self.engine = engine
+        self.columns = columns
+        self.screen = screen
+
+    def output(self, bar):
+        """The pipeline output seen on session bar, i.e. computed from session bar - 1."""
+        names = sorted(self.columns)
+        if bar < 1:
+            return pd.DataFrame(columns=names)
+        row = bar - 1
+        cols = np.flatnonzero(self.screen[row])
+        index = [self.engine.assets[c] for c in cols]
+        return pd.DataFrame(dict((n, self.columns[n][row, cols]) for n in names), index=index, columns=names)
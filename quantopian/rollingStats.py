@@ -0,0 +1,147 @@
+"""
+Rolling-window statistics for many securities at once, keyed by
+(field, window) and served in O(1) per bar.
+
+Each field keeps one circular buffer of (capacity x securities) rows, where
+capacity is the largest window requested for that field, so memory is
+bounded by the largest window. Every window keeps running sums, sums of
+squares and valid-value counts that are updated from the row entering and
+the row leaving it; mavg/stddev/vwap are then a division per security.
+"""
+
+import numpy as np
+
+RESYNC_BARS = 4096
+
+class _WindowSums(object):
+    """Running sums over one window of one field."""
+
+    def __init__(self, window, rows):
+        self.window = window
+        self.resync(rows)
+
+    def resync(self, rows):
+        # rows: the last <= window rows, oldest first. Values are taken
+        # relative to a per-security offset to keep the sum of squares exact.
+        valid = ~np.isnan(rows)
+        x = np.where(valid, rows, 0.0)
+        self.count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore'):
+            self.offset = np.where(self.count > 0, x.sum(axis=0) / np.maximum(self.count, 1), 0.0)
+        d = np.where(valid, x - self.offset, 0.0)
+        self.sum = d.sum(axis=0)
+        self.sumsq = (d * d).sum(axis=0)
+
+    def add(self, row, sign):
+        valid = ~np.isnan(row)
+        d = np.where(valid, row - self.offset, 0.0)
+        self.count += sign * valid
+        self.sum += sign * d
+        self.sumsq += sign * d * d
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.offset + self.sum / self.count, np.nan)
+
+    def std(self):
+        n = self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (self.sumsq - self.sum * self.sum / n) / (n - 1)
+            return np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+class _Ring(object):
+    """Circular buffer of the last capacity rows of one field."""
+
+    def __init__(self, capacity, n_assets):
+        self.rows = np.full((capacity, n_assets), np.nan)
+        self.pos = 0
+        self.filled = 0
+
+    @property
+    def capacity(self):
+        return len(self.rows)
+
+    def push(self, row):
+        self.rows[self.pos] = row
+        self.pos = (self.pos + 1) % self.capacity
+        self.filled = min(self.filled + 1, self.capacity)
+
+    def ago(self, n):
+        """The row pushed n bars ago (0 = latest)."""
+        return self.rows[(self.pos - 1 - n) % self.capacity]
+
+    def last(self, n):
+        """The last min(n, filled) rows, oldest first."""
+        n = min(n, self.filled)
+        idx = (self.pos - n + np.arange(n)) % self.capacity
+        return self.rows[idx]
+
+class RollingWindowCache(object):
+    """
+    Rolling mean, std and vwap for n_assets securities. Push one row per bar
+    with update(); ask for any window with mavg/stddev/vwap. A window asked
+    for the first time is seeded from history(field, length) if given (rows
+    ending at the latest bar), otherwise from what the buffer holds.
+    """
+
+    def __init__(self, n_assets, history=None):
+        self.n_assets = n_assets
+        self.history = history
+        self.bars = 0
+        self._rings = {}
+        self._sums = {}
+
+    def fields(self):
+        return list(self._rings)
+
+    def _seed_rows(self, field, length):
+        if self.history is not None:
+            return np.asarray(self.history(field, length), dtype=np.float64)
+        ring = self._rings.get(field)
+        return ring.last(length) if ring is not None else np.empty((0, self.n_assets))
+
+    def _window(self, field, window):
+        key = (field, window)
+        sums = self._sums.get(key)
+        if sums is None:
+            ring = self._rings.get(field)
+            if ring is None or ring.capacity < window:
+                rows = self._seed_rows(field, window)
+                ring = _Ring(window, self.n_assets)
+                for row in rows[-window:]:
+                    ring.push(row)
+                self._rings[field] = ring
+            sums = self._sums[key] = _WindowSums(window, self._seed_rows(field, window)[-window:])
+        return sums
+
+    def update(self, values):
+        """Push one bar: values is {field: row of n_assets}; 'pv' is derived from price and volume."""
+        if 'pv' in self._rings and 'price' in values and 'volume' in values:
+            values = dict(values, pv=values['price'] * values['volume'])
+        self.bars += 1
+        for field, ring in self._rings.items():
+            row = np.asarray(values[field], dtype=np.float64)
+            for (f, window), sums in self._sums.items():
+                if f == field:
+                    if ring.filled >= window:
+                        sums.add(ring.ago(window - 1), -1)
+                    sums.add(row, 1)
+            ring.push(row)
+        if self.bars % RESYNC_BARS == 0:
+            for (field, window), sums in self._sums.items():
+                sums.resync(self._rings[field].last(window))
+
+    def mavg(self, window, field='price', sid=None):
+        mean = self._window(field, window).mean()
+        return mean if sid is None else mean[sid]
+
+    def stddev(self, window, field='price', sid=None):
+        std = self._window(field, window).std()
+        return std if sid is None else std[sid]
+
+    def vwap(self, window, sid=None):
+        pv = self._window('pv', window)
+        volume = self._window('volume', window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = pv.mean() / volume.mean()
+        return vwap if sid is None else vwap[sid]
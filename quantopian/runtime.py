@@ -0,0 +1,779 @@
+"""
+Local stand-in for the Quantopian hosted runtime, so the algorithms in this
+folder run unmodified against the FinML/stock_dfs daily data.
+
+    python runtime.py 1.SMA/SMA.py --start 2005-01-01 --end 2016-12-31
+
+Every symbol an algorithm asks for needs its CSV in stock_dfs, or symbol()
+raises IOError naming the missing file. SMA.py trades SPY, which the
+S&P 500 download in dataParser doesn't fetch; from FinML:
+
+    downloader.download(['SPY'], downloader.YahooProvider(), start, end)
+
+The algorithm file is executed in a namespace that provides the Quantopian
+built-ins (order_*, record, schedule_function, date_rules, time_rules, log,
+symbol, get_datetime, attach_pipeline, get_fundamentals, ...), and the
+quantopian.* / zipline.* modules it imports are registered in sys.modules;
+zipline.utils.tradingcalendar also carries session_index, a SessionIndex
+over the run's sessions.
+get_fundamentals reads the point-in-time store in FUNDAMENTALS_DIR (see
+fundamentals.py).
+
+The daily clock (the default) runs one bar per session:
+before_trading_start, then the scheduled functions due that day, then
+handle_data, all at the close. Orders fill at the next bar's price.
+
+The minute clock (--frequency minute) steps through the 390 minutes of
+each session, 9:31 to 16:00 US/Eastern, calling handle_data every minute
+and each scheduled function at its time_rules minute. Bars come from the
+minuteStore in MINUTE_DIR, built from minute CSVs with
+
+    minuteStore.ingest_dir('minute_csvs', 'minute_dfs')
+
+where the bar stamped 9:31 covers 9:30-9:31. data.current and
+history(..., '1m') read those bars; orders fill at the next minute's
+price. Minute prices are as stored (unadjusted); mavg/stddev/vwap and
+'1d' history stay on adjusted daily bars and cover completed sessions
+only, plus today's bar so far in '1d' history.
+
+funda.py is the one algorithm here that does not load: its query(...)
+lists fields with trailing dots instead of commas, a SyntaxError in any
+Python, and it reads a context.output it never sets.
+"""
+
+import os
+import sys
+import types
+import inspect
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FINML_DIR = os.path.join(HERE, '..', 'FinML')
+sys.path.insert(0, FINML_DIR)
+import priceStore
+from rollingStats import RollingWindowCache
+import minuteStore
+import pipelineEngine
+import fundamentals
+
+CSV_DIR = os.path.join(FINML_DIR, 'stock_dfs')
+FUNDAMENTALS_DIR = os.environ.get('FUNDAMENTALS_DIR', os.path.join(FINML_DIR, 'fundamentals'))
+MINUTE_DIR = os.environ.get('MINUTE_DIR', os.path.join(FINML_DIR, minuteStore.STORE_DIR))
+MINUTES_PER_SESSION = 390
+NS_PER_MINUTE = 60 * 10 ** 9
+NEVER = np.iinfo(np.int64).max
+FIRST_MINUTE = 9 * 60 + 31
+
+class Equity(object):
+    __slots__ = ('sid', 'symbol')
+
+    def __init__(self, sid, symbol):
+        self.sid = sid
+        self.symbol = symbol
+
+    def __repr__(self):
+        return 'Equity({} [{}])'.format(self.sid, self.symbol)
+
+    def __lt__(self, other):
+        return self.sid < other.sid
+
+class MarketData(object):
+    """Daily (sessions x securities) arrays for every field, loaded once."""
+
+    def __init__(self, tickers=None, start=None, end=None, csv_dir=CSV_DIR):
+        if tickers is None:
+            store = priceStore.open_store(csv_dir)
+            tickers = store.tickers if store is not None else priceStore.list_csv_tickers(csv_dir)
+        else:
+            store = priceStore.open_store(csv_dir) or ()
+            missing = [priceStore.csv_path(t, csv_dir) for t in tickers
+                       if t not in store and not os.path.exists(priceStore.csv_path(t, csv_dir))]
+            if missing:
+                raise IOError('No price data: {} not found'.format(', '.join(missing)))
+        self.csv_dir = csv_dir
+        days, tickers, panels = priceStore.build_panels(tickers, priceStore.FIELDS, csv_dir)
+
+        # sessions before start stay loaded as history for windows and pipelines
+        sessions = priceStore.from_day_ints(days)
+        keep = np.ones(len(sessions), dtype=bool)
+        if end is not None:
+            keep &= sessions <= pd.Timestamp(end)
+
+        self.sessions = sessions[keep].tz_localize('UTC')
+        self.first_bar = 0 if start is None else \
+            int(self.sessions.searchsorted(pd.Timestamp(start).tz_localize('UTC')))
+        self.securities = [Equity(sid, t) for sid, t in enumerate(tickers)]
+        self.by_symbol = dict((s.symbol, s) for s in self.securities)
+
+        # 'price' and 'close' are adjusted; open/high/low get the same adjustment
+        adj = panels['Adj Close'][keep]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = adj / panels['Close'][keep]
+        self.fields = {
+            'price': adj,
+            'close': adj,
+            'open': panels['Open'][keep] * ratio,
+            'high': panels['High'][keep] * ratio,
+            'low': panels['Low'][keep] * ratio,
+            'volume': panels['Volume'][keep],
+        }
+        self.price = adj
+
+        local = self.sessions.tz_localize(None).tz_localize('US/Eastern')
+        self.opens = (local + pd.Timedelta(hours=9, minutes=30)).tz_convert('UTC')
+        self.closes = (local + pd.Timedelta(hours=16)).tz_convert('UTC')
+
+class MinuteBars(object):
+    """
+    One session's minute bars, read from a MinuteStore a security at a time
+    on first use. Bar i is the one stamped open + i + 1 minutes; price is
+    the last close so far that session.
+    """
+    COLUMNS = {'price': 'Price', 'close': 'Price', 'open': 'Open', 'high': 'High',
+               'low': 'Low', 'volume': 'Volume'}
+
+    def __init__(self, store, session):
+        day = session.value // (86400 * 10 ** 9)
+        self.store = store
+        self.minutes = day * 1440 + FIRST_MINUTE + np.arange(MINUTES_PER_SESSION)
+        self._bars = {}
+
+    def bars(self, security):
+        """{column: array over the session's minutes} for security."""
+        out = self._bars.get(security.sid)
+        if out is None:
+            out = dict((f, np.full(MINUTES_PER_SESSION, np.nan)) for f in minuteStore.FIELDS)
+            first, last = minuteStore.from_minute_ints(self.minutes[[0, -1]])
+            for data, lo, hi in self.store.span(security.symbol, first, last):
+                pos = data['minute'][lo:hi] - self.minutes[0]
+                for f in minuteStore.FIELDS:
+                    out[f][pos] = data[f][lo:hi]
+            out['Price'] = pd.Series(out['Close']).ffill().values
+            self._bars[security.sid] = out
+        return out
+
+    def value(self, security, field, minute):
+        return self.bars(security)[self.COLUMNS[field]][minute]
+
+    def so_far(self, security, field, minute):
+        """The session's daily bar up to and including minute."""
+        bars = self.bars(security)
+        if field in ('price', 'close'):
+            return bars['Price'][minute]
+        values = bars[self.COLUMNS[field]][:minute + 1]
+        if np.isnan(values).all():
+            return np.nan
+        if field == 'open':
+            return values[~np.isnan(values)][0]
+        return {'high': np.nanmax, 'low': np.nanmin, 'volume': np.nansum}[field](values)
+
+class Position(object):
+    __slots__ = ('sid', 'amount', 'cost_basis', 'last_sale_price')
+
+    def __init__(self, sid, amount=0, cost_basis=0.0, last_sale_price=0.0):
+        self.sid = sid
+        self.amount = amount
+        self.cost_basis = cost_basis
+        self.last_sale_price = last_sale_price
+
+    def __repr__(self):
+        return 'Position({!r}, amount={})'.format(self.sid, self.amount)
+
+class Positions(dict):
+    """Open positions by security; missing securities read as an empty Position."""
+
+    def __missing__(self, sid):
+        return Position(sid)
+
+    def itervalues(self):
+        return iter(self.values())
+
+class Portfolio(object):
+    def __init__(self, capital_base):
+        self.starting_cash = capital_base
+        self.cash = capital_base
+        self.positions = Positions()
+        self.positions_value = 0.0
+        self.portfolio_value = capital_base
+        self.pnl = 0.0
+        self.returns = 0.0
+
+class Account(object):
+    def __init__(self, portfolio):
+        self._portfolio = portfolio
+
+    @property
+    def leverage(self):
+        gross = sum(abs(p.amount * p.last_sale_price) for p in self._portfolio.positions.values())
+        value = self._portfolio.portfolio_value
+        return gross / value if value else 0.0
+
+class Context(object):
+    pass
+
+class Order(object):
+    __slots__ = ('sid', 'amount', 'created')
+
+    def __init__(self, sid, amount, created):
+        self.sid = sid
+        self.amount = amount
+        self.created = created
+
+class SIDData(object):
+    """data[security] for the current bar."""
+
+    def __init__(self, bar_data, security):
+        self._data = bar_data
+        self.sid = security
+
+    def _now(self, field):
+        return self._data.current(self.sid, field)
+
+    price = property(lambda self: self._now('price'))
+    close_price = property(lambda self: self._now('close'))
+    open_price = property(lambda self: self._now('open'))
+    high = property(lambda self: self._now('high'))
+    low = property(lambda self: self._now('low'))
+    volume = property(lambda self: self._now('volume'))
+
+    def mavg(self, days):
+        return self._data.sim.rolling.mavg(days, 'price', self.sid.sid)
+
+    def stddev(self, days):
+        return self._data.sim.rolling.stddev(days, 'price', self.sid.sid)
+
+    def vwap(self, days):
+        return self._data.sim.rolling.vwap(days, self.sid.sid)
+
+class BarData(object):
+    """The data object passed to handle_data and scheduled functions."""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.market = sim.market
+
+    def __getitem__(self, security):
+        return SIDData(self, security)
+
+    def __iter__(self):
+        return iter(self.sim.universe)
+
+    def __contains__(self, security):
+        return security in self.sim.universe
+
+    def _value(self, security, field):
+        if self.sim.minute_bars is not None:
+            return self.sim.minute_bars.value(security, field, self.sim.minute)
+        return self.market.fields[field][self.sim.bar, security.sid]
+
+    def current(self, assets, fields):
+        if isinstance(assets, Equity) and isinstance(fields, str):
+            return self._value(assets, fields)
+        if isinstance(assets, Equity):
+            return pd.Series(dict((f, self._value(assets, f)) for f in fields))
+        if isinstance(fields, str):
+            return pd.Series([self._value(a, fields) for a in assets], index=assets)
+        return pd.DataFrame(dict((f, [self._value(a, f) for a in assets]) for f in fields), index=assets)
+
+    def history(self, assets, fields, bar_count, frequency='1d'):
+        single = isinstance(assets, Equity)
+        assets = [assets] if single else list(assets)
+        if frequency == '1m':
+            if self.sim.minute_bars is None:
+                raise ValueError("history(..., '1m') needs the minute clock (--frequency minute)")
+            frame = self._minute_frame(assets, bar_count)
+        elif frequency == '1d':
+            frame = self._daily_frame(assets, bar_count)
+        else:
+            raise ValueError('Unsupported history frequency {}'.format(frequency))
+        if isinstance(fields, str):
+            df = frame(fields)
+            return df[assets[0]] if single else df
+        return dict((f, frame(f)) for f in fields)
+
+    def _daily_frame(self, assets, bar_count):
+        sim, bar = self.sim, self.sim.bar
+        cols = [a.sid for a in assets]
+        if sim.minute_bars is None:
+            start = max(0, bar - bar_count + 1)
+            return lambda field: pd.DataFrame(self.market.fields[field][start:bar + 1, cols],
+                                              index=self.market.sessions[start:bar + 1], columns=assets)
+
+        # completed sessions, then today's bar so far
+        start = max(0, bar - bar_count + 1)
+
+        def frame(field):
+            today = [sim.minute_bars.so_far(a, field, sim.minute) for a in assets]
+            values = np.vstack([self.market.fields[field][start:bar, cols], [today]])
+            return pd.DataFrame(values, index=self.market.sessions[start:bar + 1], columns=assets)
+        return frame
+
+    def _minute_frame(self, assets, bar_count):
+        # the last bar_count minutes, walking back over earlier sessions as needed
+        sim = self.sim
+        parts, bar, stop, need = [], sim.bar, sim.minute + 1, bar_count
+        while need > 0 and bar >= 0:
+            bars = sim.minute_bars if bar == sim.bar else MinuteBars(sim.minute_store, self.market.sessions[bar])
+            start = max(0, stop - need)
+            parts.append((bars, start, stop))
+            need -= stop - start
+            bar, stop = bar - 1, MINUTES_PER_SESSION
+        parts.reverse()
+        index = pd.DatetimeIndex(np.concatenate([b.minutes[lo:hi] for b, lo, hi in parts])
+                                 .astype('datetime64[m]').astype('datetime64[ns]'))
+        index = index.tz_localize('US/Eastern').tz_convert('UTC')
+
+        def frame(field):
+            column = MinuteBars.COLUMNS[field]
+            values = np.column_stack([np.concatenate([b.bars(a)[column][lo:hi] for b, lo, hi in parts])
+                                      for a in assets])
+            return pd.DataFrame(values, index=index, columns=assets)
+        return frame
+
+    def can_trade(self, security):
+        return not np.isnan(self.sim._price(security))
+
+class date_rules(object):
+    """Each rule maps the session index to a boolean 'runs today' mask, computed once."""
+
+    @staticmethod
+    def every_day():
+        return lambda sessions: np.ones(len(sessions), dtype=bool)
+
+    @staticmethod
+    def _nth_in_period(period_ids, days_offset, from_end):
+        ids = period_ids[::-1] if from_end else period_ids
+        first = np.unique(ids, return_index=True)[1]
+        starts = np.zeros(len(ids), dtype=np.int64)
+        starts[first] = first
+        np.maximum.accumulate(starts, out=starts)
+        mask = (np.arange(len(ids)) - starts) == days_offset
+        return mask[::-1] if from_end else mask
+
+    @staticmethod
+    def week_start(days_offset=0):
+        return lambda s: date_rules._nth_in_period(_week_ids(s), days_offset, False)
+
+    @staticmethod
+    def week_end(days_offset=0):
+        return lambda s: date_rules._nth_in_period(_week_ids(s), days_offset, True)
+
+    @staticmethod
+    def month_start(days_offset=0):
+        return lambda s: date_rules._nth_in_period(s.year * 12 + s.month, days_offset, False)
+
+    @staticmethod
+    def month_end(days_offset=0):
+        return lambda s: date_rules._nth_in_period(s.year * 12 + s.month, days_offset, True)
+
+def _week_ids(sessions):
+    # days since 1970-01-01 (a Thursday), shifted so weeks start on Monday
+    days = sessions.tz_localize(None).values.astype('datetime64[D]').astype(np.int64)
+    return (days + 3) // 7
+
+class time_rules(object):
+    """Minutes after the open a function should run; only the order matters on the daily clock."""
+
+    @staticmethod
+    def market_open(hours=0, minutes=1):
+        return hours * 60 + minutes
+
+    @staticmethod
+    def market_close(hours=0, minutes=1):
+        return 390 - (hours * 60 + minutes)
+
+class SessionIndex(object):
+    """
+    The trading calendar as int64 (ns, UTC) session, open and close arrays,
+    built once for code that looks sessions up on every bar. Algorithms get
+    it as zipline.utils.tradingcalendar.session_index.
+    """
+
+    def __init__(self, sessions, opens, closes):
+        self.trading_days = sessions
+        self.sessions = np.asarray(sessions.asi8, dtype=np.int64)
+        self.opens = np.asarray(opens.asi8, dtype=np.int64)
+        self.closes = np.asarray(closes.asi8, dtype=np.int64)
+
+    def index_of(self, dt):
+        """Index of the first session on or after dt (len(sessions) past the end)."""
+        return int(np.searchsorted(self.sessions, pd.Timestamp(dt).value))
+
+    def ahead(self, idx, n):
+        return idx + n
+
+    def open_and_close(self, idx):
+        # past the end of the calendar the session never opens
+        if idx >= len(self.sessions):
+            return NEVER, NEVER
+        return self.opens[idx], self.closes[idx]
+
+    def event_times(self, period=1, start=None, end=None, timing_func=None, max_hits=1):
+        """
+        int64 ns times of an event every period sessions from start to end:
+        the session close, or with timing_func, the first max_hits minutes of
+        the session (stamped as the minute clock stamps them, open + 1 to the
+        close) for which timing_func(minute) is true.
+        """
+        first = 0 if start is None else self.index_of(start)
+        last = len(self.sessions) if end is None else \
+            int(np.searchsorted(self.sessions, pd.Timestamp(end).value, side='right'))
+        idx = np.arange(first, last, period)
+        if timing_func is None:
+            return self.closes[idx]
+        events = []
+        for i in idx:
+            minutes = np.arange(self.opens[i] + NS_PER_MINUTE, self.closes[i] + NS_PER_MINUTE, NS_PER_MINUTE)
+            hits = [m for m in minutes if timing_func(pd.Timestamp(m, tz='UTC'))]
+            events.extend(hits[:max_hits])
+        return np.asarray(events, dtype=np.int64)
+
+class TradingSimulation(object):
+    """Runs one algorithm namespace over MarketData."""
+
+    def __init__(self, market, capital_base=1e5, commission_per_share=0.0, slippage=0.0,
+                 fundamentals_dir=FUNDAMENTALS_DIR, minute_store=None):
+        self.market = market
+        # the minute clock runs when given a minuteStore.MinuteStore
+        self.minute_store = minute_store
+        self.minute_bars = None
+        self.minute = MINUTES_PER_SESSION - 1
+        self.fundamentals_dir = fundamentals_dir
+        self.fundamentals_store = None
+        self.commission_per_share = commission_per_share
+        self.slippage = slippage
+        self.bar = market.first_bar
+        self.dt = market.opens[self.bar] if self.bar < len(market.sessions) else None
+        self.context = Context()
+        self.context.portfolio = Portfolio(capital_base)
+        self.context.account = Account(self.context.portfolio)
+        self.data = BarData(self)
+        self.rolling = RollingWindowCache(len(market.securities), history=self._history_rows)
+        self.pipelines = {}
+        self.pipeline_results = {}
+        self.pipeline_engine = pipelineEngine.PipelineEngine(market.sessions, market.securities,
+                                                             market.fields.__getitem__)
+        self.universe = []
+        self.open_orders = []
+        self.scheduled = []
+        self.recorded = {}
+        self.daily = []
+        self.log = logging.getLogger('algorithm')
+
+    # ---- API exposed to the algorithm ----
+
+    def api(self):
+        names = ['symbol', 'symbols', 'sid', 'order', 'order_target', 'order_value',
+                 'order_percent', 'order_target_value', 'order_target_percent',
+                 'get_open_orders', 'cancel_order', 'record', 'schedule_function',
+                 'get_datetime', 'update_universe', 'set_commission', 'set_slippage',
+                 'attach_pipeline', 'pipeline_output', 'get_fundamentals']
+        api = dict((n, getattr(self, n)) for n in names)
+        api.update({
+            'log': self.log,
+            'date_rules': date_rules,
+            'time_rules': time_rules,
+            'query': fundamentals.query,
+            'fundamentals': fundamentals.fundamentals,
+        })
+        return api
+
+    def symbol(self, ticker):
+        if ticker not in self.market.by_symbol:
+            raise IOError('No price data for {}: {} not found'.format(
+                ticker, priceStore.csv_path(ticker, self.market.csv_dir)))
+        if self.minute_store is not None and ticker not in self.minute_store.index:
+            raise IOError('No minute bars for {} in {}'.format(ticker, self.minute_store.path))
+        security = self.market.by_symbol[ticker]
+        if security not in self.universe:
+            self.universe.append(security)
+        return security
+
+    def symbols(self, *tickers):
+        return [self.symbol(t) for t in tickers]
+
+    def sid(self, number):
+        return self.market.securities[number]
+
+    def update_universe(self, securities):
+        self.universe = list(securities)
+
+    def get_fundamentals(self, query):
+        """Point-in-time fundamentals: the latest snapshot on or before the current session."""
+        if self.fundamentals_store is None:
+            path = os.path.join(self.fundamentals_dir, fundamentals.DATES_FILE)
+            if not os.path.exists(path):
+                raise IOError('No fundamentals store: {} not found (build it with fundamentals.py)'.format(path))
+            self.fundamentals_store = fundamentals.FundamentalsStore(self.fundamentals_dir)
+        day = self.market.sessions[self.bar].value // (86400 * 10 ** 9)
+        return fundamentals.get_fundamentals(query, day, self.fundamentals_store, self.market.by_symbol)
+
+    def get_datetime(self, tz=None):
+        return self.dt.tz_convert(tz) if tz else self.dt
+
+    def record(self, **values):
+        self.recorded.update(values)
+
+    def schedule_function(self, func, date_rule=None, time_rule=None, half_days=True):
+        date_rule = date_rule or date_rules.every_day()
+        minute = time_rule if time_rule is not None else time_rules.market_open()
+        self.scheduled.append((minute, func, date_rule(self.market.sessions)))
+        self.scheduled.sort(key=lambda item: item[0])
+
+    def attach_pipeline(self, pipeline, name, chunks=None):
+        self.pipelines[name] = pipeline
+        return pipeline
+
+    def pipeline_output(self, name):
+        # every session is evaluated on first use; later calls slice one row
+        if name not in self.pipeline_results:
+            self.pipeline_results[name] = self.pipeline_engine.run(self.pipelines[name])
+        return self.pipeline_results[name].output(self.bar)
+
+    def set_commission(self, per_share=0.0, **kwargs):
+        self.commission_per_share = per_share
+
+    def set_slippage(self, fraction=0.0, **kwargs):
+        self.slippage = fraction
+
+    def _price(self, security):
+        if self.minute_bars is not None:
+            return self.minute_bars.value(security, 'price', self.minute)
+        return self.market.price[self.bar, security.sid]
+
+    def order(self, security, amount):
+        if np.isnan(self._price(security)) or int(amount) == 0:
+            return None
+        amount = int(amount)
+        o = Order(security, amount, self.dt)
+        self.open_orders.append(o)
+        return o
+
+    def order_value(self, security, value):
+        return self.order(security, value / self._price(security))
+
+    def order_percent(self, security, percent):
+        return self.order_value(security, percent * self.context.portfolio.portfolio_value)
+
+    def order_target(self, security, target):
+        # a new target replaces any order still open for the security
+        self.cancel_order(security)
+        return self.order(security, target - self.context.portfolio.positions[security].amount)
+
+    def order_target_value(self, security, value):
+        # securities without a price this session (e.g. listed later) are not ordered
+        if np.isnan(self._price(security)):
+            return None
+        return self.order_target(security, int(value / self._price(security)))
+
+    def order_target_percent(self, security, percent):
+        return self.order_target_value(security, percent * self.context.portfolio.portfolio_value)
+
+    def get_open_orders(self, security=None):
+        if security is None:
+            orders = {}
+            for o in self.open_orders:
+                orders.setdefault(o.sid, []).append(o)
+            return orders
+        return [o for o in self.open_orders if o.sid is security]
+
+    def cancel_order(self, order_or_security):
+        if isinstance(order_or_security, Order):
+            self.open_orders.remove(order_or_security)
+        else:
+            self.open_orders = [o for o in self.open_orders if o.sid is not order_or_security]
+
+    # ---- event loop ----
+
+    def _history_rows(self, field, length):
+        # the minute clock's windows end at the last completed session
+        fields = self.market.fields
+        stop = self.bar + (1 if self.minute_store is None else 0)
+        start = max(0, stop - length)
+        if field == 'pv':
+            return fields['price'][start:stop] * fields['volume'][start:stop]
+        return fields[field][start:stop]
+
+    def _fill_orders(self):
+        portfolio = self.context.portfolio
+        pending = []
+        for o in self.open_orders:
+            price = self._price(o.sid)
+            if np.isnan(price):
+                pending.append(o)
+                continue
+            price *= 1 + self.slippage * np.sign(o.amount)
+            position = portfolio.positions.get(o.sid)
+            if position is None:
+                position = portfolio.positions[o.sid] = Position(o.sid)
+            total = position.amount + o.amount
+            if position.amount == 0 or (position.amount > 0) == (o.amount > 0):
+                position.cost_basis = (position.cost_basis * position.amount + price * o.amount) / total
+            elif (total > 0) != (position.amount > 0):
+                position.cost_basis = price
+            position.amount = total
+            if total == 0:
+                del portfolio.positions[o.sid]
+            portfolio.cash -= o.amount * price + abs(o.amount) * self.commission_per_share
+        self.open_orders = pending
+
+    def _mark_to_market(self):
+        portfolio = self.context.portfolio
+        value = 0.0
+        for security, position in portfolio.positions.items():
+            price = self._price(security)
+            if price == price:
+                position.last_sale_price = price
+            value += position.amount * position.last_sale_price
+        portfolio.positions_value = value
+        portfolio.portfolio_value = portfolio.cash + value
+        portfolio.pnl = portfolio.portfolio_value - portfolio.starting_cash
+        portfolio.returns = portfolio.pnl / portfolio.starting_cash
+
+    def run(self, namespace):
+        context, data = self.context, self.data
+        initialize = namespace.get('initialize')
+        before_trading_start = namespace.get('before_trading_start')
+        handle_data = namespace.get('handle_data')
+        bts_args = (context, data)
+        if before_trading_start is not None:
+            bts_args = bts_args[:len(inspect.signature(before_trading_start).parameters)]
+
+        if initialize is not None:
+            initialize(context)
+
+        # pipeline output on a session comes from the one before, so the first
+        # bar with a full window for every attached pipeline is window_length
+        market = self.market
+        warm = [pipelineEngine.window_length(p) for p in self.pipelines.values()]
+        first_bar = max([market.first_bar] + warm)
+        for bar in range(first_bar, len(market.sessions)):
+            self.bar = bar
+            if self.minute_store is None:
+                self._fill_orders()
+                self._mark_to_market()
+                if self.rolling.fields():
+                    self.rolling.update(dict((f, a[bar]) for f, a in market.fields.items()))
+            elif self.rolling.fields():
+                self.rolling.update(dict((f, a[bar - 1]) for f, a in market.fields.items()))
+
+            if before_trading_start is not None:
+                self.dt = market.opens[bar] - pd.Timedelta(minutes=45)
+                before_trading_start(*bts_args)
+
+            if self.minute_store is None:
+                self.dt = market.closes[bar]
+                for minute, func, runs in self.scheduled:
+                    if runs[bar]:
+                        func(context, data)
+                if handle_data is not None:
+                    handle_data(context, data)
+            else:
+                self._run_minutes(handle_data)
+
+            portfolio = context.portfolio
+            row = {'portfolio_value': portfolio.portfolio_value, 'cash': portfolio.cash,
+                   'leverage': context.account.leverage}
+            row.update(self.recorded)
+            self.daily.append(row)
+
+        return pd.DataFrame(self.daily, index=market.sessions[first_bar:])
+
+    def _run_minutes(self, handle_data):
+        """One session on the minute clock."""
+        context, data, bar = self.context, self.data, self.bar
+        self.minute_bars = MinuteBars(self.minute_store, self.market.sessions[bar])
+        due = [(min(max(minute, 1), MINUTES_PER_SESSION) - 1, func)
+               for minute, func, runs in self.scheduled if runs[bar]]
+        open_ = self.market.opens[bar]
+        for minute in range(MINUTES_PER_SESSION):
+            self.minute = minute
+            self.dt = open_ + pd.Timedelta(minutes=minute + 1)
+            self._fill_orders()
+            self._mark_to_market()
+            for at, func in due:
+                if at == minute:
+                    func(context, data)
+            if handle_data is not None:
+                handle_data(context, data)
+
+def install_modules(sim):
+    """Register the quantopian.* and zipline.* modules the algorithms import."""
+    api = sim.api()
+    market = sim.market
+
+    def module(name, **attrs):
+        m = types.ModuleType(name)
+        m.__dict__.update(attrs)
+        sys.modules[name] = m
+        parent, _, child = name.rpartition('.')
+        if parent:
+            setattr(sys.modules[parent], child, m)
+        return m
+
+    module('quantopian')
+    module('quantopian.algorithm', **api)
+    pe = pipelineEngine
+    module('quantopian.pipeline', Pipeline=pe.Pipeline, CustomFactor=pe.CustomFactor)
+    module('quantopian.pipeline.data')
+    module('quantopian.pipeline.data.builtin', USEquityPricing=pe.USEquityPricing)
+    module('quantopian.pipeline.filters', QTradableStocksUS=pe.QTradableStocksUS)
+    module('quantopian.pipeline.factors', AverageDollarVolume=pe.AverageDollarVolume,
+           Returns=pe.Returns, SimpleMovingAverage=pe.SimpleMovingAverage,
+           CustomFactor=pe.CustomFactor)
+
+    module('zipline')
+    module('zipline.utils')
+    module('zipline.utils.tradingcalendar',
+           trading_days=market.sessions,
+           open_and_closes=pd.DataFrame({'market_open': market.opens, 'market_close': market.closes},
+                                        index=market.sessions),
+           canonicalize_datetime=lambda dt: pd.Timestamp(dt).tz_convert('UTC').normalize(),
+           session_index=SessionIndex(market.sessions, market.opens, market.closes))
+
+def load_algorithm(path, sim):
+    """Execute an algorithm file in a namespace holding the runtime built-ins."""
+    install_modules(sim)
+    namespace = {'__name__': 'algorithm', '__file__': path}
+    namespace.update(sim.api())
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    exec(code, namespace)
+    return namespace
+
+def run_algorithm(path, start=None, end=None, capital_base=1e5, tickers=None, csv_dir=CSV_DIR,
+                  frequency='daily', minute_dir=MINUTE_DIR, **kwargs):
+    """Run the algorithm in path on the daily or minute clock; returns the daily results DataFrame."""
+    if frequency not in ('daily', 'minute'):
+        raise ValueError('Unsupported frequency {}'.format(frequency))
+    market = MarketData(tickers, start, end, csv_dir)
+    if frequency == 'minute':
+        if not os.path.exists(os.path.join(minute_dir, minuteStore.INDEX_FILE)):
+            raise IOError('No minute store: {} not found (build it with minuteStore.ingest_dir)'.format(
+                os.path.join(minute_dir, minuteStore.INDEX_FILE)))
+        kwargs['minute_store'] = minuteStore.MinuteStore(minute_dir)
+    sim = TradingSimulation(market, capital_base, **kwargs)
+    return sim.run(load_algorithm(path, sim))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a Quantopian algorithm on local data.')
+    parser.add_argument('algorithm')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--capital', type=float, default=1e5)
+    parser.add_argument('--frequency', choices=['daily', 'minute'], default='daily')
+    parser.add_argument('--minute-dir', default=MINUTE_DIR)
+    parser.add_argument('--output', help='write the daily results to this CSV')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    results = run_algorithm(args.algorithm, args.start, args.end, args.capital,
+                            frequency=args.frequency, minute_dir=args.minute_dir)
+    if args.output:
+        results.to_csv(args.output)
+    final = results['portfolio_value'].iloc[-1]
+    print('Final portfolio value: {:.2f} ({:+.2%})'.format(final, final / args.capital - 1))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+import fundamentals
+from fundamentals import fundamentals as f, query
+
+@pytest.fixture
+def store(tmp_path):
+    # S3 and S6 report no market cap
+    df = pd.DataFrame({
+        'date': ['2016-01-04'] * 8,
+        'symbol': ['S{}'.format(i) for i in range(8)],
+        'market_cap': [50.0, 80.0, 20.0, np.nan, 70.0, 10.0, np.nan, 60.0],
+        'pb_ratio': [1.0, 3.0, 1.5, 0.5, 1.2, 0.8, 1.9, 2.5],
+    })
+    fundamentals.build_store(df, str(tmp_path))
+    return fundamentals.FundamentalsStore(str(tmp_path))
+
+def symbols(store, q, securities=None):
+    day = np.datetime64('2016-01-05', 'D').astype(np.int64)
+    return list(fundamentals.get_fundamentals(q, day, store, securities).columns)
+
+def test_order_asc(store):
+    q = query(f.valuation.market_cap).order_by(f.valuation.market_cap.asc()).limit(3)
+    assert symbols(store, q) == ['S5', 'S2', 'S0']
+
+def test_order_desc_skips_nan(store):
+    q = query(f.valuation.market_cap).order_by(f.valuation.market_cap.desc())
+    assert symbols(store, q) == ['S1', 'S4', 'S7', 'S0', 'S2', 'S5']
+
+def test_filter_order_desc_limit(store):
+    q = (query(f.valuation.market_cap)
+         .filter(f.valuation_ratios.pb_ratio < 2)
+         .order_by(f.valuation.market_cap.desc())
+         .limit(3))
+    assert symbols(store, q) == ['S4', 'S0', 'S2']
+
+def test_limit_applies_after_unknown_securities(store):
+    q = query(f.valuation.market_cap).order_by(f.valuation.market_cap.desc()).limit(2)
+    known = dict((s, s.lower()) for s in ['S0', 'S2', 'S5'])
+    assert symbols(store, q, known) == ['s0', 's2']
+
+def test_order_desc_keeps_ties_in_symbol_order(tmp_path):
+    df = pd.DataFrame({'date': ['2016-01-04'] * 6,
+                       'symbol': ['S{}'.format(i) for i in range(6)],
+                       'market_cap': [20.0, 50.0, 20.0, 50.0, 10.0, 20.0]})
+    fundamentals.build_store(df, str(tmp_path))
+    store = fundamentals.FundamentalsStore(str(tmp_path))
+    q = query(f.valuation.market_cap).order_by(f.valuation.market_cap.desc())
+    assert symbols(store, q) == ['S1', 'S3', 'S0', 'S2', 'S5', 'S4']
+    assert symbols(store, q.limit(3)) == ['S1', 'S3', 'S0']
+
+def test_unknown_field_is_named(store):
+    q = query(f.valuation.market_cap).filter(f.valuation_ratios.pe_ratio < 12)
+    with pytest.raises(KeyError, match='pe_ratio'):
+        symbols(store, q)
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import runtime
+
+QUANT_VAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '3.Quant_Value', 'QuantVal.py')
+
+@pytest.fixture(scope='module')
+def sim():
+    market = runtime.MarketData(['A'], '2016-01-04', '2016-03-31')
+    return runtime.TradingSimulation(market)
+
+@pytest.fixture
+def cal(sim):
+    runtime.install_modules(sim)
+    from zipline.utils import tradingcalendar
+    return tradingcalendar.session_index
+
+def test_index_of_non_session_dates(cal, sim):
+    sessions = sim.market.sessions
+    assert cal.index_of(sessions[3]) == 3
+    # a Saturday maps to the next Monday's session, as searchsorted did
+    assert sessions[cal.index_of(pd.Timestamp('2016-01-09', tz='UTC'))] == pd.Timestamp('2016-01-11', tz='UTC')
+    assert cal.index_of(pd.Timestamp('2030-01-01', tz='UTC')) == len(sessions)
+    assert cal.open_and_close(len(sessions)) == (runtime.NEVER, runtime.NEVER)
+
+def test_event_times_max_hits(cal, sim):
+    morning = lambda dt: dt.tz_convert('US/Eastern').hour == 11
+    events = cal.event_times(5, '2016-02-01', '2016-02-29', morning, max_hits=3)
+    local = pd.DatetimeIndex(events, tz='UTC').tz_convert('US/Eastern')
+    assert len(events) == 3 * len(range(cal.index_of('2016-02-01'), cal.index_of('2016-03-01'), 5))
+    assert (local.hour == 11).all() and list(local.minute[:3]) == [0, 1, 2]
+    closes = cal.event_times(5, '2016-02-01', '2016-02-29')
+    np.testing.assert_array_equal(closes, sim.market.closes.asi8[cal.index_of('2016-02-01')::5][:len(closes)])
+
+@pytest.mark.parametrize('max_daily_hits', [1, 2])
+def test_vectorized_fires_like_the_loop(sim, max_daily_hits):
+    namespace = runtime.load_algorithm(QUANT_VAL, sim)
+    fired = {}
+    for vectorized in (False, True):
+        manager = namespace['EventManager'](period=10, max_daily_hits=max_daily_hits, frequency='1m',
+                                            trade_timing_func=namespace['entry_func'],
+                                            vectorized=vectorized)
+        fired[vectorized] = []
+        for bar in range(sim.market.first_bar, len(sim.market.sessions)):
+            for minute in range(runtime.MINUTES_PER_SESSION):
+                sim.dt = sim.market.opens[bar] + pd.Timedelta(minutes=minute + 1)
+                if manager.signal(sim.dt):
+                    fired[vectorized].append(sim.dt)
+    sessions = len(range(sim.market.first_bar, len(sim.market.sessions), 10))
+    assert len(fired[False]) == max_daily_hits * sessions
+    assert fired[True] == fired[False]